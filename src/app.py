@@ -1,46 +1,422 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Blueprint, Flask, Response, current_app, g, render_template, request, jsonify, url_for
+import io
 import os
 import sys
 import json
+import time
+import base64
 import logging
-from lxml import etree
+import zipfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # Ensure local imports work
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from feature_extractor import FeatureExtractor
 from rule_based_feedback import RuleBasedFeedbackEngine
-from xml_parser import extract_methods_from_xml
+from job_queue import JobQueue, JOBS_DB
+import audit_executor
+from audit_executor import AuditExecutor, Saturated, extract_file_text
+from disk_cache import CACHE_DIR
+from result_cache import ResultCache, normalize_text, normalized_spans, ruleset_fingerprint
+from response_views import VIEWS, shape, gzip_response, source_offsets
+from metrics import Registry, SIZE_BUCKETS
+from regex_backend import DEFAULT_BACKEND, engine
 
-app = Flask(__name__)
 logging.basicConfig(level=logging.INFO)
 
-extractor = FeatureExtractor()
-engine = RuleBasedFeedbackEngine()
+DEFAULT_CONFIG = {
+    # Increase max content length for larger XMLs
+    'MAX_CONTENT_LENGTH': 16 * 1024 * 1024,  # 16MB
+    # Audit worker processes (None: one per CPU, 0: audit on the request thread)
+    'AUDIT_WORKERS': None,
+    # Audits that may wait for a worker before requests are turned away
+    'AUDIT_QUEUE': None,
+    # Seconds of pattern matching per document before extraction gives up on the
+    # remaining categories, and before a worker process is killed outright
+    'AUDIT_EXTRACT_BUDGET': 10.0,
+    'AUDIT_TIMEOUT': 60.0,
+    # re, re2 (linear-time, needs google-re2) or auto; see regex_backend
+    'AUDIT_REGEX_BACKEND': DEFAULT_BACKEND,
+    'AUDIT_CACHE_SIZE': 1024,
+    'AUDIT_CACHE_TTL': 24 * 3600,
+    # Empty keeps the result cache in memory only
+    'AUDIT_CACHE_DB': os.path.join(CACHE_DIR, 'audit_results.db'),
+    'JOBS_DB': JOBS_DB
+}
+
+# Shared by every /audit_batch request so concurrent batches cannot oversubscribe the server
+BATCH_WORKERS = 4
+MAX_BATCH_DOCUMENTS = 1000
+MAX_MEMBER_BYTES = 50 * 1024 * 1024
+# Uncompressed size of all audited members of one zip upload
+MAX_ARCHIVE_BYTES = 500 * 1024 * 1024
+BATCH_EXTENSIONS = ('.xml', '.nxml', '.pdf', '.txt')
+
+# Must produce at least one finding; used to check the rule set before serving
+SMOKE_TEXT = ("Patients were randomly assigned (n = 120). Data are mean and standard deviation. "
+              "Groups were compared with a t-test; p < 0.05 was considered significant. "
+              "Analyses used SPSS version 25.")
+
+def config_from_env():
+    """Settings given as environment variables, converted to the DEFAULT_CONFIG types."""
+    config = {}
+    for name in ('AUDIT_WORKERS', 'AUDIT_QUEUE', 'AUDIT_CACHE_SIZE', 'AUDIT_CACHE_TTL'):
+        if os.getenv(name):
+            config[name] = int(os.environ[name])
+    for name in ('AUDIT_EXTRACT_BUDGET', 'AUDIT_TIMEOUT'):
+        if os.getenv(name):
+            config[name] = float(os.environ[name])
+    for name in ('AUDIT_CACHE_DB', 'JOBS_DB'):
+        if name in os.environ:
+            config[name] = os.environ[name]
+    return config
+
+def audit_metrics(svc):
+    """The service's metrics registry and the metrics recorded on the request path."""
+    registry = Registry()
+    metrics = {
+        'registry': registry,
+        'requests': registry.counter('afsr_http_requests_total', 'HTTP requests by route, method and status',
+                                     ('route', 'method', 'status')),
+        'latency': registry.histogram('afsr_http_request_duration_seconds', 'Time to handle a request, including streaming',
+                                      ('route',)),
+        'request_bytes': registry.histogram('afsr_http_request_bytes', 'Request body size', ('route',), SIZE_BUCKETS),
+        'response_bytes': registry.histogram('afsr_http_response_bytes', 'Response body size as sent', ('route',), SIZE_BUCKETS),
+        'stages': registry.histogram('afsr_stage_duration_seconds',
+                                     'Audit time per stage: queue, parse, extract, rules, serialize, compress', ('stage',)),
+        'audits': registry.counter('afsr_audits_total',
+                                   'Audits by source and outcome (computed, partial, cached, rejected, failed)',
+                                   ('source', 'outcome'))
+    }
+
+    def cache_lookups():
+        stats = svc.results.stats()
+        return {('memory_hit',): stats['memory_hits'], ('disk_hit',): stats['disk_hits'], ('miss',): stats['misses']}
+
+    def executor_state(key):
+        stats = svc.executor.stats()
+        capacity = max(1, stats['workers']) + stats['max_queue']
+        return {(): {'in_flight': stats['in_flight'], 'capacity': capacity,
+                     'saturation': round(stats['in_flight'] / capacity, 3)}[key]}
+
+    registry.gauge('afsr_result_cache_lookups_total', 'Result cache lookups by outcome', ('outcome',), cache_lookups, kind='counter')
+    registry.gauge('afsr_result_cache_hit_ratio', 'Share of result cache lookups that were hits',
+                   callback=lambda: {(): svc.results.stats()['hit_rate']})
+    registry.gauge('afsr_executor_in_flight', 'Audits admitted to the executor, running or waiting',
+                   callback=lambda: executor_state('in_flight'))
+    registry.gauge('afsr_executor_capacity', 'Audits the executor admits at once (workers + queue)',
+                   callback=lambda: executor_state('capacity'))
+    registry.gauge('afsr_executor_saturation', 'in_flight / capacity; 1 means new interactive audits are rejected',
+                   callback=lambda: executor_state('saturation'))
+    registry.gauge('afsr_executor_rejected_total', 'Audits turned away by admission control, by HTTP status', ('status',),
+                   lambda: {(str(status),): n for status, n in svc.executor.stats()['rejected'].items()}, kind='counter')
+    registry.gauge('afsr_executor_recycled_total', 'Times the worker processes were killed after a timeout or crash',
+                   callback=lambda: {(): svc.executor.stats()['recycled']}, kind='counter')
+    registry.gauge('afsr_ruleset_info', 'Fingerprint and regex backend of the loaded rule set', ('fingerprint', 'backend'),
+                   lambda: {(svc.fingerprint, svc.extractor.backend): 1})
+    engines = {}
+    for patterns in svc.extractor.patterns.values():
+        for regex in patterns:
+            engines[(engine(regex),)] = engines.get((engine(regex),), 0) + 1
+    registry.gauge('afsr_regex_patterns', 'Extraction patterns by the engine that runs them', ('engine',), lambda: engines)
+    return metrics
+
+class AuditService:
+    """
+    Everything the dashboard needs to run audits.
+
+    The extractor (with its compiled patterns) and the rule engine are built
+    once, in the process that calls create_app(), so servers that load the app
+    before forking share them copy-on-write. Threads, pools and database
+    connections cannot survive a fork, so the result cache, executor, job queue
+    and batch pool are built on first use in each process.
+    """
+    def __init__(self, config):
+        self.config = config
+        # Raises ValueError on a pattern that does not compile or an unavailable backend
+        self.extractor = FeatureExtractor(config['AUDIT_REGEX_BACKEND'])
+        self.engine = RuleBasedFeedbackEngine()
+        self.fingerprint = ruleset_fingerprint(self.extractor, self.engine)
+        audit_executor.share(self.extractor, self.engine)
+        self.metrics = audit_metrics(self)
+        self._pid = None
+        self._warm_pid = None
+        self._lock = threading.Lock()
+
+    def check(self):
+        """
+        Audit SMOKE_TEXT with the rule set, raising if it fails or finds
+        nothing, or if a pattern risks exponential backtracking.
+        """
+        exponential = [r for r in self.extractor.risks if r['severity'] == 'exponential']
+        if exponential:
+            raise ValueError('Patterns with exponential backtracking risk:\n  ' + '\n  '.join(
+                f"{r['feature']}: {r['pattern']!r}: {r['reason']}" for r in exponential))
+        features = self.extractor.extract_features(SMOKE_TEXT)
+        if not any(f['present'] for f in features.values()):
+            raise ValueError('Rule set found no features in the smoke-test text')
+        feedback = self.engine.generate_feedback(features)
+        for key in ('overall_score', 'rigor_rating', 'critical_gaps', 'strengths'):
+            if key not in feedback:
+                raise ValueError(f'Rule engine output is missing {key!r}')
+
+    def _state(self):
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid == pid:
+                return
+            config = self.config
+            self._results = ResultCache(
+                self.fingerprint,
+                max_entries=config['AUDIT_CACHE_SIZE'],
+                ttl=config['AUDIT_CACHE_TTL'],
+                disk_path=config['AUDIT_CACHE_DB'] or None
+            )
+            # Audits run on a bounded pool of worker processes. Interactive requests that
+            # find it full are turned away with 429 rather than queued without limit.
+            self._executor = AuditExecutor(workers=config['AUDIT_WORKERS'], max_queue=config['AUDIT_QUEUE'],
+                                           timeout=config['AUDIT_TIMEOUT'])
+            self._batch_pool = ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix='audit-batch')
+            self._jobs = JobQueue({
+                'audit_text': lambda payload: self.run_text_audit(payload['text']),
+                'audit_file': lambda payload: self.run_file_audit(payload['filename'], base64.b64decode(payload['content']))
+            }, db_path=config['JOBS_DB'])
+            self._pid = pid
+
+    @property
+    def results(self):
+        self._state()
+        return self._results
+
+    @property
+    def executor(self):
+        self._state()
+        return self._executor
+
+    @property
+    def jobs(self):
+        self._state()
+        return self._jobs
+
+    @property
+    def batch_pool(self):
+        self._state()
+        return self._batch_pool
+
+    def warm(self):
+        """Start this process's audit workers. Idempotent."""
+        if self._warm_pid != os.getpid():
+            self.executor.warm()
+            self._warm_pid = os.getpid()
+
+    def readiness(self):
+        checks = {'rules': True, 'workers': self._warm_pid == os.getpid()}
+        try:
+            self.jobs._conn().execute('SELECT 1').fetchone()
+            checks['jobs_db'] = True
+        except Exception:
+            checks['jobs_db'] = False
+        return checks
+
+    def run_text_audit(self, text, block=True, timing=None):
+        normalized = normalize_text(text)
+        result = self._audit('text', 'text', normalized, audit_executor.audit_text,
+                             (normalized, self.config['AUDIT_EXTRACT_BUDGET']), block, timing)
+        if normalized != text:
+            # Offsets are reported against the text as submitted
+            result = source_offsets(result, normalized_spans(text))
+        return result
+
+    def run_file_audit(self, filename, content, block=True, timing=None):
+        # The same bytes uploaded under another extension are cached separately
+        namespace = 'file' + os.path.splitext(filename)[1].lower()
+        return self._audit('file', namespace, content, audit_executor.audit_file,
+                           (filename, content, self.config['AUDIT_EXTRACT_BUDGET']), block, timing)
+
+    def _audit(self, source, namespace, content, fn, args, block, timing):
+        timing = {} if timing is None else timing
+        audits = self.metrics['audits']
+        try:
+            # Results cut short by the extraction budget are returned but not cached
+            result = self.results.cached(namespace, content, lambda: self.executor.run(fn, *args, block=block, timing=timing),
+                                         keep=lambda r: 'extraction' not in r)
+        except Saturated:
+            audits.inc(source, 'rejected')
+            raise
+        except Exception:
+            audits.inc(source, 'failed')
+            raise
+        if 'exec_seconds' not in timing:
+            audits.inc(source, 'cached')
+            return result
+        audits.inc(source, 'partial' if 'extraction' in result else 'computed')
+        stages = self.metrics['stages']
+        stages.observe(timing['queue_seconds'], 'queue')
+        for stage, seconds in timing['stages'].items():
+            stages.observe(seconds, stage)
+        return result
+
+bp = Blueprint('dashboard', __name__)
+
+def service():
+    return current_app.extensions['audit']
+
+def requested_view():
+    """The ?view= (summary, evidence or full; default full) and ?offsets= of the request."""
+    view = request.args.get('view', 'full')
+    if view not in VIEWS:
+        raise ValueError(f"view must be one of {', '.join(VIEWS)}")
+    return view, request.args.get('offsets', '').lower() in ('1', 'true', 'yes')
+
+def serialize(payload):
+    start = time.perf_counter()
+    response = jsonify(payload)
+    service().metrics['stages'].observe(time.perf_counter() - start, 'serialize')
+    return response
+
+@bp.before_app_request
+def start_timer():
+    g.request_start = time.perf_counter()
+
+@bp.after_request
+def compress(response):
+    start = time.perf_counter()
+    encoded = gzip_response(response, request.headers.get('Accept-Encoding'))
+    if encoded.headers.get('Content-Encoding') == 'gzip':
+        service().metrics['stages'].observe(time.perf_counter() - start, 'compress')
+    return encoded
+
+@bp.after_app_request
+def record_request(response):
+    metrics = service().metrics
+    route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    status, method, start = str(response.status_code), request.method, g.get('request_start')
+    request_bytes = request.content_length
+
+    def record():
+        # Runs once the body, including a streamed one, has been sent
+        metrics['requests'].inc(route, method, status)
+        if start is not None:
+            metrics['latency'].observe(time.perf_counter() - start, route)
+        if request_bytes:
+            metrics['request_bytes'].observe(request_bytes, route)
+        if response.content_length is not None:
+            metrics['response_bytes'].observe(response.content_length, route)
+    response.call_on_close(record)
+    return response
+
+def server_timing(timing):
+    """Server-Timing header value separating queue wait from execution."""
+    if not timing:
+        return 'cache;desc="result cache hit"'
+    return f"queue;dur={timing['queue_seconds'] * 1000:.1f}, exec;dur={timing['exec_seconds'] * 1000:.1f}"
+
+def saturated_response(e):
+    response = jsonify({'error': str(e), 'retry_after': e.retry_after})
+    response.status_code = e.status
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response
 
-@app.route('/')
+class ArchiveTooLarge(ValueError):
+    """A zip upload whose members would expand past MAX_ARCHIVE_BYTES."""
+
+def _member_reader(archive, info):
+    def read():
+        if info.file_size > MAX_MEMBER_BYTES:
+            raise ValueError(f'File is larger than {MAX_MEMBER_BYTES // (1024 * 1024)} MB')
+        return archive.read(info)
+    return read
+
+def batch_documents():
+    """
+    Read the documents of an /audit_batch request as (name, text, read)
+    tuples: a JSON array of texts or {"name", "text"} objects (optionally under
+    "documents"), or a zip archive of XML/PDF/TXT files uploaded as "file" or
+    sent as the request body. Zip members are only listed here; read() extracts
+    one when its audit runs, so at most BATCH_WORKERS are in memory at once.
+    """
+    if 'file' in request.files or request.mimetype in ('application/zip', 'application/x-zip-compressed'):
+        data = request.files['file'].read() if 'file' in request.files else request.get_data()
+        try:
+            archive = zipfile.ZipFile(io.BytesIO(data))
+        except zipfile.BadZipFile:
+            raise ValueError('Upload is not a zip archive')
+        documents = []
+        total = 0
+        for info in archive.infolist():
+            name = info.filename
+            if info.is_dir() or os.path.basename(name).startswith('.') or name.startswith('__MACOSX/'):
+                continue
+            if not name.lower().endswith(BATCH_EXTENSIONS):
+                continue
+            # Sizes come from the archive directory; extraction stops at the declared size
+            if info.file_size <= MAX_MEMBER_BYTES:
+                total += info.file_size
+            documents.append((name, None, _member_reader(archive, info)))
+        if total > MAX_ARCHIVE_BYTES:
+            raise ArchiveTooLarge(f'Archive expands to more than {MAX_ARCHIVE_BYTES // (1024 * 1024)} MB')
+        return documents
+
+    payload = request.get_json(silent=True)
+    if isinstance(payload, dict):
+        payload = payload.get('documents')
+    if not isinstance(payload, list):
+        raise ValueError('Expected a JSON array of documents or a zip archive')
+    documents = []
+    for i, item in enumerate(payload):
+        if isinstance(item, dict):
+            documents.append((item.get('name') or f'document_{i}', item.get('text'), None))
+        else:
+            documents.append((f'document_{i}', item, None))
+    return documents
+
+def audit_document(svc, name, text, read):
+    if read is not None:
+        return svc.run_file_audit(name, read())
+    if not isinstance(text, str):
+        raise ValueError('Document text is missing or not a string')
+    if not text.strip():
+        raise ValueError('No text provided')
+    return svc.run_text_audit(text)
+
+def job_links(job_id):
+    return {
+        'job_id': job_id,
+        'status_url': url_for('.job_status', job_id=job_id),
+        'result_url': url_for('.job_result', job_id=job_id)
+    }
+
+@bp.route('/')
 def index():
     return render_template('index.html')
 
-@app.route('/audit_text', methods=['POST'])
+@bp.route('/audit_text', methods=['POST'])
 def audit_text():
     try:
         data = request.json
         text = data.get('text', '')
         if not text:
             return jsonify({'error': 'No text provided'}), 400
+        try:
+            view, offsets = requested_view()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        features = extractor.extract_features(text)
-        feedback = engine.generate_feedback(features)
-        
-        return jsonify({
-            'features': features,
-            'feedback': feedback
-        })
+        timing = {}
+        result = service().run_text_audit(text, block=False, timing=timing)
+        response = serialize(shape(result, view, offsets))
+        response.headers['Server-Timing'] = server_timing(timing)
+        return response
+    except Saturated as e:
+        return saturated_response(e)
     except Exception as e:
-        app.logger.error(f"Error auditing text: {e}")
+        current_app.logger.error(f"Error auditing text: {e}")
         return jsonify({'error': str(e)}), 500
 
-@app.route('/audit_file', methods=['POST'])
+@bp.route('/audit_file', methods=['POST'])
 def audit_file():
     try:
         if 'file' not in request.files:
@@ -52,31 +428,185 @@ def audit_file():
         
         content = file.read()
         
-        # Try as XML first (PMC style)
+        # The worker detects PDF, then PMC XML, and falls back to plain text
+        timing = {}
         try:
-            root = etree.fromstring(content)
-            text = extract_methods_from_xml(root)
-        except Exception:
-            # Fallback to plain text
-            text = content.decode('utf-8', errors='ignore')
-            
-        if not text:
-            return jsonify({'error': 'Could not extract text from file'}), 400
-            
-        features = extractor.extract_features(text)
-        feedback = engine.generate_feedback(features)
-        
-        return jsonify({
-            'features': features,
-            'feedback': feedback,
-            'extracted_text_snippet': text[:500] + '...'
-        })
+            view, offsets = requested_view()
+            result = service().run_file_audit(file.filename, content, block=False, timing=timing)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        response = serialize(shape(result, view, offsets))
+        response.headers['Server-Timing'] = server_timing(timing)
+        return response
+    except Saturated as e:
+        return saturated_response(e)
     except Exception as e:
-        app.logger.error(f"Error auditing file: {e}")
+        current_app.logger.error(f"Error auditing file: {e}")
         return jsonify({'error': str(e)}), 500
 
+@bp.route('/audit_batch', methods=['POST'])
+def audit_batch():
+    """
+    Audit many documents in one request. Results are streamed as NDJSON, one
+    line per document in completion order ({"index", "name", "status",
+    "seconds", and "result" or "error"}), followed by a {"summary": ...} line.
+    """
+    try:
+        view, offsets = requested_view()
+        documents = batch_documents()
+    except ArchiveTooLarge as e:
+        return jsonify({'error': str(e)}), 413
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if not documents:
+        return jsonify({'error': 'No documents provided'}), 400
+    if len(documents) > MAX_BATCH_DOCUMENTS:
+        return jsonify({'error': f'At most {MAX_BATCH_DOCUMENTS} documents per batch'}), 413
+
+    # The pool threads run outside the application context
+    svc = service()
+
+    def timed(document):
+        start = time.perf_counter()
+        result = audit_document(svc, *document)
+        return result, time.perf_counter() - start
+
+    def generate():
+        start = time.perf_counter()
+        futures = {svc.batch_pool.submit(timed, document): i for i, document in enumerate(documents)}
+        ok = failed = 0
+        try:
+            for future in as_completed(futures):
+                i = futures[future]
+                line = {'index': i, 'name': documents[i][0]}
+                try:
+                    result, seconds = future.result()
+                    line.update(status='done', seconds=round(seconds, 3), result=shape(result, view, offsets))
+                    ok += 1
+                except Exception as e:
+                    line.update(status='failed', error=str(e))
+                    failed += 1
+                yield json.dumps(line) + '\n'
+            elapsed = time.perf_counter() - start
+            yield json.dumps({'summary': {
+                'documents': len(documents),
+                'done': ok,
+                'failed': failed,
+                'seconds': round(elapsed, 3),
+                'documents_per_second': round(len(documents) / elapsed, 2) if elapsed else None
+            }}) + '\n'
+        finally:
+            # The client went away: do not audit documents nobody will read
+            for future in futures:
+                future.cancel()
+
+    return Response(generate(), mimetype='application/x-ndjson')
+
+@bp.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify(service().results.stats())
+
+@bp.route('/executor/stats', methods=['GET'])
+def executor_stats():
+    return jsonify(service().executor.stats())
+
+@bp.route('/jobs/audit_text', methods=['POST'])
+def submit_text_job():
+    data = request.json or {}
+    text = data.get('text', '')
+    if not text:
+        return jsonify({'error': 'No text provided'}), 400
+    job_id = service().jobs.submit('audit_text', {'text': text}, size=len(text))
+    return jsonify(job_links(job_id)), 202
+
+@bp.route('/jobs/audit_file', methods=['POST'])
+def submit_file_job():
+    if 'file' not in request.files:
+        return jsonify({'error': 'No file uploaded'}), 400
+    file = request.files['file']
+    if file.filename == '':
+        return jsonify({'error': 'Empty filename'}), 400
+    content = file.read()
+    job_id = service().jobs.submit('audit_file', {
+        'filename': file.filename,
+        'content': base64.b64encode(content).decode('ascii')
+    }, size=len(content))
+    return jsonify(job_links(job_id)), 202
+
+@bp.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    job = service().jobs.status(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    return jsonify(job)
+
+@bp.route('/jobs/<job_id>/result', methods=['GET'])
+def job_result(job_id):
+    try:
+        view, offsets = requested_view()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    status, result = service().jobs.result(job_id)
+    if status is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    if status == 'failed':
+        return jsonify({'status': status, 'error': service().jobs.status(job_id)['error']}), 500
+    if status != 'done':
+        # Not ready yet: tell the client where to poll
+        return jsonify({'status': status, **job_links(job_id)}), 202
+    return jsonify(shape(result, view, offsets))
+
+@bp.route('/metrics', methods=['GET'])
+def metrics():
+    registry = service().metrics['registry']
+    return Response(registry.render(), mimetype=None, content_type=registry.CONTENT_TYPE)
+
+@bp.route('/healthz', methods=['GET'])
+def healthz():
+    """Liveness: the process is up and serving requests."""
+    return jsonify({'status': 'ok', 'pid': os.getpid()})
+
+@bp.route('/readyz', methods=['GET'])
+def readyz():
+    """
+    Readiness: the rule set loaded and this process's audit workers are
+    running. The first probe starts the workers if nothing else has.
+    """
+    svc = service()
+    try:
+        svc.warm()
+    except Exception as e:
+        current_app.logger.error(f"Audit workers failed to start: {e}")
+    checks = svc.readiness()
+    ready = all(checks.values())
+    return jsonify({'ready': ready, 'checks': checks, 'ruleset': svc.fingerprint}), 200 if ready else 503
+
+def create_app(config=None, warm=False):
+    """
+    Build the dashboard app. Settings come from DEFAULT_CONFIG, then the
+    environment, then config. The rule set is compiled and checked here, so
+    a broken rule set stops start-up instead of failing requests. With
+    warm=True this process's audit workers are started before returning.
+    """
+    app = Flask(__name__)
+    app.config.update(DEFAULT_CONFIG)
+    app.config.update(config_from_env())
+    app.config.update(config or {})
+    # Compact, unsorted JSON: audit results are large and only machines read them
+    app.json.compact = True
+    app.json.sort_keys = False
+
+    svc = AuditService(app.config)
+    svc.check()
+    app.extensions['audit'] = svc
+    app.register_blueprint(bp)
+    if warm:
+        svc.warm()
+    return app
+
 if __name__ == '__main__':
-    # Increase max content length for larger XMLs
-    app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024 # 16MB
+    # Start the audit workers before the server spawns request threads
+    app = create_app(warm=True)
     print("Dashboard starting at http://127.0.0.1:5000")
-    app.run(debug=True, port=5000)
+    # The reloader would start a second process with its own worker pool
+    app.run(debug=True, port=5000, use_reloader=False)
@@ -0,0 +1,247 @@
+import io
+import os
+import math
+import time
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from lxml import etree
+from feature_extractor import FeatureExtractor
+from rule_based_feedback import RuleBasedFeedbackEngine
+from xml_parser import extract_methods_from_xml
+from run_pipeline import collect_text
+
+# Per-process state, built once by _init_worker rather than once per request.
+# Workers forked after share() inherit the parent's instances instead.
+_extractor = None
+_engine = None
+
+def _init_worker():
+    global _extractor, _engine
+    if _extractor is None:
+        _extractor = FeatureExtractor()
+        _engine = RuleBasedFeedbackEngine()
+
+# Stage durations of the audit running on this thread, returned with its result
+_stages = threading.local()
+
+def _stage(name, start):
+    stages = getattr(_stages, "times", None)
+    if stages is not None:
+        stages[name] = stages.get(name, 0.0) + time.perf_counter() - start
+
+def share(extractor, engine):
+    """Use already-built instances for audits in this process and any forked from it."""
+    global _extractor, _engine
+    _extractor, _engine = extractor, engine
+
+def extract_file_text(filename, content):
+    """Get auditable text from an uploaded file: PDF, then PMC XML, then plain text."""
+    if content[:5] == b'%PDF-':
+        try:
+            from ingest_pdf import extract_text_from_pdf
+        except ImportError:
+            raise ValueError('PDF support requires pypdf')
+        data = extract_text_from_pdf(io.BytesIO(content), source_name=filename)
+        return collect_text(data) if data else ""
+    try:
+        etree.fromstring(content)
+        data = extract_methods_from_xml(io.BytesIO(content), source_name=filename)
+        text = collect_text(data) if data else ""
+    except Exception:
+        # Fallback to plain text
+        text = content.decode('utf-8', errors='ignore')
+    return text
+
+def audit_text(text, budget=None):
+    """
+    Audit text. With a budget (seconds) for extraction, categories it could
+    not finish are listed under result['extraction'] and their findings are
+    incomplete.
+    """
+    if _extractor is None:
+        _init_worker()
+    start = time.perf_counter()
+    features = _extractor.extract_features(text, budget)
+    _stage("extract", start)
+    start = time.perf_counter()
+    feedback = _engine.generate_feedback(features)
+    _stage("rules", start)
+    result = {
+        'features': features,
+        'feedback': feedback
+    }
+    skipped = [feature for feature, values in features.items() if values.get('skipped')]
+    if skipped:
+        result['extraction'] = {
+            'complete': False,
+            'budget_seconds': budget,
+            'skipped': skipped,
+            'message': 'Extraction ran out of time; findings for the skipped categories may be missing.'
+        }
+    return result
+
+def audit_file(filename, content, budget=None):
+    start = time.perf_counter()
+    text = extract_file_text(filename, content)
+    _stage("parse", start)
+    if not text:
+        raise ValueError('Could not extract text from file')
+    result = audit_text(text, budget)
+    result['extracted_text_snippet'] = text[:500] + '...'
+    return result
+
+def _timed(fn, args):
+    # time.time() rather than perf_counter so the parent can compare it with its own clock
+    started = time.time()
+    _stages.times = {}
+    try:
+        result = fn(*args)
+        return result, started, time.time(), _stages.times
+    finally:
+        _stages.times = None
+
+def _ready():
+    return os.getpid()
+
+class Saturated(Exception):
+    """The executor cannot take the request; status is the HTTP status to answer with."""
+    def __init__(self, message, status, retry_after):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+class AuditExecutor:
+    """
+    Runs audits on a bounded pool of worker processes, each holding a warm
+    FeatureExtractor, so CPU-bound regex work does not serialize request
+    threads under the GIL.
+
+    At most workers + max_queue audits are admitted at once. A non-blocking
+    submit beyond that raises Saturated with status 429; a blocking one waits
+    up to queue_timeout for a slot and then raises Saturated with status 503,
+    as does a broken pool. Both carry a Retry-After estimate from the queue
+    length and the mean execution time. An audit still running after timeout
+    seconds gets 503 too, and the pool's processes are killed and replaced so
+    a runaway match cannot keep a worker busy; audits sharing the pool at that
+    moment fail with 503 as well. Queue wait and execution time are measured
+    separately for every audit. workers=0 runs audits inline, with no timeout.
+    The worker processes are started on first use (or by warm()), so an
+    executor built before a fork starts its pool in the child.
+    """
+    def __init__(self, workers=None, max_queue=None, queue_timeout=30.0, timeout=120.0):
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.max_queue = 2 * max(1, self.workers) if max_queue is None else max_queue
+        self.queue_timeout = queue_timeout
+        self.timeout = timeout
+        self.pool = None
+        self._slots = threading.BoundedSemaphore(max(1, self.workers) + self.max_queue)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.rejected = {429: 0, 503: 0}
+        self.recycled = 0
+        self.timings = []
+
+    def _pool(self):
+        with self._lock:
+            if self.pool is None and self.workers:
+                self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+            return self.pool
+
+    def _recycle(self, pool):
+        """Kill pool's processes, one of which may be stuck, so the next audit starts a fresh pool."""
+        with self._lock:
+            if self.pool is not pool:
+                return
+            self.pool = None
+            self.recycled += 1
+        processes = list((pool._processes or {}).values())
+        pool.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            process.kill()
+
+    def warm(self):
+        """Start every worker and wait until each has built its extractor."""
+        pool = self._pool()
+        if pool is None:
+            _init_worker()
+            return [os.getpid()]
+        futures = [pool.submit(_ready) for _ in range(self.workers)]
+        return sorted(set(f.result() for f in futures))
+
+    def retry_after(self):
+        with self._lock:
+            recent = [exec_s for _, exec_s in self.timings[-100:]]
+            queued = self.in_flight
+        mean = sum(recent) / len(recent) if recent else 1.0
+        return max(1, math.ceil(queued * mean / max(1, self.workers)))
+
+    def _reject(self, message, status):
+        with self._lock:
+            self.rejected[status] += 1
+        raise Saturated(message, status, self.retry_after())
+
+    def run(self, fn, *args, block=True, timing=None):
+        """
+        Run fn(*args) on the pool and return its result. timing, if given, is
+        filled with queue_seconds, exec_seconds and the per-stage seconds
+        (parse, extract, rules) measured inside the worker.
+        """
+        submitted = time.time()
+        if block:
+            admitted = self._slots.acquire(timeout=self.queue_timeout)
+        else:
+            admitted = self._slots.acquire(blocking=False)
+        if not admitted:
+            if block:
+                self._reject('Audit queue is full; timed out waiting for a slot', 503)
+            self._reject('Audit queue is full', 429)
+
+        with self._lock:
+            self.in_flight += 1
+        try:
+            pool = self._pool()
+            if pool is None:
+                result, started, finished, stages = _timed(fn, args)
+            else:
+                try:
+                    result, started, finished, stages = pool.submit(_timed, fn, args).result(timeout=self.timeout)
+                except BrokenProcessPool:
+                    self._recycle(pool)
+                    self._reject('Audit workers are unavailable', 503)
+                except TimeoutError:
+                    self._recycle(pool)
+                    self._reject(f'Audit did not finish within {self.timeout}s', 503)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+            self._slots.release()
+
+        queue_s, exec_s = max(0.0, started - submitted), finished - started
+        with self._lock:
+            self.timings.append((queue_s, exec_s))
+            del self.timings[:-1000]
+        if timing is not None:
+            timing.update(queue_seconds=queue_s, exec_seconds=exec_s, stages=stages)
+        return result
+
+    def stats(self):
+        with self._lock:
+            timings = list(self.timings)
+            stats = {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "in_flight": self.in_flight,
+                "rejected": dict(self.rejected),
+                "recycled": self.recycled
+            }
+        for i, name in enumerate(("queue", "exec")):
+            values = sorted(t[i] for t in timings)
+            stats[f"{name}_mean_ms"] = round(sum(values) / len(values) * 1000, 2) if values else 0.0
+            stats[f"{name}_p95_ms"] = round(values[min(len(values) - 1, int(len(values) * 0.95))] * 1000, 2) if values else 0.0
+        stats["audits"] = len(timings)
+        return stats
+
+    def shutdown(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
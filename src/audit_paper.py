@@ -5,6 +5,33 @@ import json
 from feature_extractor import FeatureExtractor
 from feedback_generator import FeedbackGenerator
 
+def print_deterministic(f):
+    print("\n" + "="*50)
+    print("AUDIT RESULTS")
+    print("="*50)
+    print(f"Overall Score: {f.get('overall_score', 'N/A')}/10")
+    print(f"Rigor Rating:  {f.get('rigor_rating', 'N/A')}")
+    print("\nCRITICAL GAPS (Deterministic):")
+    for gap in f.get("critical_gaps", []):
+        print(f" - {gap}")
+    print("\nSTRENGTHS:")
+    for strength in f.get("strengths", []):
+        print(f" - {strength}")
+
+def print_llm(f):
+    print("\n" + "="*50)
+    print("AUDIT RESULTS (LLM-enhanced)")
+    print("="*50)
+    print(f"Overall Score: {f.get('overall_score', 'N/A')}/10")
+    print(f"Rigor Rating:  {f.get('rigor_rating', 'N/A')}")
+    print("\nCRITICAL GAPS:")
+    for gap in f.get("critical_gaps", []):
+        print(f" - {gap}")
+    print("\nACTIONABLE RECOMMENDATIONS:")
+    for rec in f.get("actionable_recommendations", []):
+        print(f" - {rec.get('item')}: {rec.get('issue')}")
+        print(f"   Fix: {rec.get('recommendation')}")
+
 def main():
     parser = argparse.ArgumentParser(description="AFSR: Automated Feedback on Statistical Reporting")
     group = parser.add_mutually_exclusive_group(required=True)
@@ -12,6 +39,9 @@ def main():
     group.add_argument("--text", help="Raw text of the Methods section")
     parser.add_argument("--llm", action="store_true", help="Enable LLM-enhanced feedback (requires OPENAI_API_KEY)")
     parser.add_argument("--output", help="Path to save the feedback (JSON)")
+    parser.add_argument("--refresh-llm", action="store_true", help="Ignore any cached LLM response for this input")
+    parser.add_argument("--llm-budget", type=float, metavar="SECONDS",
+                        help="With --llm, show the deterministic audit first and wait at most this long for the LLM review")
 
     args = parser.parse_args()
 
@@ -40,7 +70,7 @@ def main():
     features = extractor.extract_features(content)
 
     # 2. Generate Feedback
-    generator = FeedbackGenerator()
+    generator = FeedbackGenerator(force_refresh=args.refresh_llm)
     # Force deterministic if --llm is not set, or if API key is missing
     if not args.llm:
         # Temporarily unset API key for this call to ensure deterministic output
@@ -48,37 +78,27 @@ def main():
         generator.api_key = None
         feedback = generator.generate_feedback(title, content, features)
         generator.api_key = original_api_key
+    elif args.llm_budget is not None:
+        print(f"Generating LLM-enhanced feedback (waiting up to {args.llm_budget}s)...")
+        feedback = generator.generate_with_deadline(title, content, features, args.llm_budget,
+                                                    on_baseline=print_deterministic)
     else:
         print("Generating LLM-enhanced feedback (this may take a moment)...")
         feedback = generator.generate_feedback(title, content, features)
 
     # 3. Display Results
-    print("\n" + "="*50)
-    print("AUDIT RESULTS")
-    print("="*50)
-    
-    # Check if we have LLM feedback or just deterministic
     if "llm_enhanced_feedback" in feedback:
-        f = feedback["llm_enhanced_feedback"]
-        print(f"Overall Score: {f.get('overall_score', 'N/A')}/10")
-        print(f"Rigor Rating:  {f.get('rigor_rating', 'N/A')}")
-        print("\nCRITICAL GAPS:")
-        for gap in f.get("critical_gaps", []):
-            print(f" - {gap}")
-        print("\nACTIONABLE RECOMMENDATIONS:")
-        for rec in f.get("actionable_recommendations", []):
-            print(f" - {rec.get('item')}: {rec.get('issue')}")
-            print(f"   Fix: {rec.get('recommendation')}")
+        print_llm(feedback["llm_enhanced_feedback"])
+    elif not (args.llm and args.llm_budget is not None):
+        # if api_key was None, it returns the deterministic flat structure
+        print_deterministic(feedback.get("deterministic_baseline", feedback))
     else:
-        f = feedback # if api_key was None, it returns the deterministic flat structure
-        print(f"Overall Score: {f.get('overall_score', 'N/A')}/10")
-        print(f"Rigor Rating:  {f.get('rigor_rating', 'N/A')}")
-        print("\nCRITICAL GAPS (Deterministic):")
-        for gap in f.get("critical_gaps", []):
-            print(f" - {gap}")
-        print("\nSTRENGTHS:")
-        for strength in f.get("strengths", []):
-            print(f" - {strength}")
+        # The deterministic audit was already shown by on_baseline
+        print(f"\n{feedback.get('note') or feedback.get('error')}")
+    if "timing" in feedback:
+        timing = feedback["timing"]
+        print(f"\nTiming: deterministic {timing['baseline_seconds']}s, LLM {timing.get('llm_seconds', '-')}s "
+              f"({timing['llm']}), total {timing.get('total_seconds', timing['baseline_seconds'])}s")
 
     if args.output:
         with open(args.output, "w", encoding="utf-8") as f:
@@ -0,0 +1,84 @@
+import os
+import json
+import time
+import threading
+
+CHECKPOINT_DIR = "data/checkpoints"
+
+def atomic_write(path, data):
+    """
+    Write bytes so that readers only ever see the old or the complete new file:
+    write to a temporary file in the same folder, fsync, then rename over path.
+    """
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def atomic_write_json(path, payload, indent=2):
+    atomic_write(path, json.dumps(payload, indent=indent).encode("utf-8"))
+
+class Checkpoint:
+    """
+    Durable per-document progress for one pipeline stage, stored as an
+    append-only JSON-lines ledger. Each line records the latest outcome for a
+    document ("done", "skipped" or "failed"); on load the last line for a name wins, so a
+    crash mid-append loses at most the entry being written.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.status = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # Truncated final line from an interrupted write
+                    self.status[entry["name"]] = entry
+
+    def is_done(self, name, output_path=None):
+        """True if name needs no more work: done (with its output still present) or skipped."""
+        entry = self.status.get(name)
+        if not entry or entry["status"] == "failed":
+            return False
+        if entry["status"] == "skipped":
+            return True
+        return output_path is None or os.path.exists(output_path)
+
+    def mark(self, name, status, **info):
+        entry = dict(info, name=name, status=status, time=time.time())
+        folder = os.path.dirname(self.path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self.status[name] = entry
+
+    def failed(self):
+        return sorted(name for name, entry in self.status.items() if entry["status"] == "failed")
+
+    def reset(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.status = {}
+
+def stage_checkpoint(stage, resume=False, folder=CHECKPOINT_DIR):
+    """
+    Open the checkpoint for a stage. A fresh (non-resume) run clears it so that
+    completion is only ever recorded for work done by the current run or the
+    runs it resumes.
+    """
+    checkpoint = Checkpoint(os.path.join(folder, f"{stage}.jsonl"))
+    if not resume:
+        checkpoint.reset()
+    elif checkpoint.status:
+        done = len(checkpoint.status) - len(checkpoint.failed())
+        print(f"Resuming '{stage}': {done} completed, {len(checkpoint.failed())} to retry.")
+    return checkpoint
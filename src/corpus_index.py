@@ -0,0 +1,186 @@
+import os
+import json
+import glob
+import sqlite3
+import argparse
+from corpus_store import split_record
+
+INDEX_PATH = "data/corpus_index.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS papers (
+    filename TEXT PRIMARY KEY,
+    pmcid TEXT,
+    title TEXT,
+    study_type TEXT,
+    score REAL,
+    rating TEXT,
+    non_primary INTEGER
+);
+CREATE TABLE IF NOT EXISTS features (
+    filename TEXT NOT NULL,
+    feature TEXT NOT NULL,
+    present INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (filename, feature)
+);
+CREATE TABLE IF NOT EXISTS gaps (
+    filename TEXT NOT NULL,
+    message TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS strengths (
+    filename TEXT NOT NULL,
+    message TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_papers_type_score ON papers (study_type, score);
+CREATE INDEX IF NOT EXISTS idx_papers_score ON papers (score);
+CREATE INDEX IF NOT EXISTS idx_features_lookup ON features (feature, present, filename);
+CREATE INDEX IF NOT EXISTS idx_gaps_message ON gaps (message, filename);
+CREATE INDEX IF NOT EXISTS idx_gaps_file ON gaps (filename);
+CREATE INDEX IF NOT EXISTS idx_strengths_message ON strengths (message, filename);
+CREATE INDEX IF NOT EXISTS idx_strengths_file ON strengths (filename);
+"""
+
+class CorpusIndex:
+    """
+    Embedded SQLite index of audited papers: study type, score, feature
+    presence/counts, gaps and strengths. Kept up to date by the pipeline so
+    questions about the corpus do not require walking data/feedback.
+    """
+    def __init__(self, path=INDEX_PATH):
+        self.path = path
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def connect(self):
+        folder = os.path.dirname(self.path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+        conn = sqlite3.connect(self.path)
+        conn.row_factory = sqlite3.Row
+        conn.executescript(SCHEMA)
+        return conn
+
+    def upsert(self, records):
+        """Insert or replace papers. records is a list of (filename, feedback data) pairs."""
+        if not records:
+            return
+        conn = self.connect()
+        try:
+            with conn:
+                for filename, data in records:
+                    core, _ = split_record(filename, data)
+                    conn.execute("DELETE FROM features WHERE filename = ?", (filename,))
+                    conn.execute("DELETE FROM gaps WHERE filename = ?", (filename,))
+                    conn.execute("DELETE FROM strengths WHERE filename = ?", (filename,))
+                    conn.execute(
+                        "INSERT OR REPLACE INTO papers VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (filename, core["pmcid"], core["title"], core["study_type"], core["score"], core["rating"],
+                         int(any("Non-Primary Research" in s for s in core["strengths"])))
+                    )
+                    conn.executemany(
+                        "INSERT INTO features VALUES (?, ?, ?, ?)",
+                        [(filename, feature, int(values.get("present", False)), values.get("count", 0))
+                         for feature, values in (data.get("features") or {}).items()]
+                    )
+                    conn.executemany("INSERT INTO gaps VALUES (?, ?)", [(filename, g) for g in core["gaps"]])
+                    conn.executemany("INSERT INTO strengths VALUES (?, ?)", [(filename, s) for s in core["strengths"]])
+        finally:
+            conn.close()
+
+    def rebuild_from_folder(self, feedback_dir="data/feedback"):
+        """Recreate the index from a folder of feedback JSON files."""
+        if self.exists():
+            os.remove(self.path)
+        records = []
+        for fpath in sorted(glob.glob(os.path.join(feedback_dir, "*.json"))):
+            with open(fpath, "r", encoding="utf-8") as f:
+                records.append((os.path.basename(fpath), json.load(f)))
+        self.upsert(records)
+        return len(records)
+
+    def filenames(self):
+        conn = self.connect()
+        try:
+            return [row["filename"] for row in conn.execute("SELECT filename FROM papers ORDER BY filename")]
+        finally:
+            conn.close()
+
+    def query(self, has=(), missing=(), study_type=None, min_score=None, max_score=None, gap=None, strength=None, limit=None):
+        """
+        Return papers matching every given condition, lowest score first.
+        has/missing are feature names; gap/strength are substrings of a message.
+        """
+        sql = ["SELECT p.filename, p.pmcid, p.title, p.study_type, p.score, p.rating FROM papers p WHERE 1 = 1"]
+        params = []
+        for feature in has:
+            sql.append("AND EXISTS (SELECT 1 FROM features f WHERE f.filename = p.filename AND f.feature = ? AND f.present = 1)")
+            params.append(feature)
+        for feature in missing:
+            sql.append("AND NOT EXISTS (SELECT 1 FROM features f WHERE f.filename = p.filename AND f.feature = ? AND f.present = 1)")
+            params.append(feature)
+        if study_type:
+            sql.append("AND p.study_type = ?")
+            params.append(study_type)
+        if min_score is not None:
+            sql.append("AND p.score >= ?")
+            params.append(min_score)
+        if max_score is not None:
+            sql.append("AND p.score < ?")
+            params.append(max_score)
+        if gap:
+            sql.append("AND EXISTS (SELECT 1 FROM gaps g WHERE g.filename = p.filename AND g.message LIKE ?)")
+            params.append(f"%{gap}%")
+        if strength:
+            sql.append("AND EXISTS (SELECT 1 FROM strengths s WHERE s.filename = p.filename AND s.message LIKE ?)")
+            params.append(f"%{strength}%")
+        sql.append("ORDER BY p.score, p.filename")
+        if limit:
+            sql.append("LIMIT ?")
+            params.append(limit)
+
+        conn = self.connect()
+        try:
+            return [dict(row) for row in conn.execute(" ".join(sql), params)]
+        finally:
+            conn.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query the SQLite corpus index")
+    parser.add_argument("--index", default=INDEX_PATH)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", help="Rebuild the index from data/feedback")
+    build.add_argument("--feedback-dir", default="data/feedback")
+
+    query = sub.add_parser("query", help="List papers matching all conditions")
+    query.add_argument("--has", action="append", default=[], help="Feature that must be present (repeatable)")
+    query.add_argument("--missing", action="append", default=[], help="Feature that must be absent (repeatable)")
+    query.add_argument("--study-type", help="Clinical Trial, Observational, Basic Science or Review/Meta")
+    query.add_argument("--min-score", type=float)
+    query.add_argument("--max-score", type=float, help="Exclusive upper bound on the score")
+    query.add_argument("--gap", help="Substring of a critical gap message")
+    query.add_argument("--strength", help="Substring of a strength message")
+    query.add_argument("--limit", type=int)
+    query.add_argument("--count", action="store_true", help="Only print the number of matches")
+
+    args = parser.parse_args()
+    index = CorpusIndex(args.index)
+
+    if args.command == "build":
+        count = index.rebuild_from_folder(args.feedback_dir)
+        print(f"Indexed {count} papers into {args.index}")
+    else:
+        if not index.exists():
+            print(f"Index not found at {args.index}. Run: python src/corpus_index.py build")
+            exit(1)
+        rows = index.query(args.has, args.missing, args.study_type, args.min_score, args.max_score, args.gap, args.strength, args.limit)
+        if args.count:
+            print(len(rows))
+        else:
+            print(f"{'File':<20} | {'Score':<5} | {'Type':<15} | Title")
+            print("-" * 90)
+            for r in rows:
+                print(f"{r['filename']:<20} | {r['score']:<5} | {r['study_type']:<15} | {(r['title'] or '')[:40]}")
+            print(f"\n{len(rows)} matching papers.")
@@ -0,0 +1,261 @@
+import os
+import json
+import glob
+import argparse
+from checkpoint import atomic_write_json
+
+CORPUS_DIR = "data/corpus"
+# The feedback folder the store mirrors
+FEEDBACK_DIR = "data/feedback"
+
+# Column groups. Report tools only need the core group; evidence text
+# (quotes, examples, recommendations) is kept apart so it is never parsed
+# unless a caller asks for it.
+CORE_COLUMNS = ["filename", "pmcid", "title", "score", "rating", "study_type", "gaps", "strengths"]
+EVIDENCE_COLUMNS = ["filename", "gap_evidence", "strength_evidence", "recommendations", "features"]
+
+def infer_study_type(strength_messages):
+    """Classify a paper from the context strengths emitted by the rule engine."""
+    text = " ".join(strength_messages).lower()
+    if "observational" in text:
+        return "Observational"
+    if "basic science" in text:
+        return "Basic Science"
+    if "non-primary research" in text:
+        return "Review/Meta"
+    return "Clinical Trial"
+
+def _feedback_section(feedback):
+    # LLM-enhanced records nest the rule output under deterministic_baseline
+    if "overall_score" not in feedback and "deterministic_baseline" in feedback:
+        return feedback["deterministic_baseline"]
+    return feedback
+
+def _message(item):
+    return item["message"] if isinstance(item, dict) else str(item)
+
+def _evidence(item):
+    return item.get("evidence", "") if isinstance(item, dict) else ""
+
+def split_record(filename, data):
+    """Flatten one feedback file into a (core, evidence) pair of rows."""
+    feedback = _feedback_section(data.get("feedback", {}))
+    features = data.get("features") or {}
+    gaps = feedback.get("critical_gaps", [])
+    strengths = feedback.get("strengths", [])
+    strength_messages = [_message(s) for s in strengths]
+
+    core = {
+        "filename": filename,
+        "pmcid": data.get("pmcid"),
+        "title": data.get("title") or "",
+        "score": feedback.get("overall_score", 0),
+        "rating": feedback.get("rigor_rating", "Unknown"),
+        "study_type": infer_study_type(strength_messages),
+        "gaps": [_message(g) for g in gaps],
+        "strengths": strength_messages
+    }
+    for feature, values in features.items():
+        core[f"present.{feature}"] = values.get("present", False)
+        core[f"count.{feature}"] = values.get("count", 0)
+
+    evidence = {
+        "filename": filename,
+        "gap_evidence": [_evidence(g) for g in gaps],
+        "strength_evidence": [_evidence(s) for s in strengths],
+        "recommendations": feedback.get("actionable_recommendations", []),
+        "features": features
+    }
+    return core, evidence
+
+def _to_columns(rows, names):
+    # Flag/count columns vary with the rule set, so take the union across rows
+    for row in rows:
+        for name in row:
+            if name not in names:
+                names.append(name)
+    return {name: [row.get(name, _default(name)) for row in rows] for name in names}
+
+def _default(name):
+    if name.startswith("present."):
+        return False
+    if name.startswith("count."):
+        return 0
+    return None
+
+class CorpusStore:
+    """
+    Columnar store of per-paper audit results under data/corpus.
+
+    Each append writes one segment made of two column-group files
+    (part-NNNNNN.core.json and part-NNNNNN.evidence.json). Loading reads one
+    file per segment rather than one per paper; if a paper appears in several
+    segments the most recent row wins. compact() folds all segments into one.
+    """
+    def __init__(self, directory=CORPUS_DIR):
+        self.directory = directory
+
+    def exists(self):
+        return bool(self._segments())
+
+    def _segments(self):
+        return sorted(glob.glob(os.path.join(self.directory, "part-*.core.json")))
+
+    def _next_segment(self):
+        segments = self._segments()
+        if not segments:
+            return 1
+        return int(os.path.basename(segments[-1]).split("-")[1].split(".")[0]) + 1
+
+    def append(self, records):
+        """
+        Append audited papers. records is a list of (filename, data) pairs where
+        data has the same shape as a data/feedback JSON file.
+        """
+        if not records:
+            return
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+
+        cores, evidences = [], []
+        for filename, data in records:
+            core, evidence = split_record(filename, data)
+            cores.append(core)
+            evidences.append(evidence)
+
+        base = os.path.join(self.directory, f"part-{self._next_segment():06d}")
+        # Evidence first: a segment only becomes visible once its core file exists
+        atomic_write_json(base + ".evidence.json", {"rows": len(evidences), "columns": _to_columns(evidences, list(EVIDENCE_COLUMNS))}, indent=None)
+        atomic_write_json(base + ".core.json", {"rows": len(cores), "columns": _to_columns(cores, list(CORE_COLUMNS))}, indent=None)
+
+    def _load_group(self, suffix):
+        columns = {}
+        total = 0
+        for core_path in self._segments():
+            path = core_path.replace(".core.json", suffix)
+            with open(path, "r", encoding="utf-8") as f:
+                segment = json.load(f)
+            for name, values in segment["columns"].items():
+                if name not in columns:
+                    columns[name] = [_default(name)] * total
+                columns[name].extend(values)
+            total += segment["rows"]
+            for name, values in columns.items():
+                if len(values) < total:
+                    values.extend([_default(name)] * (total - len(values)))
+        return columns, total
+
+    def load(self, evidence=False):
+        """
+        Load the corpus as a dict of column name -> list of values, one entry
+        per paper. Evidence columns are only read when evidence=True.
+        """
+        columns, total = self._load_group(".core.json")
+        if evidence:
+            evidence_columns, _ = self._load_group(".evidence.json")
+            for name, values in evidence_columns.items():
+                if name != "filename":
+                    columns[name] = values
+
+        # Keep only the latest row for each paper
+        latest = {}
+        for i, filename in enumerate(columns.get("filename", [])):
+            latest[filename] = i
+        if len(latest) < total:
+            keep = sorted(latest.values())
+            columns = {name: [values[i] for i in keep] for name, values in columns.items()}
+        return columns
+
+    def compact(self):
+        """Rewrite all segments as a single segment with one row per paper."""
+        segments = self._segments()
+        if len(segments) <= 1:
+            return
+        columns = self.load(evidence=True)
+        rows = [{name: values[i] for name, values in columns.items()} for i in range(len(columns["filename"]))]
+        cores = [{k: v for k, v in row.items() if k not in EVIDENCE_COLUMNS or k == "filename"} for row in rows]
+        evidences = [{k: row[k] for k in EVIDENCE_COLUMNS} for row in rows]
+
+        base = os.path.join(self.directory, f"part-{self._next_segment():06d}")
+        atomic_write_json(base + ".evidence.json", {"rows": len(evidences), "columns": _to_columns(evidences, list(EVIDENCE_COLUMNS))}, indent=None)
+        atomic_write_json(base + ".core.json", {"rows": len(cores), "columns": _to_columns(cores, list(CORE_COLUMNS))}, indent=None)
+        for core_path in segments:
+            os.remove(core_path)
+            os.remove(core_path.replace(".core.json", ".evidence.json"))
+
+    def build_from_folder(self, feedback_dir="data/feedback"):
+        """Replace the store with the contents of a folder of feedback JSON files."""
+        records = list(_read_feedback_folder(feedback_dir))
+        for core_path in self._segments():
+            os.remove(core_path)
+            os.remove(core_path.replace(".core.json", ".evidence.json"))
+        self.append(records)
+        return len(records)
+
+def _read_feedback_folder(feedback_dir):
+    for fpath in sorted(glob.glob(os.path.join(feedback_dir, "*.json"))):
+        with open(fpath, "r", encoding="utf-8") as f:
+            yield os.path.basename(fpath), json.load(f)
+
+def _newer_feedback(store, feedback_dir):
+    """Whether any feedback file was written after the store's newest segment."""
+    if not os.path.exists(feedback_dir):
+        return False
+    updated = max(os.path.getmtime(path) for path in store._segments())
+    with os.scandir(feedback_dir) as entries:
+        return any(entry.name.endswith(".json") and entry.stat().st_mtime > updated for entry in entries)
+
+def load_corpus(evidence=False, directory=CORPUS_DIR, feedback_dir=FEEDBACK_DIR):
+    """
+    Columnar view of the audited corpus for report tools. Reads the corpus
+    store when it exists, mirrors feedback_dir (data/feedback) and is up to
+    date with it; otherwise the feedback files are parsed directly. Writers
+    that bypass the store (feedback_generator.py, rule_based_feedback.py,
+    llm_batch.py) therefore never leave the reports showing old results.
+    """
+    store = CorpusStore(directory)
+    if os.path.normpath(feedback_dir) == os.path.normpath(FEEDBACK_DIR) and store.exists():
+        if not _newer_feedback(store, feedback_dir):
+            return store.load(evidence=evidence)
+        print(f"Corpus store {directory} is older than {feedback_dir}; reading the feedback files "
+              f"(rebuild it with: python src/corpus_store.py build)")
+
+    cores, evidences = [], []
+    for filename, data in _read_feedback_folder(feedback_dir):
+        core, ev = split_record(filename, data)
+        cores.append(core)
+        evidences.append(ev)
+    columns = _to_columns(cores, list(CORE_COLUMNS))
+    if evidence:
+        ev_columns = _to_columns(evidences, list(EVIDENCE_COLUMNS))
+        columns.update({k: v for k, v in ev_columns.items() if k != "filename"})
+    return columns
+
+def iter_rows(columns):
+    """Yield one dict per paper from a columnar corpus."""
+    names = list(columns)
+    for values in zip(*(columns[name] for name in names)):
+        yield dict(zip(names, values))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the columnar corpus store")
+    parser.add_argument("command", choices=["build", "compact", "stats"])
+    parser.add_argument("--feedback-dir", default="data/feedback")
+    parser.add_argument("--store", default=CORPUS_DIR)
+    args = parser.parse_args()
+
+    store = CorpusStore(args.store)
+    if args.command == "build":
+        count = store.build_from_folder(args.feedback_dir)
+        print(f"Built corpus store with {count} papers at {args.store}")
+    elif args.command == "compact":
+        store.compact()
+        print(f"Compacted corpus store at {args.store}")
+    else:
+        import time
+        start = time.perf_counter()
+        columns = store.load()
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"Papers: {len(columns.get('filename', []))}")
+        print(f"Segments: {len(store._segments())}")
+        print(f"Core load time: {elapsed:.1f} ms")
@@ -0,0 +1,134 @@
+import os
+import time
+import hashlib
+import sqlite3
+import argparse
+import threading
+
+CACHE_DIR = "data/cache"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    expires REAL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_entries_access ON entries (last_access);
+"""
+
+class DiskCache:
+    """
+    Persistent key/value cache in a single SQLite file.
+
+    Entries may carry a time-to-live; entries without one never expire. When
+    the total stored size exceeds max_bytes, least recently used entries are
+    evicted until the cache is back under 90% of the limit. Keys are hashed,
+    so any string can be used. Hit and miss counts are kept per instance.
+    """
+    def __init__(self, path, max_bytes=2 * 1024 ** 3):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        folder = os.path.dirname(path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+        conn = self._conn()
+        conn.executescript(SCHEMA)
+        conn.commit()
+
+    def _conn(self):
+        # sqlite3 connections are per-thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _key(key):
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def get(self, key, allow_expired=False):
+        """Return the cached bytes for key, or None if absent or expired."""
+        digest = self._key(key)
+        conn = self._conn()
+        row = conn.execute("SELECT value, expires FROM entries WHERE key = ?", (digest,)).fetchone()
+        now = time.time()
+        if row is None or (row[1] is not None and row[1] < now and not allow_expired):
+            with self._lock:
+                self.misses += 1
+            return None
+        conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (now, digest))
+        conn.commit()
+        with self._lock:
+            self.hits += 1
+        return row[0]
+
+    def set(self, key, value, ttl=None):
+        """Store bytes under key. ttl is in seconds; None keeps the entry until evicted."""
+        now = time.time()
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+            (self._key(key), value, len(value), now, now + ttl if ttl is not None else None, now)
+        )
+        conn.commit()
+        self.evict()
+
+    def delete(self, key):
+        conn = self._conn()
+        conn.execute("DELETE FROM entries WHERE key = ?", (self._key(key),))
+        conn.commit()
+
+    def evict(self):
+        """Drop expired entries if over the size limit, then least recently used ones."""
+        conn = self._conn()
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        conn.execute("DELETE FROM entries WHERE expires IS NOT NULL AND expires < ?", (time.time(),))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        target = self.max_bytes * 0.9
+        rows = conn.execute("SELECT key, size FROM entries ORDER BY last_access").fetchall()
+        doomed = []
+        for key, size in rows:
+            if total <= target:
+                break
+            doomed.append((key,))
+            total -= size
+        conn.executemany("DELETE FROM entries WHERE key = ?", doomed)
+        conn.commit()
+
+    def clear(self):
+        conn = self._conn()
+        conn.execute("DELETE FROM entries")
+        conn.commit()
+
+    def stats(self):
+        row = self._conn().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "entries": row[0],
+            "bytes": row[1],
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+        }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or clear a disk cache")
+    parser.add_argument("path", help="Cache file, e.g. data/cache/eutils.db")
+    parser.add_argument("--clear", action="store_true")
+    args = parser.parse_args()
+    cache = DiskCache(args.path)
+    if args.clear:
+        cache.clear()
+        print(f"Cleared {args.path}")
+    stats = cache.stats()
+    print(f"{stats['entries']} entries, {stats['bytes'] / 1024 ** 2:.1f} MB")
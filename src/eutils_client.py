@@ -0,0 +1,234 @@
+import os
+import json
+import time
+import random
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+EUTILS_BASE = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/"
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: allows `rate` acquisitions per second with bursts
+    up to `capacity`. The default capacity of 1 spaces requests evenly, which
+    keeps a fresh bucket from doubling the rate within the first second.
+    """
+    def __init__(self, rate, capacity=1):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+class EUtilsError(Exception):
+    pass
+
+class EUtilsClient:
+    """
+    Concurrent E-utilities client with a shared rate limit.
+
+    NCBI allows 3 requests/second without an API key and 10 with one; every
+    request from every thread draws from one token bucket set to that rate.
+    429 and 5xx responses (and connection errors) are retried with
+    exponential backoff and jitter, honouring Retry-After when given. Each
+    request's status, attempts and latency are kept in self.timings.
+    base_url can point at a local stand-in (see fake_eutils.py) for tests.
+
+    With a DiskCache, search results are cached for search_ttl seconds and
+    single articles are kept until evicted. offline=True serves only from the
+    cache (including expired searches) and raises EUtilsError on a miss.
+    """
+    def __init__(self, base_url=EUTILS_BASE, api_key=None, email="greg@example.com", rate=None,
+                 max_concurrency=4, max_retries=5, backoff=0.5, timeout=60,
+                 cache=None, search_ttl=24 * 3600, offline=False):
+        self.base_url = base_url if base_url.endswith("/") else base_url + "/"
+        self.api_key = api_key if api_key is not None else os.getenv("NCBI_API_KEY")
+        self.email = email
+        self.rate = rate or (10 if self.api_key else 3)
+        self.bucket = TokenBucket(self.rate)
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.cache = cache
+        self.search_ttl = search_ttl
+        self.offline = offline
+        self.timings = []
+        self._history_terms = {}
+        self._lock = threading.Lock()
+
+    def _params(self, params):
+        params = dict(params, tool="StatsRecommender")
+        if self.email:
+            params["email"] = self.email
+        if self.api_key:
+            params["api_key"] = self.api_key
+        return params
+
+    def request(self, endpoint, params, cache_key=None, ttl=None, refresh=False):
+        """
+        GET an E-utilities endpoint (e.g. 'efetch.fcgi') and return the response
+        body. Responses with a cache_key are stored in the cache with the given
+        ttl; refresh skips the lookup (but not the store) unless offline.
+        """
+        if self.cache is not None and cache_key and (self.offline or not refresh):
+            body = self.cache.get(cache_key, allow_expired=self.offline)
+            if body is not None:
+                return body
+        if self.offline:
+            raise EUtilsError(f"{endpoint} not in cache (offline mode): {cache_key or params}")
+
+        body = self._get(endpoint, params)
+        if self.cache is not None and cache_key:
+            self.cache.set(cache_key, body, ttl)
+        return body
+
+    def _get(self, endpoint, params):
+        url = self.base_url + endpoint + "?" + urllib.parse.urlencode(self._params(params))
+        start = time.perf_counter()
+        attempt = 0
+        while True:
+            attempt += 1
+            self.bucket.acquire()
+            retry_after = None
+            try:
+                with urllib.request.urlopen(url, timeout=self.timeout) as response:
+                    body = response.read()
+                self._record(endpoint, 200, attempt, start)
+                return body
+            except urllib.error.HTTPError as e:
+                status = e.code
+                retry_after = e.headers.get("Retry-After") if e.headers else None
+                if status not in RETRY_STATUS or attempt > self.max_retries:
+                    self._record(endpoint, status, attempt, start)
+                    raise EUtilsError(f"{endpoint} failed with HTTP {status} after {attempt} attempts") from e
+            except (urllib.error.URLError, TimeoutError, ConnectionError) as e:
+                status = None
+                if attempt > self.max_retries:
+                    self._record(endpoint, None, attempt, start)
+                    raise EUtilsError(f"{endpoint} failed after {attempt} attempts: {e}") from e
+
+            delay = self.backoff * (2 ** (attempt - 1)) * (0.5 + random.random())
+            if retry_after:
+                try:
+                    delay = max(delay, float(retry_after))
+                except ValueError:
+                    pass
+            time.sleep(delay)
+
+    def _record(self, endpoint, status, attempts, start):
+        with self._lock:
+            self.timings.append({
+                "endpoint": endpoint,
+                "status": status,
+                "attempts": attempts,
+                "seconds": time.perf_counter() - start
+            })
+
+    def esearch(self, term, db="pmc", retmax=20, retstart=0):
+        """Return the list of IDs matching a search term."""
+        body = self.request("esearch.fcgi", {"db": db, "term": term, "retmax": retmax, "retstart": retstart, "retmode": "json"},
+                            cache_key=f"esearch:{db}:{term}:{retstart}:{retmax}", ttl=self.search_ttl)
+        return json.loads(body)["esearchresult"]["idlist"]
+
+    def esearch_history(self, term, db="pmc"):
+        """
+        Run a search on the history server. Returns (count, webenv, query_key);
+        pages of the result set are then read with esearch_page.
+        """
+        # History sessions expire, so a cached session is only reused offline
+        body = self.request("esearch.fcgi", {"db": db, "term": term, "usehistory": "y", "retmax": 0, "retmode": "json"},
+                            cache_key=f"history:{db}:{term}", ttl=self.search_ttl, refresh=True)
+        result = json.loads(body)["esearchresult"]
+        with self._lock:
+            self._history_terms[result["webenv"]] = term
+        return int(result["count"]), result["webenv"], result["querykey"]
+
+    def esearch_page(self, webenv, query_key, retstart, retmax, db="pmc"):
+        """Return one page of IDs from a result set stored on the history server."""
+        # "#<query_key>" refers back to the stored search within WebEnv. Pages
+        # are cached under the original term, like a plain esearch.
+        term = self._history_terms.get(webenv)
+        body = self.request("esearch.fcgi", {"db": db, "term": f"#{query_key}", "WebEnv": webenv,
+                                             "retstart": retstart, "retmax": retmax, "retmode": "json"},
+                            cache_key=term and f"esearch:{db}:{term}:{retstart}:{retmax}", ttl=self.search_ttl)
+        return json.loads(body)["esearchresult"]["idlist"]
+
+    def efetch(self, ids, db="pmc"):
+        """
+        Return the full-text XML for one article, or a single <pmc-articleset>
+        holding every article when given a list of IDs.
+        """
+        if not isinstance(ids, str):
+            return self.request("efetch.fcgi", {"db": db, "id": ",".join(ids), "rettype": "xml", "retmode": "text"})
+        return self.request("efetch.fcgi", {"db": db, "id": ids, "rettype": "xml", "retmode": "text"},
+                            cache_key=self._article_key(ids, db))
+
+    @staticmethod
+    def _article_key(pmcid, db):
+        return f"article:{db}:{str(pmcid).upper().replace('PMC', '')}"
+
+    def cached_article(self, pmcid, db="pmc"):
+        """Cached XML for one article, or None. Batched fetches check this first."""
+        if self.cache is None:
+            return None
+        return self.cache.get(self._article_key(pmcid, db), allow_expired=True)
+
+    def store_article(self, pmcid, xml_data, db="pmc"):
+        if self.cache is not None:
+            self.cache.set(self._article_key(pmcid, db), xml_data)
+
+    def fetch_many(self, ids, on_result=None, db="pmc"):
+        """
+        Fetch many articles with at most max_concurrency requests in flight.
+        Each item of ids is one request: a single ID or a list of IDs fetched
+        together. on_result(item, xml_data, error) is called in the calling
+        thread as each fetch completes; returns the number of successful fetches.
+        """
+        fetched = 0
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as pool:
+            futures = {pool.submit(self.efetch, item, db): item for item in ids}
+            for future in as_completed(futures):
+                item = futures[future]
+                try:
+                    xml_data = future.result()
+                    error = None
+                    fetched += 1
+                except Exception as e:
+                    xml_data, error = None, e
+                if on_result:
+                    on_result(item, xml_data, error)
+        return fetched
+
+    def summary(self):
+        """Aggregate request timings: counts, retries and latency percentiles."""
+        with self._lock:
+            timings = list(self.timings)
+        if not timings:
+            return {"requests": 0}
+        latencies = sorted(t["seconds"] for t in timings)
+        return {
+            "requests": len(timings),
+            "failed": len([t for t in timings if t["status"] != 200]),
+            "retries": sum(t["attempts"] - 1 for t in timings),
+            "mean_seconds": round(sum(latencies) / len(latencies), 3),
+            "p50_seconds": round(latencies[len(latencies) // 2], 3),
+            "p95_seconds": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 3),
+            "max_seconds": round(latencies[-1], 3)
+        }
@@ -1,18 +1,20 @@
-from Bio import Entrez
 import os
 import time
 import json
-from pmc_fetcher import search_pmc_trials, fetch_pmc_fulltext, save_raw_xml
+from pmc_fetcher import fetch_and_save, print_fetch_stats, add_client_arguments, client_from_args, EUTILS_CACHE, NCBI_EMAIL
+from disk_cache import DiskCache
+from eutils_client import EUtilsClient
 from xml_parser import process_raw_folder as process_raw_xml
 from feature_extractor import process_processed_data as process_features_all
 from feedback_generator import process_features as generate_feedback_all
+from harvest_index import HarvestIndex, harvest
 
-Entrez.email = "greg@example.com"
-
-def expand_dataset(target_total=100):
-    # Get current IDs
-    existing_ids = [f.replace(".xml", "") for f in os.listdir("data/raw") if f.endswith(".xml")]
-    current_count = len(existing_ids)
+def expand_dataset(target_total=100, resume=False, client=None, batch_size=50):
+    client = client or EUtilsClient(email=NCBI_EMAIL, cache=DiskCache(EUTILS_CACHE))
+    start = time.perf_counter()
+    # Seen/fetched IDs live in the harvest index; anything already in data/raw counts as fetched
+    index = HarvestIndex()
+    current_count = index.sync_folder("data/raw")
     
     # We want to force add specific basic science papers, so we ignore the total count check
     # needed = target_total - current_count
@@ -48,52 +50,61 @@ def expand_dataset(target_total=100):
     for journal in journals:
         queries.append(f'"{journal}"[Journal] AND ("Western Blot" OR "CRISPR" OR "Mice") AND open access[filter] AND 2024[PDAT]')
 
-    all_candidate_ids = []
     for query in queries:
         print(f"Searching: {query[:50]}...")
         try:
-            handle = Entrez.esearch(db="pmc", term=query, retmax=10)
-            record = Entrez.read(handle)
-            handle.close()
-            all_candidate_ids.extend(record["IdList"])
+            harvest(client, index, query, max_results=10, resume=resume)
         except Exception as e:
             print(f"Search failed for {query}: {e}")
-            time.sleep(2)
     
-    # Remove duplicates and existing ones
-    new_ids = [pid for pid in list(set(all_candidate_ids)) if pid not in existing_ids]
+    # Unfetched candidates from these searches; earlier failures are retried first
+    new_ids = [pid for query in queries for pid in index.pending(query=query)]
     
     print(f"Found {len(new_ids)} new candidate papers.")
     
     # 2. Fetch and Process
+    # Fetches run concurrently under the client's rate limit; failures are
+    # replaced from the remaining candidates until `needed` papers are saved.
+    def record(pid, error):
+        if error is None:
+            index.mark(pid, "fetched")
+        else:
+            index.mark(pid, "failed", error=str(error))
+
     fetch_count = 0
-    for pid in new_ids:
-        if fetch_count >= needed:
-            break
-        try:
-            print(f"Fetching {pid} ({fetch_count+1}/{needed})...")
-            xml = fetch_pmc_fulltext(pid)
-            if xml:
-                save_raw_xml(pid, xml)
-                fetch_count += 1
-                time.sleep(1) # NCBI throttle
-        except Exception as e:
-            print(f"Error fetching {pid}: {e}")
+    remaining = list(new_ids)
+    while fetch_count < needed and remaining:
+        batch, remaining = remaining[:needed - fetch_count], remaining[needed - fetch_count:]
+        print(f"Fetching {len(batch)} papers ({fetch_count}/{needed} saved so far)...")
+        fetch_count += fetch_and_save(client, batch, on_saved=record, batch_size=batch_size)
+    print_fetch_stats(client, time.perf_counter() - start)
 
-    if fetch_count > 0:
+    # A resumed run also finishes parsing/extraction left over from the interrupted one
+    if fetch_count > 0 or resume:
         # 3. Pipeline Run
         print("\n--- Running Parsing Pipeline ---")
-        process_raw_xml() 
+        process_raw_xml(resume=resume) 
         
         print("\n--- Running Feature Extraction ---")
-        process_features_all() 
+        process_features_all(resume=resume) 
         
         print("\n--- Generating Rule-Based Feedback ---")
         # Ensure we use the new RuleBasedFeedbackEngine
         from rule_based_feedback import process_all_features as process_feedback
-        process_feedback()
+        process_feedback(resume=resume)
+
+        from corpus_store import CorpusStore
+        from corpus_index import CorpusIndex
+        CorpusStore().build_from_folder()
+        CorpusIndex().rebuild_from_folder()
     else:
         print("No new papers fetched.")
 
 if __name__ == "__main__":
-    expand_dataset(15) # Fetch 15 new basic science papers
+    import argparse
+    parser = argparse.ArgumentParser(description="Expand the dataset with new Basic Science papers")
+    parser.add_argument("--resume", action="store_true", help="Resume an interrupted expansion, continuing partial searches")
+    add_client_arguments(parser)
+    args = parser.parse_args()
+    client = client_from_args(args)
+    expand_dataset(15, resume=args.resume, client=client, batch_size=args.batch_size) # Fetch 15 new basic science papers
@@ -0,0 +1,146 @@
+import json
+import time
+import random
+import argparse
+import threading
+import urllib.parse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+ARTICLE_TEMPLATE = """<article>
+<front><article-meta>
+<article-id pub-id-type="pmc">{pmcid}</article-id>
+<title-group><article-title>Synthetic article {pmcid}</article-title></title-group>
+</article-meta></front>
+<body><sec><title>Methods</title>
+<p>Mice were randomized into two groups (n = 12 per group). Data are presented as mean +/- SD and were analysed with a two-tailed t-test.</p>
+</sec></body>
+</article>"""
+
+class FakeEUtils(ThreadingHTTPServer):
+    """
+    Local stand-in for the E-utilities esearch/efetch endpoints, for testing
+    the fetcher without touching NCBI.
+
+    esearch returns IDs from a synthetic pool (and supports usehistory=y
+    with WebEnv/query_key paging), efetch returns a minimal
+    <pmc-articleset> per request. The server enforces its own rate limit
+    (429 with Retry-After when more than `rate` requests arrive within one
+    second), can inject random 5xx errors, can leave random IDs out of
+    multi-ID efetch responses, and adds artificial latency.
+    Every request's arrival time and status is kept in self.log.
+    """
+    daemon_threads = True
+
+    def __init__(self, port=0, rate=10, error_rate=0.0, latency=0.05, pool_size=10000, seed=0, missing_rate=0.0):
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.rate = rate
+        self.error_rate = error_rate
+        self.latency = latency
+        self.missing_rate = missing_rate
+        self.pool = [str(9000000 + i) for i in range(pool_size)]
+        self.random = random.Random(seed)
+        self.log = []
+        self.histories = {}
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/entrez/eutils/"
+
+    def admit(self):
+        """Decide the status for an incoming request and log it."""
+        now = time.monotonic()
+        with self._lock:
+            recent = [t for t, status in self.log if now - t < 1.0 and status != 429]
+            if self.rate and len(recent) >= self.rate:
+                status = 429
+            elif self.random.random() < self.error_rate:
+                status = 503
+            else:
+                status = 200
+            self.log.append((now, status))
+        return status
+
+    def drop_missing(self, ids):
+        if len(ids) < 2 or not self.missing_rate:
+            return ids
+        with self._lock:
+            return [i for i in ids if self.random.random() >= self.missing_rate]
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+class _Handler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body=b"", content_type="text/xml", headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        server = self.server
+        url = urllib.parse.urlparse(self.path)
+        params = {k: v[0] for k, v in urllib.parse.parse_qs(url.query).items()}
+        endpoint = url.path.rsplit("/", 1)[-1]
+
+        status = server.admit()
+        if status == 429:
+            return self._send(429, b"API rate limit exceeded", "text/plain", {"Retry-After": "1"})
+        time.sleep(server.latency)
+        if status != 200:
+            return self._send(status, b"Service unavailable", "text/plain")
+
+        if endpoint == "esearch.fcgi":
+            term = params.get("term", "")
+            if term.startswith("#"):
+                term = server.histories.get(params.get("WebEnv"))
+                if term is None:
+                    return self._send(400, b"Unknown WebEnv", "text/plain")
+            retstart = int(params.get("retstart", 0))
+            retmax = int(params.get("retmax", 20))
+            # Different terms map to different, overlapping slices of the pool
+            offset = sum(map(ord, term)) % max(1, len(server.pool) // 2)
+            ids = server.pool[offset + retstart:offset + retstart + retmax]
+            body = {"esearchresult": {"count": str(len(server.pool) - offset), "retmax": str(len(ids)),
+                                      "retstart": str(retstart), "idlist": ids}}
+            if params.get("usehistory") == "y":
+                with server._lock:
+                    webenv = f"MCID_{len(server.histories) + 1}"
+                    server.histories[webenv] = term
+                body["esearchresult"].update(webenv=webenv, querykey="1")
+            return self._send(200, json.dumps(body).encode("utf-8"), "application/json")
+
+        if endpoint == "efetch.fcgi":
+            ids = [i.strip() for i in params.get("id", "").split(",") if i.strip()]
+            articles = "\n".join(ARTICLE_TEMPLATE.format(pmcid=i) for i in server.drop_missing(ids))
+            body = f'<?xml version="1.0" ?>\n<pmc-articleset>{articles}</pmc-articleset>'
+            return self._send(200, body.encode("utf-8"))
+
+        self._send(404, b"Unknown endpoint", "text/plain")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local E-utilities stand-in")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--rate", type=int, default=10, help="Requests per second before 429 responses")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    parser.add_argument("--missing-rate", type=float, default=0.0, help="Fraction of IDs left out of multi-ID efetch responses")
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds added to each response")
+    args = parser.parse_args()
+    server = FakeEUtils(args.port, args.rate, args.error_rate, args.latency, missing_rate=args.missing_rate)
+    print(f"Serving fake E-utilities at {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
@@ -0,0 +1,233 @@
+import json
+import time
+import uuid
+import email
+import random
+import hashlib
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+class FakeOpenAI(ThreadingHTTPServer):
+    """
+    Local stand-in for the OpenAI chat-completions endpoint, for exercising
+    the LLM path without an API key or network access.
+
+    POST /v1/chat/completions returns a JSON audit derived from a hash of the
+    prompt (so identical prompts get identical answers) with token usage
+    estimated at four characters per token. Like the real service it answers
+    429 with Retry-After once more than `rate` requests arrive within one
+    second, and it can inject 500 errors and artificial latency. Each
+    request's arrival time and status is kept in self.log.
+
+    The Files and Batch endpoints are also supported: an uploaded batch
+    input file is processed batch_delay seconds after the batch is created,
+    with error_rate of its requests failing into the error file.
+    """
+    daemon_threads = True
+
+    def __init__(self, port=0, rate=50, error_rate=0.0, latency=0.2, seed=0, batch_delay=1.0):
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.rate = rate
+        self.error_rate = error_rate
+        self.latency = latency
+        self.batch_delay = batch_delay
+        self.random = random.Random(seed)
+        self.log = []
+        self.files = {}
+        self.batches = {}
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+    def admit(self):
+        """Decide the status for an incoming request and log it."""
+        now = time.monotonic()
+        with self._lock:
+            recent = [t for t, status in self.log if now - t < 1.0 and status != 429]
+            if self.rate and len(recent) >= self.rate:
+                status = 429
+            elif self.random.random() < self.error_rate:
+                status = 500
+            else:
+                status = 200
+            self.log.append((now, status))
+        return status
+
+    def add_file(self, filename, content, purpose):
+        file_id = f"file-{uuid.uuid4().hex[:24]}"
+        self.files[file_id] = {
+            "meta": {"id": file_id, "object": "file", "bytes": len(content), "created_at": int(time.time()),
+                     "filename": filename, "purpose": purpose, "status": "processed"},
+            "content": content
+        }
+        return self.files[file_id]["meta"]
+
+    def batch_view(self, batch_id):
+        """Current state of a batch, running it once batch_delay has passed."""
+        with self._lock:
+            batch = self.batches[batch_id]
+            if batch["status"] == "in_progress" and time.time() - batch["created_at"] >= self.batch_delay:
+                self._run_batch(batch)
+            return dict(batch)
+
+    def _run_batch(self, batch):
+        outputs, errors = [], []
+        for line in self.files[batch["input_file_id"]]["content"].decode("utf-8").splitlines():
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            if self.random.random() < self.error_rate:
+                errors.append({"id": f"batch_req_{uuid.uuid4().hex[:12]}", "custom_id": request["custom_id"], "response": None,
+                               "error": {"code": "server_error", "message": "Internal error"}})
+                continue
+            outputs.append({"id": f"batch_req_{uuid.uuid4().hex[:12]}", "custom_id": request["custom_id"],
+                            "response": {"status_code": 200, "body": completion(request["body"])}, "error": None})
+        batch["output_file_id"] = self.add_file("output.jsonl", "".join(json.dumps(o) + "\n" for o in outputs).encode("utf-8"), "batch_output")["id"]
+        if errors:
+            batch["error_file_id"] = self.add_file("errors.jsonl", "".join(json.dumps(e) + "\n" for e in errors).encode("utf-8"), "batch_output")["id"]
+        batch["request_counts"] = {"total": len(outputs) + len(errors), "completed": len(outputs), "failed": len(errors)}
+        batch["status"] = "completed"
+        batch["completed_at"] = int(time.time())
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+def fake_audit(prompt):
+    digest = int(hashlib.sha256(prompt.encode("utf-8")).hexdigest(), 16)
+    score = 3 + digest % 7
+    return {
+        "overall_score": score,
+        "rigor_rating": "High" if score >= 8 else "Medium" if score >= 5 else "Low",
+        "critical_gaps": ["No normality assessment reported for parametric tests"] if digest % 2 else [],
+        "strengths": ["Statistical software reported"],
+        "weaknesses": [],
+        "foundational_rigor_audit": {
+            "assumptions_handling": "Synthetic assessment",
+            "multiplicity_handling": "Synthetic assessment",
+            "transparency_rating": "Synthetic assessment"
+        },
+        "actionable_recommendations": [],
+        "nature_adherence_score": score
+    }
+
+def completion(request):
+    """A chat.completion object answering a chat-completions request body."""
+    prompt = "".join(m.get("content", "") for m in request.get("messages", []))
+    content = json.dumps(fake_audit(prompt))
+    prompt_tokens = len(prompt) // 4
+    completion_tokens = len(content) // 4
+    return {
+        "id": "chatcmpl-fake",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": request.get("model", "gpt-4o"),
+        "choices": [{"index": 0, "finish_reason": "stop",
+                     "message": {"role": "assistant", "content": content}}],
+        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                  "total_tokens": prompt_tokens + completion_tokens}
+    }
+
+def _multipart_fields(content_type, body):
+    message = email.message_from_bytes(f"Content-Type: {content_type}\r\n\r\n".encode("utf-8") + body)
+    fields = {}
+    for part in message.get_payload():
+        name = part.get_param("name", header="content-disposition")
+        fields[name] = (part.get_filename(), part.get_payload(decode=True))
+    return fields
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        server = self.server
+        length = int(self.headers.get("Content-Length", 0))
+        raw = self.rfile.read(length)
+        if self.path.endswith("/files"):
+            fields = _multipart_fields(self.headers.get("Content-Type", ""), raw)
+            filename, content = fields["file"]
+            purpose = fields.get("purpose", (None, b"batch"))[1].decode("utf-8")
+            with server._lock:
+                meta = server.add_file(filename or "upload.jsonl", content, purpose)
+            return self._send_json(200, meta)
+
+        request = json.loads(raw or b"{}")
+        if self.path.endswith("/batches"):
+            if request.get("input_file_id") not in server.files:
+                return self._send_json(400, {"error": {"message": "Unknown input file", "type": "invalid_request_error"}})
+            batch_id = f"batch_{uuid.uuid4().hex[:24]}"
+            batch = {
+                "id": batch_id, "object": "batch", "endpoint": request.get("endpoint"), "errors": None,
+                "input_file_id": request["input_file_id"], "completion_window": request.get("completion_window", "24h"),
+                "status": "in_progress", "output_file_id": None, "error_file_id": None,
+                "created_at": int(time.time()), "completed_at": None,
+                "request_counts": {"total": 0, "completed": 0, "failed": 0}, "metadata": request.get("metadata")
+            }
+            with server._lock:
+                server.batches[batch_id] = batch
+            return self._send_json(200, dict(batch))
+
+        if not self.path.endswith("/chat/completions"):
+            return self._send_json(404, {"error": {"message": "Unknown endpoint", "type": "invalid_request_error"}})
+
+        status = server.admit()
+        if status == 429:
+            return self._send_json(429, {"error": {"message": "Rate limit reached", "type": "rate_limit_error"}},
+                                   {"Retry-After": "1"})
+        time.sleep(server.latency)
+        if status != 200:
+            return self._send_json(500, {"error": {"message": "Internal error", "type": "server_error"}})
+        self._send_json(200, completion(request))
+
+    def do_GET(self):
+        server = self.server
+        parts = self.path.split("?")[0].rstrip("/").split("/")
+        if len(parts) >= 2 and parts[-2] == "batches" and parts[-1] in server.batches:
+            return self._send_json(200, server.batch_view(parts[-1]))
+        if len(parts) >= 3 and parts[-1] == "content" and parts[-2] in server.files:
+            body = server.files[parts[-2]]["content"]
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        if len(parts) >= 2 and parts[-2] == "files" and parts[-1] in server.files:
+            return self._send_json(200, server.files[parts[-1]]["meta"])
+        self._send_json(404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local chat-completions stand-in")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--rate", type=int, default=50, help="Requests per second before 429 responses")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 500")
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds added to each response")
+    parser.add_argument("--batch-delay", type=float, default=1.0, help="Seconds before a submitted batch completes")
+    args = parser.parse_args()
+    server = FakeOpenAI(args.port, args.rate, args.error_rate, args.latency, batch_delay=args.batch_delay)
+    print(f"Serving fake chat completions at {server.base_url} (set OPENAI_BASE_URL to this)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
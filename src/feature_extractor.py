@@ -2,6 +2,15 @@ import spacy
 import json
 import os
 import re
+import time
+import logging
+from checkpoint import atomic_write_json, stage_checkpoint
+from regex_safety import find_risks, line_local
+from regex_backend import DEFAULT_BACKEND, compile_pattern, engine, resolve
+
+# Under a time budget, patterns with backtracking risk skip lines longer than
+# this; a quadratic search over one such line stays in the low milliseconds
+MAX_RISKY_LINE = 5000
 
 # Load SpaCy model (ensure en_core_web_sm is installed or used)
 try:
@@ -11,8 +20,35 @@ except:
     spacy.cli.download("en_core_web_sm")
     nlp = spacy.load("en_core_web_sm")
 
+def compile_rules(rules, backend="re"):
+    """
+    Compile every extraction pattern once, for the given regex backend (see
+    regex_backend). Raises ValueError listing each feature without patterns
+    and each pattern that does not compile, so a broken rule set fails at
+    start-up rather than on the first request.
+    """
+    compiled, errors = {}, []
+    for feature, patterns in rules.items():
+        if not patterns:
+            errors.append(f"{feature}: no patterns")
+        compiled[feature] = []
+        for pattern in patterns:
+            if pattern.startswith("STRICT:"):
+                # Case-sensitive, exact match with lookarounds
+                regex = r"(?<![a-zA-Z])" + re.escape(pattern.replace("STRICT:", "")) + r"(?![a-zA-Z])"
+            else:
+                # Standard behavior (already mostly handled by (?i) in rules)
+                regex = pattern
+            try:
+                compiled[feature].append(compile_pattern(regex, backend))
+            except re.error as e:
+                errors.append(f"{feature}: {pattern!r}: {e}")
+    if errors:
+        raise ValueError("Invalid extraction rules:\n  " + "\n  ".join(errors))
+    return compiled
+
 class FeatureExtractor:
-    def __init__(self):
+    def __init__(self, backend=DEFAULT_BACKEND):
         # Initial set of patterns/keywords for CONSORT items
         self.rules = {
             # Category: Study Design & Sampling
@@ -39,7 +75,7 @@ class FeatureExtractor:
                 r"(?i)ImageJ", r"(?i)FlowJo", r"(?i)Seurat", r"(?i)Bioconductor", r"(?i)PyMOL", r"(?i)PhenoGraph", r"(?i)CellProfiler"
             ],
             "error_measures": [r"(?i)standard deviation", r"(?<![a-zA-Z])sd(?![a-zA-Z])", r"(?i)standard error", r"(?<![a-zA-Z])sem(?![a-zA-Z])", r"(?i)interquartile range", r"(?<![a-zA-Z])iqr(?![a-zA-Z])", r"STRICT:SD"],
-            "multiplicity_correction": [r"(?i)\bbonferroni\b", r"(?i)\bbenjamini-hochberg\b", r"(?i)false discovery rate", r"(?i)multiple (comparisons|testing)", r"(?i)adjustment for multiplicity", r"(?i)\btukey\b", r"(?i)\bscheff.\b", r"(?i)\bholm\b(?!\s*laser)", r"(?i)\bdunnett\b", r"(?i)\bsidak\b", r"(?i)control the family-wise error", r"(?i)nominal", r"(?i)no (formal )?.*hypothesis testing", r"(?i)no\s+(?:formal\s+)?(?:adjustment|correction|multiplicity)"],
+            "multiplicity_correction": [r"(?i)\bbonferroni\b", r"(?i)\bbenjamini-hochberg\b", r"(?i)false discovery rate", r"(?i)multiple (comparisons|testing)", r"(?i)adjustment for multiplicity", r"(?i)\btukey\b", r"(?i)\bscheff.\b", r"(?i)\bholm\b(?!\s*laser)", r"(?i)\bdunnett\b", r"(?i)\bsidak\b", r"(?i)control the family-wise error", r"(?i)nominal", r"(?i)no\s+(?:formal\s+)?(?:\w{1,40}\s+){0,5}hypothesis testing", r"(?i)no\s+(?:formal\s+)?(?:adjustment|correction|multiplicity)"],
             "normality_checks": [r"(?i)\bshapiro-wilk\b", r"(?i)\bkolmogorov-smirnov\b", r"(?i)\bnormality (test|check)\b", r"(?i)\bskewness\b", r"(?i)\bkurtosis\b", r"(?i)\bqq-plot\b", r"(?i)\bquantile-quantile\b", r"(?i)distribution (?:was )?checked", r"(?i)gaussian distribution"],
             
             # Statistical Methods (General)
@@ -78,59 +114,109 @@ class FeatureExtractor:
                 r"(?i)quantification", r"(?i)crystallography", r"(?i)flow cytometry"
             ],
         }
+        self.backend = resolve(backend)
+        self.patterns = compile_rules(self.rules, self.backend)
+        # Patterns left on the backtracking engine with super-linear risk. Those
+        # whose matches stay within a line are searched line by line, which finds
+        # the same matches but lets a time budget stop between lines.
+        self.risks = find_risks({feature: [regex for regex in patterns if engine(regex) == "re"]
+                                 for feature, patterns in self.patterns.items()})
+        self.by_line = {risk["pattern"] for risk in self.risks if line_local(risk["pattern"])}
+        for risk in self.risks:
+            logging.getLogger(__name__).warning(
+                f"{risk['severity']} backtracking risk in {risk['feature']} pattern {risk['pattern']!r}: {risk['reason']}")
+
+    def _search(self, regex, text, lines, found, deadline):
+        """Append the matches of regex to found. Returns False if any text was left unsearched."""
+        if regex.pattern in self.by_line:
+            spans = lines()
+        else:
+            spans = [(0, len(text))]
+        complete = True
+        for line_start, line_end in spans:
+            if deadline is not None:
+                if time.perf_counter() >= deadline:
+                    return False
+                if line_end - line_start > MAX_RISKY_LINE and regex.pattern in self.by_line:
+                    complete = False
+                    continue
+            for m in regex.finditer(text, line_start, line_end):
+                # Capture context
+                start = max(0, m.start() - 30)
+                end = min(len(text), m.end() + 30)
+                found.append({
+                    "match": m.group(),
+                    "context": text[start:end].strip().replace("\n", " "),
+                    "start": m.start(),
+                    "end": m.end()
+                })
+                if deadline is not None and time.perf_counter() >= deadline:
+                    return False
+        return complete
+
+    def extract_features(self, text, budget=None):
+        """
+        Match every rule against text. With a budget (seconds), extraction stops
+        once it is spent and risky patterns skip lines over MAX_RISKY_LINE
+        characters; categories that were not fully searched are marked
+        "skipped": True and report only the matches found so far.
+        """
+        deadline = time.perf_counter() + budget if budget is not None else None
+        line_spans = []
+
+        def lines():
+            if not line_spans:
+                line_spans.extend(m.span() for m in re.finditer(r"[^\n]+", text))
+            return line_spans
 
-    def extract_features(self, text):
         results = {}
-        for feature, patterns in self.rules.items():
+        for feature, patterns in self.patterns.items():
             found = []
-            for pattern in patterns:
-                is_strict = pattern.startswith("STRICT:")
-                clean_pattern = pattern.replace("STRICT:", "")
-                
-                if is_strict:
-                    # Case-sensitive, exact match with lookarounds
-                    regex = r"(?<![a-zA-Z])" + re.escape(clean_pattern) + r"(?![a-zA-Z])"
-                    matches = re.finditer(regex, text)
-                else:
-                    # Standard behavior (already mostly handled by (?i) in rules)
-                    matches = re.finditer(clean_pattern, text)
-                    
-                for m in matches:
-                    # Capture context
-                    start = max(0, m.start() - 30)
-                    end = min(len(text), m.end() + 30)
-                    found.append({
-                        "match": m.group(),
-                        "context": text[start:end].strip().replace("\n", " ")
-                    })
+            complete = True
+            for regex in patterns:
+                if deadline is not None and time.perf_counter() >= deadline:
+                    complete = False
+                    break
+                complete = self._search(regex, text, lines, found, deadline) and complete
             results[feature] = {
                 "present": len(found) > 0,
                 "count": len(found),
-                "unique_matches": list(set(m["match"].lower() for m in found)),
+                "unique_matches": sorted(set(m["match"].lower() for m in found)),
                 "examples": found[:3] # Show first 3 examples for readability
             }
+            if not complete:
+                results[feature]["skipped"] = True
         return results
 
-def process_processed_data(processed_folder="data/processed", output_folder="data/features"):
+def feature_text(data):
+    """The text features are extracted from for a processed paper."""
+    # Combine all methods and stats text
+    # CRITICAL: Include Title and Abstract (if available) for Domain Detection context
+    full_text = data.get("title", "") + "\n\n"
+    
+    for m in data.get("methods", []):
+        full_text += m.get("content", "") + "\n"
+    for s in data.get("stats_reproducibility", []):
+        full_text += s.get("content", "") + "\n"
+    return full_text
+
+def process_processed_data(processed_folder="data/processed", output_folder="data/features", resume=False):
     if not os.path.exists(output_folder):
         os.makedirs(output_folder)
         
     extractor = FeatureExtractor()
+    checkpoint = stage_checkpoint("extract", resume)
     
     for filename in os.listdir(processed_folder):
         if filename.endswith(".json"):
+            output_path = os.path.join(output_folder, filename)
+            if checkpoint.is_done(filename, output_path):
+                continue
             file_path = os.path.join(processed_folder, filename)
             with open(file_path, "r", encoding="utf-8") as f:
                 data = json.load(f)
             
-            # Combine all methods and stats text
-            # CRITICAL: Include Title and Abstract (if available) for Domain Detection context
-            full_text = data.get("title", "") + "\n\n"
-            
-            for m in data.get("methods", []):
-                full_text += m.get("content", "") + "\n"
-            for s in data.get("stats_reproducibility", []):
-                full_text += s.get("content", "") + "\n"
+            full_text = feature_text(data)
             
             if full_text:
                 print(f"Extracting features from: {filename}")
@@ -142,9 +228,8 @@ def process_processed_data(processed_folder="data/processed", output_folder="dat
                     "features": features
                 }
                 
-                output_path = os.path.join(output_folder, filename)
-                with open(output_path, "w", encoding="utf-8") as f:
-                    json.dump(output_data, f, indent=2)
+                atomic_write_json(output_path, output_data)
+                checkpoint.mark(filename, "done")
                 print(f"Saved features to: {output_path}")
 
 if __name__ == "__main__":
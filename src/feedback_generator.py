@@ -1,146 +1,407 @@
 import json
 import os
+import time
+import random
+import hashlib
+import threading
 import openai
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
 from rule_based_feedback import RuleBasedFeedbackEngine
+from checkpoint import atomic_write_json, stage_checkpoint
+from disk_cache import DiskCache, CACHE_DIR
+from prompt_builder import PromptBuilder
+from llm_routing import RoutingPolicy, routing_report
 
 load_dotenv()
 
+MODEL = "gpt-4o"
+# Bump whenever the prompt template changes so cached responses are not reused
+PROMPT_VERSION = "2"
+LLM_CACHE = os.path.join(CACHE_DIR, "llm.db")
+
 class FeedbackGenerator:
-    def __init__(self):
+    """
+    Rule-based feedback, optionally enhanced by an LLM review.
+
+    Successful LLM responses are stored in a content-addressed cache keyed by
+    the model, PROMPT_VERSION and the rendered prompt, so re-running on
+    unchanged inputs costs nothing. Pass use_cache=False to disable the cache
+    or force_refresh=True to re-query and overwrite cached entries.
+
+    One OpenAI client (and its connection pool) is shared by every call, so a
+    generator can be used from many threads. Rate-limit, timeout, connection
+    and 5xx errors are retried with jittered exponential backoff; latency,
+    attempts and token usage of every call are kept in self.usage.
+    base_url (or OPENAI_BASE_URL) can point at fake_openai.py for tests.
+    Prompts are assembled by PromptBuilder within token_budget. With a
+    RoutingPolicy, only papers the policy escalates are sent to the LLM; the
+    rest keep the deterministic audit, and every decision is kept in
+    self.decisions.
+    """
+    def __init__(self, use_cache=True, force_refresh=False, cache_path=LLM_CACHE, cache_mb=512, model=MODEL,
+                 base_url=None, max_retries=5, backoff=1.0, timeout=120, token_budget=3000, routing=None):
         self.api_key = os.getenv("OPENAI_API_KEY")
         if self.api_key:
             openai.api_key = self.api_key
         self.rule_engine = RuleBasedFeedbackEngine()
+        self.model = model
+        self.force_refresh = force_refresh
+        self.cache = DiskCache(cache_path, max_bytes=cache_mb * 1024 ** 2) if use_cache and self.api_key else None
+        self.base_url = base_url
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.prompt_builder = PromptBuilder(token_budget)
+        self.routing = routing
+        self.decisions = []
+        self.usage = []
+        self._client = None
+        self._lock = threading.Lock()
+
+    def client(self):
+        """The shared OpenAI client, created on first use."""
+        with self._lock:
+            if self._client is None:
+                options = {"api_key": self.api_key, "max_retries": 0, "timeout": self.timeout}
+                if self.base_url:
+                    options["base_url"] = self.base_url
+                self._client = openai.OpenAI(**options)
+            return self._client
+
+    def _record(self, status, start, attempts=0, usage=None, prompt_report=None):
+        with self._lock:
+            self.usage.append({
+                "status": status,
+                "prompt_estimate": (prompt_report or {}).get("total_tokens", 0),
+                "seconds": time.perf_counter() - start,
+                "attempts": attempts,
+                "prompt_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+                "completion_tokens": getattr(usage, "completion_tokens", 0) or 0
+            })
+
+    def complete(self, prompt):
+        """Send one chat completion, retrying transient errors. Returns (parsed JSON, usage, attempts made)."""
+        retryable = (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError, openai.InternalServerError)
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                response = self.client().chat.completions.create(
+                    model=self.model,
+                    messages=[{"role": "user", "content": prompt}],
+                    response_format={ "type": "json_object" }
+                )
+                return json.loads(response.choices[0].message.content), response.usage, attempt
+            except retryable as e:
+                if attempt > self.max_retries:
+                    e.attempts = attempt
+                    raise
+                delay = self.backoff * (2 ** (attempt - 1)) * (0.5 + random.random())
+                response = getattr(e, "response", None)
+                retry_after = response.headers.get("retry-after") if response is not None else None
+                if retry_after:
+                    try:
+                        delay = max(delay, float(retry_after))
+                    except ValueError:
+                        pass
+                time.sleep(delay)
+            except Exception as e:
+                e.attempts = attempt
+                raise
 
-    def generate_feedback(self, title, original_text, features):
+    def usage_summary(self):
+        """Aggregate latency and token usage over all calls so far."""
+        with self._lock:
+            usage = list(self.usage)
+        calls = [u for u in usage if u["status"] != "cached"]
+        latencies = sorted(u["seconds"] for u in calls)
+        return {
+            "calls": len(calls),
+            "cached": len(usage) - len(calls),
+            "failed": len([u for u in calls if u["status"] == "failed"]),
+            "retries": sum(max(0, u["attempts"] - 1) for u in calls),
+            "prompt_tokens": sum(u["prompt_tokens"] for u in calls),
+            "mean_prompt_estimate": round(sum(u["prompt_estimate"] for u in usage) / len(usage)) if usage else 0,
+            "completion_tokens": sum(u["completion_tokens"] for u in calls),
+            "mean_seconds": round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+            "p95_seconds": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 3) if latencies else 0.0
+        }
+
+    def cache_key(self, prompt):
+        payload = json.dumps({"model": self.model, "prompt_version": PROMPT_VERSION, "prompt": prompt}, sort_keys=True)
+        return "llm:" + hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def cache_stats(self):
+        return self.cache.stats() if self.cache is not None else None
+
+    @staticmethod
+    def _deterministic(rule_feedback, note):
+        return {
+            "note": note,
+            "deterministic_baseline": rule_feedback,
+            "overall_score": rule_feedback["overall_score"],
+            "rigor_rating": rule_feedback["rigor_rating"],
+            "critical_gaps": rule_feedback["critical_gaps"],
+            "strengths": rule_feedback["strengths"],
+            "actionable_recommendations": rule_feedback["actionable_recommendations"]
+        }
+
+    def plan(self, title, original_text, features, force_refresh=None):
         """
-        Generates feedback using a deterministic rule engine and optionally an LLM.
+        Everything short of the LLM call: the deterministic baseline, the
+        routing decision and, when a call is still needed, the prompt and its
+        cache key. "result" is set when the paper is settled without a call
+        (no API key, not escalated, or served from the cache).
         """
         # 1. Generate Deterministic Baseline
         rule_feedback = self.rule_engine.generate_feedback(features, title=title)
-        
+        plan = {"rule_feedback": rule_feedback, "decision": None, "result": None}
+
         if not self.api_key:
-            return {
-                "note": "OPENAI_API_KEY not found. Showing deterministic audit only.",
-                "deterministic_baseline": rule_feedback,
-                "overall_score": rule_feedback["overall_score"],
-                "rigor_rating": rule_feedback["rigor_rating"],
-                "critical_gaps": rule_feedback["critical_gaps"],
-                "strengths": rule_feedback["strengths"],
-                "actionable_recommendations": rule_feedback["actionable_recommendations"]
-            }
+            plan["result"] = self._deterministic(rule_feedback, "OPENAI_API_KEY not found. Showing deterministic audit only.")
+            return plan
+
+        decision = None
+        if self.routing is not None:
+            decision = self.routing.decide(rule_feedback, features)
+            plan["decision"] = decision
+            with self._lock:
+                self.decisions.append(decision)
+            if not decision["escalate"]:
+                result = self._deterministic(rule_feedback, f"LLM review not needed ({decision['reason']}). Showing deterministic audit only.")
+                result["routing"] = decision
+                plan["result"] = result
+                return plan
 
         # 2. Enhance with LLM if API key is available
-        prompt = f"""
-        You are an elite statistical reviewer for top-tier medical journals (e.g., Nature, NEJM, The Lancet).
-        Your goal is to perform a high-rigor audit of the 'Methods' section provided below.
-        
-        ### AUDIT CRITERIA
-        1. **Statistical Assumptions (CRITICAL):** 
-           - Look for explicit confirmation of assumptions (e.g., Normality for t-tests/ANOVA, Proportional Hazards for Cox regression).
-           - If a parametric test is used without mentioning normality checks or if data transformation isn't discussed for skewed data, flag this as a major reporting gap.
-           - Check for homoscedasticity or collinearity assessments if applicable.
-        2. **Multiplicity Correction:**
-           - If multiple primary endpoints, multiple subgroups, or multiple time points are analyzed, is there an adjustment (Bonferroni, FDR, etc.)?
-           - If no adjustment is made, explain why it's a risk for Type I error.
-        3. **Study Design & Transparency:**
-           - Blinding: Is it described in detail (who, how, which phase)? "Single-blinded" without process details is LOW quality.
-           - Randomization: Is the sequence generation and allocation concealment described?
-           - Sample Size: Is there a formal power calculation? If "approximate" or "estimated," flag for lack of precision.
-        4. **Analysis Principles:**
-           - ITT/Per-Protocol: Is the choice clearly stated and justified?
-           - Software: Specific versions and packages must be cited.
-
-        Article Title: {title}
-        
-        ### Extracted Features Summary (from deterministic audit):
-        {json.dumps(features, indent=2)}
-        
-        ### Original Text Excerpt:
-        {original_text[:8000]}...
-
-        ### OUTPUT FORMAT (JSON ONLY)
-        Provide feedback in the following format:
-        {{
-            "overall_score": 1-10,
-            "rigor_rating": "High/Medium/Low",
-            "critical_gaps": ["List specific missing checks or reporting flaws"],
-            "strengths": [],
-            "weaknesses": [],
-            "foundational_rigor_audit": {{
-                "assumptions_handling": "Detailed assessment of how they handled/reported assumptions",
-                "multiplicity_handling": "Assessment of multiple testing adjustments",
-                "transparency_rating": "Rating of blinding/randomization details"
-            }},
-            "actionable_recommendations": [
-                {{
-                    "item": "Specific Section",
-                    "issue": "Specific reporting or statistical flaw",
-                    "recommendation": "Technical fix"
-                }}
-            ],
-            "nature_adherence_score": 1-10
-        }}
+        prompt, prompt_report = self.prompt_builder.build(title, original_text, features, rule_feedback)
+        plan.update(prompt=prompt, prompt_report=prompt_report, key=self.cache_key(prompt))
+
+        refresh = self.force_refresh if force_refresh is None else force_refresh
+        if self.cache is not None and not refresh:
+            start = time.perf_counter()
+            cached = self.cache.get(plan["key"])
+            if cached is not None:
+                self._record("cached", start, prompt_report=prompt_report)
+                plan["result"] = self._with_routing({
+                    "deterministic_baseline": rule_feedback,
+                    "llm_enhanced_feedback": json.loads(cached)
+                }, decision)
+        return plan
+
+    def generate_feedback(self, title, original_text, features, force_refresh=None):
         """
+        Generates feedback using a deterministic rule engine and optionally an LLM.
+        """
+        plan = self.plan(title, original_text, features, force_refresh)
+        if plan["result"] is not None:
+            return plan["result"]
+        return self._call_llm(plan)
+
+    def _call_llm(self, plan):
+        rule_feedback, decision = plan["rule_feedback"], plan["decision"]
 
+        start = time.perf_counter()
         try:
-            client = openai.OpenAI()
-            response = client.chat.completions.create(
-                model="gpt-4o",
-                messages=[{"role": "user", "content": prompt}],
-                response_format={ "type": "json_object" }
-            )
-            llm_feedback = json.loads(response.choices[0].message.content)
+            llm_feedback, usage, attempts = self.complete(plan["prompt"])
+            self._record("ok", start, attempts, usage, plan["prompt_report"])
+            if self.cache is not None:
+                self.cache.set(plan["key"], json.dumps(llm_feedback).encode("utf-8"))
             # Merge or keep both
-            return {
+            return self._with_routing({
                 "deterministic_baseline": rule_feedback,
                 "llm_enhanced_feedback": llm_feedback
-            }
+            }, decision)
         except Exception as e:
-            return {
+            # Fall back to the deterministic audit; the caller records the failure
+            self._record("failed", start, getattr(e, "attempts", 1), prompt_report=plan["prompt_report"])
+            return self._with_routing({
                 "error": f"LLM Error: {str(e)}",
                 "deterministic_baseline": rule_feedback
-            }
+            }, decision)
+
+    def generate_with_deadline(self, title, original_text, features, budget, on_late=None, on_baseline=None,
+                               force_refresh=None):
+        """
+        generate_feedback() that returns within about `budget` seconds. The
+        deterministic audit is computed first; the LLM review runs on a
+        background thread and is attached only if it finishes before the
+        deadline. Otherwise the deterministic audit is returned, and the LLM
+        result is passed to on_late(result) when it arrives (or dropped when
+        on_late is None; it still fills the cache). on_baseline(rule_feedback)
+        is called as soon as the deterministic audit is ready, so callers can
+        show it while the LLM is working. result["timing"] records
+        the time spent on each path and what happened to the LLM review.
+        """
+        start = time.perf_counter()
+        plan = self.plan(title, original_text, features, force_refresh)
+        timing = {"budget_seconds": budget, "baseline_seconds": round(time.perf_counter() - start, 3)}
+        if on_baseline is not None:
+            on_baseline(plan["rule_feedback"])
+        if plan["result"] is not None:
+            result = plan["result"]
+            timing["llm"] = "cached" if "llm_enhanced_feedback" in result else "skipped"
+            result["timing"] = timing
+            return result
+
+        lock = threading.Lock()
+        state = {"late": False, "result": None}
+        finished = threading.Event()
+
+        def call():
+            llm_start = time.perf_counter()
+            result = self._call_llm(plan)
+            result["timing"] = dict(timing, llm_seconds=round(time.perf_counter() - llm_start, 3))
+            with lock:
+                late = state["late"]
+                state["result"] = result
+            finished.set()
+            if late and on_late is not None:
+                result["timing"].update(llm="late", total_seconds=round(time.perf_counter() - start, 3))
+                on_late(result)
+
+        # A daemon thread, so a command-line caller can exit without waiting for a late reply
+        threading.Thread(target=call, daemon=True).start()
+        finished.wait(max(0.0, budget - (time.perf_counter() - start)))
+        with lock:
+            result = state["result"]
+            if result is None:
+                state["late"] = True
+
+        if result is not None:
+            result["timing"].update(llm="failed" if "error" in result else "attached",
+                                    total_seconds=round(time.perf_counter() - start, 3))
+            return result
+        result = self._with_routing(self._deterministic(
+            plan["rule_feedback"], f"LLM review did not finish within {budget}s. Showing deterministic audit only."
+        ), plan["decision"])
+        result["timing"] = dict(timing, llm="pending" if on_late is not None else "dropped",
+                                total_seconds=round(time.perf_counter() - start, 3))
+        return result
+
+    @staticmethod
+    def _with_routing(result, decision):
+        if decision is not None:
+            result["routing"] = decision
+        return result
 
-def process_features(features_folder="data/features", processed_folder="data/processed", output_folder="data/feedback"):
+def paper_text(processed_data):
+    """The Methods text the LLM reviews for a processed paper."""
+    full_text = ""
+    for m in processed_data.get("methods", []):
+        full_text += m.get("content", "") + "\n"
+    return full_text
+
+def _load_paper(features_folder, processed_folder, filename):
+    # Load features
+    with open(os.path.join(features_folder, filename), "r", encoding="utf-8") as f:
+        feature_data = json.load(f)
+    
+    # Load original text for context
+    with open(os.path.join(processed_folder, filename), "r", encoding="utf-8") as f:
+        processed_data = json.load(f)
+    
+    return feature_data, paper_text(processed_data)
+
+def save_feedback(output_path, filename, feature_data, feedback, checkpoint):
+    output_data = {
+        "title": feature_data.get("title"),
+        "pmcid": feature_data.get("pmcid"),
+        "features": feature_data.get("features"),
+        "feedback": feedback
+    }
+
+    atomic_write_json(output_path, output_data)
+    # Keep the baseline output but retry the LLM call on resume
+    if "error" in feedback:
+        checkpoint.mark(filename, "failed", error=feedback["error"])
+        print(f"LLM failed for {filename}, saved deterministic baseline: {feedback['error']}")
+    else:
+        checkpoint.mark(filename, "done")
+        print(f"Saved feedback to: {output_path}")
+
+def write_routing_report(generator, path):
+    report = routing_report(generator.decisions, generator.usage)
+    report["policy"] = generator.routing.policy
+    atomic_write_json(path, report)
+    print(f"Routing: {report['escalated']}/{report['papers']} papers sent to the LLM {report['reasons']}")
+    print(f"  estimated savings: {report['estimated_tokens_saved']} tokens, "
+          f"{report['estimated_call_seconds_saved']}s of LLM call time (report: {path})")
+
+def process_features(features_folder="data/features", processed_folder="data/processed", output_folder="data/feedback", resume=False,
+                     use_cache=True, force_refresh=False, concurrency=8, generator=None, token_budget=3000,
+                     routing=None, route_all=False, routing_report_path="data/llm_routing_report.json"):
+    """
+    Generate feedback for every features file, with up to `concurrency` LLM
+    requests in flight. With resume=True, papers whose feedback was completed
+    by an earlier run are skipped; papers whose LLM call failed are retried.
+    LLM responses come from the cache when the prompt is unchanged, unless
+    force_refresh is set. Only papers the routing policy (default
+    RoutingPolicy()) escalates go to the LLM, unless route_all is set.
+    """
     if not os.path.exists(output_folder):
         os.makedirs(output_folder)
         
-    generator = FeedbackGenerator()
+    if generator is None:
+        if routing is None and not route_all:
+            routing = RoutingPolicy()
+        generator = FeedbackGenerator(use_cache=use_cache, force_refresh=force_refresh, token_budget=token_budget, routing=routing)
+    checkpoint = stage_checkpoint("feedback_llm", resume)
     
-    for filename in os.listdir(features_folder):
-        if filename.endswith(".json"):
-            # Load features
-            with open(os.path.join(features_folder, filename), "r", encoding="utf-8") as f:
-                feature_data = json.load(f)
-            
-            # Load original text for context
-            with open(os.path.join(processed_folder, filename), "r", encoding="utf-8") as f:
-                processed_data = json.load(f)
-            
-            full_text = ""
-            for m in processed_data.get("methods", []):
-                full_text += m.get("content", "") + "\n"
-            
-            print(f"Generating feedback for: {filename}")
-            feedback = generator.generate_feedback(
-                feature_data.get("title"),
-                full_text,
-                feature_data.get("features")
-            )
-            
-            output_data = {
-                "title": feature_data.get("title"),
-                "pmcid": feature_data.get("pmcid"),
-                "features": feature_data.get("features"),
-                "feedback": feedback
-            }
-            
+    pending = [filename for filename in sorted(os.listdir(features_folder))
+               if filename.endswith(".json") and not checkpoint.is_done(filename, os.path.join(output_folder, filename))]
+
+    def audit(filename):
+        feature_data, full_text = _load_paper(features_folder, processed_folder, filename)
+        feedback = generator.generate_feedback(
+            feature_data.get("title"),
+            full_text,
+            feature_data.get("features")
+        )
+        return feature_data, feedback
+
+    start = time.perf_counter()
+    # Without an API key each call is a quick local rule audit; threads would only add overhead
+    workers = max(1, concurrency) if generator.api_key else 1
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(audit, filename): filename for filename in pending}
+        for future in as_completed(futures):
+            filename = futures[future]
             output_path = os.path.join(output_folder, filename)
-            with open(output_path, "w", encoding="utf-8") as f:
-                json.dump(output_data, f, indent=2)
-            print(f"Saved feedback to: {output_path}")
+            # One bad paper is recorded and retried on --resume rather than ending the run
+            try:
+                feature_data, feedback = future.result()
+                save_feedback(output_path, filename, feature_data, feedback, checkpoint)
+            except Exception as e:
+                print(f"Error generating feedback for {filename}: {type(e).__name__}: {e}")
+                checkpoint.mark(filename, "failed", error=f"{type(e).__name__}: {e}")
+
+    if generator.api_key:
+        elapsed = time.perf_counter() - start
+        usage = generator.usage_summary()
+        print(f"\nLLM calls: {usage['calls']} in {elapsed:.1f}s ({usage['cached']} served from cache, "
+              f"{usage['failed']} failed, {usage['retries']} retries)")
+        print(f"  latency mean {usage['mean_seconds']}s / p95 {usage['p95_seconds']}s, "
+              f"tokens {usage['prompt_tokens']} prompt + {usage['completion_tokens']} completion, "
+              f"~{usage['mean_prompt_estimate']} tokens per prompt")
+        if generator.routing is not None:
+            write_routing_report(generator, routing_report_path)
+        stats = generator.cache_stats()
+        if stats:
+            print(f"LLM cache: {stats['hits']} hits, {stats['misses']} misses (hit rate {stats['hit_rate']:.0%})")
 
 if __name__ == "__main__":
-    process_features()
+    import argparse
+    parser = argparse.ArgumentParser(description="Generate feedback for extracted features")
+    parser.add_argument("--resume", action="store_true", help="Skip papers completed by an interrupted run and retry failures")
+    parser.add_argument("--refresh-llm", action="store_true", help="Ignore cached LLM responses and re-query the model")
+    parser.add_argument("--no-llm-cache", action="store_true", help="Neither read nor write the LLM response cache")
+    parser.add_argument("--concurrency", type=int, default=8, help="Maximum LLM requests in flight")
+    parser.add_argument("--token-budget", type=int, default=3000, help="Maximum prompt size in tokens")
+    parser.add_argument("--routing-policy", help="JSON file overriding the default LLM routing policy")
+    parser.add_argument("--route-all", action="store_true", help="Send every paper to the LLM")
+    args = parser.parse_args()
+    routing = RoutingPolicy.from_file(args.routing_policy) if args.routing_policy else None
+    process_features(resume=args.resume, use_cache=not args.no_llm_cache, force_refresh=args.refresh_llm,
+                     concurrency=args.concurrency, token_budget=args.token_budget, routing=routing, route_all=args.route_all)
@@ -1,8 +1,11 @@
 import json
 import os
 
-audit_path = r"c:\Users\Greg\Documents\PythonProjects\StatsRecommender\data\expert_audit.json"
-processed_dir = r"c:\Users\Greg\Documents\PythonProjects\StatsRecommender\data\processed"
+# The processed papers are listed from disk: the corpus index only holds papers
+# that already have feedback, and those without it are unaudited too
+data_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+audit_path = os.path.join(data_dir, "expert_audit.json")
+processed_dir = os.path.join(data_dir, "processed")
 
 with open(audit_path, "r", encoding="utf-8") as f:
     audited = json.load(f).keys()
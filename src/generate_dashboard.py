@@ -1,38 +1,40 @@
-import json
 import os
-import glob
 from collections import Counter
+from corpus_store import load_corpus, iter_rows
+
+def dashboard_entry(row):
+    """Reduce a corpus row to the fields shown on the dashboard."""
+    return {
+        "filename": row["filename"],
+        "title": row["title"] or "Unknown Title",
+        "score": row["score"],
+        "rating": row["rating"],
+        "study_type": row["study_type"],
+        "gaps": row["gaps"],
+        "strengths": row["strengths"]
+    }
 
 def generate_dashboard(feedback_dir="data/feedback", output_path="reports/rigor_dashboard.html"):
-    if not os.path.exists("reports"):
-        os.makedirs("reports")
+    corpus = load_corpus(feedback_dir=feedback_dir)
+    render_dashboard([dashboard_entry(row) for row in iter_rows(corpus)], output_path)
+
+def render_dashboard(entries, output_path="reports/rigor_dashboard.html"):
+    output_dir = os.path.dirname(output_path)
+    if output_dir and not os.path.exists(output_dir):
+        os.makedirs(output_dir)
 
-    feedback_files = glob.glob(os.path.join(feedback_dir, "*.json"))
-    all_data = []
+    all_data = list(entries)
     all_gaps = []
     all_strengths = []
     basic_science_count = 0
     
-    for fpath in feedback_files:
-        with open(fpath, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            
-            # Basic info
-            entry = {
-                "filename": os.path.basename(fpath),
-                "title": data.get("title", "Unknown Title"),
-                "score": data.get("feedback", {}).get("overall_score", 0),
-                "rating": data.get("feedback", {}).get("rigor_rating", "Unknown"),
-                "gaps": data.get("feedback", {}).get("critical_gaps", []),
-                "strengths": data.get("feedback", {}).get("strengths", [])
-            }
-            all_data.append(entry)
-            all_gaps.extend([g["message"] for g in entry["gaps"]]) # Extract message string
-            all_strengths.extend([s["message"] for s in entry["strengths"]])
-            
-            # Check for basic science domain
-            if any("Basic Science" in s["message"] for s in entry["strengths"]):
-                 basic_science_count += 1
+    for entry in all_data:
+        all_gaps.extend(entry["gaps"])
+        all_strengths.extend(entry["strengths"])
+        
+        # Check for basic science domain
+        if entry["study_type"] == "Basic Science":
+             basic_science_count += 1
 
     # Aggregate common problems
     # Aggregate common problems & strengths
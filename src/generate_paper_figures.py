@@ -1,48 +1,30 @@
 import os
-import json
-import glob
 import matplotlib
 matplotlib.use('Agg') # Force non-interactive backend
 import matplotlib.pyplot as plt
 import seaborn as sns
 import pandas as pd
 from collections import Counter
+from corpus_store import load_corpus
 
 def generate_visuals():
     print("Step 1: finding files...")
     
     # 1. Load Data
-    data = []
-    files = glob.glob("data/feedback/*.json")
-    print(f"Found {len(files)} feedback files.")
+    corpus = load_corpus()
+    print(f"Found {len(corpus.get('filename', []))} audited papers.")
     
-    if len(files) == 0:
+    if not corpus.get("filename"):
         print("WARNING: No feedback files found!")
         return
 
     print("Step 2: Processing data...")
-    for f in files:
-        with open(f, "r", encoding="utf-8") as file:
-            content = json.load(file)
-            fb = content.get("feedback", {})
-            gaps = [g["message"] for g in fb.get("critical_gaps", [])]
-            strengths = [s["message"] for s in fb.get("strengths", [])]
-            
-            # Infer Type
-            study_type = "Clinical Trial" # Default
-            if any("Observational" in s for s in strengths):
-                study_type = "Observational"
-            elif any("Basic Science" in s for s in strengths):
-                study_type = "Basic Science"
-            elif any("Non-Primary Research" in s for s in strengths):
-                study_type = "Review/Meta"
-            
-            data.append({
-                "Filename": os.path.basename(f),
-                "Score": fb.get("overall_score", 0),
-                "Type": study_type,
-                "Gaps": gaps
-            })
+    data = {
+        "Filename": corpus["filename"],
+        "Score": corpus["score"],
+        "Type": corpus["study_type"],
+        "Gaps": corpus["gaps"]
+    }
             
     df = pd.DataFrame(data)
     print(f"Dataframe created with {len(df)} rows.")
@@ -6,6 +6,7 @@ import sys
 # Add src to path
 sys.path.append(os.path.join(os.getcwd(), "src"))
 from rule_based_feedback import RuleBasedFeedbackEngine
+from corpus_store import load_corpus
 
 def generate_batch(n=20, output_file="validation_batch.txt"):
     print(f"Generating validation batch for {n} papers...")
@@ -23,6 +24,8 @@ def generate_batch(n=20, output_file="validation_batch.txt"):
     selected = random.sample(candidates, min(n, len(candidates)))
     
     engine = RuleBasedFeedbackEngine()
+    corpus = load_corpus(evidence=True)
+    papers = {f: (t, feats) for f, t, feats in zip(corpus.get("filename", []), corpus.get("title", []), corpus.get("features", []))}
     
     with open(output_file, "w", encoding="utf-8") as out:
         out.write(f"VALIDATION BATCH REPORT (N={len(selected)})\n")
@@ -35,17 +38,12 @@ def generate_batch(n=20, output_file="validation_batch.txt"):
             # We need FEATURES. Phase 3 pipeline saved features to `data/feedback/`.
             # Let's verify if data/processed has features. 
             # The view_file output showed 'features' in data/feedback, but NOT in data/processed (it just bad 'methods').
-            # So we load data/feedback/ for features.
+            # So we load features from the corpus store (built from data/feedback/).
             
-            fb_path = os.path.join("data/feedback", filename)
-            if not os.path.exists(fb_path):
+            if filename not in papers:
                 continue
                 
-            with open(fb_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                
-            features = data.get("features", {})
-            title = data.get("title", "")
+            title, features = papers[filename]
             
             # Re-generate feedback with NEW rules (Observational logic)
             # RuleBasedFeedbackEngine.generate_feedback(features, title)
@@ -0,0 +1,183 @@
+import os
+import time
+import sqlite3
+import argparse
+
+HARVEST_DB = "data/harvest.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ids (
+    pmcid TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    query TEXT,
+    error TEXT,
+    updated REAL
+);
+CREATE TABLE IF NOT EXISTS harvests (
+    query TEXT PRIMARY KEY,
+    count INTEGER,
+    next_start INTEGER NOT NULL,
+    finished INTEGER NOT NULL DEFAULT 0,
+    updated REAL
+);
+CREATE INDEX IF NOT EXISTS idx_ids_status ON ids (status, updated);
+"""
+
+class HarvestIndex:
+    """
+    Persistent SQLite record of every candidate PMCID seen in a search and
+    whether it has been fetched. Membership checks are primary-key lookups,
+    so deduplicating hundreds of thousands of candidates stays linear.
+    Search progress is stored per query so interrupted harvests can resume
+    from the last saved page.
+    """
+    def __init__(self, path=HARVEST_DB):
+        self.path = path
+
+    def connect(self):
+        folder = os.path.dirname(self.path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.executescript(SCHEMA)
+        return conn
+
+    def add_seen(self, pmcids, query=None):
+        """Record candidate IDs; returns how many had not been seen before."""
+        conn = self.connect()
+        try:
+            with conn:
+                before = conn.total_changes
+                conn.executemany(
+                    "INSERT OR IGNORE INTO ids (pmcid, status, query, updated) VALUES (?, 'seen', ?, ?)",
+                    [(pmcid, query, time.time()) for pmcid in pmcids]
+                )
+                return conn.total_changes - before
+        finally:
+            conn.close()
+
+    def mark(self, pmcid, status, error=None):
+        """Set an ID's status: 'seen', 'fetched' or 'failed'."""
+        conn = self.connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT INTO ids (pmcid, status, error, updated) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(pmcid) DO UPDATE SET status = excluded.status, error = excluded.error, updated = excluded.updated",
+                    (pmcid, status, error, time.time())
+                )
+        finally:
+            conn.close()
+
+    def sync_folder(self, raw_folder="data/raw"):
+        """Mark every XML already in raw_folder as fetched."""
+        if not os.path.exists(raw_folder):
+            return 0
+        pmcids = [f[:-4] for f in os.listdir(raw_folder) if f.endswith(".xml")]
+        conn = self.connect()
+        try:
+            with conn:
+                conn.executemany(
+                    "INSERT INTO ids (pmcid, status, updated) VALUES (?, 'fetched', ?) "
+                    "ON CONFLICT(pmcid) DO UPDATE SET status = 'fetched', error = NULL",
+                    [(pmcid, time.time()) for pmcid in pmcids]
+                )
+        finally:
+            conn.close()
+        return len(pmcids)
+
+    def contains(self, pmcid):
+        conn = self.connect()
+        try:
+            return conn.execute("SELECT 1 FROM ids WHERE pmcid = ?", (pmcid,)).fetchone() is not None
+        finally:
+            conn.close()
+
+    def pending(self, limit=None, query=None):
+        """IDs still to fetch: earlier failures first, then in the order they were seen."""
+        sql = "SELECT pmcid FROM ids WHERE status IN ('failed', 'seen')"
+        params = []
+        if query is not None:
+            sql += " AND query = ?"
+            params.append(query)
+        sql += " ORDER BY status = 'seen', updated, pmcid"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        conn = self.connect()
+        try:
+            return [row["pmcid"] for row in conn.execute(sql, params)]
+        finally:
+            conn.close()
+
+    def counts(self):
+        conn = self.connect()
+        try:
+            return {row["status"]: row["n"] for row in conn.execute("SELECT status, COUNT(*) AS n FROM ids GROUP BY status")}
+        finally:
+            conn.close()
+
+    def progress(self, query):
+        conn = self.connect()
+        try:
+            row = conn.execute("SELECT count, next_start, finished FROM harvests WHERE query = ?", (query,)).fetchone()
+            return dict(row) if row else None
+        finally:
+            conn.close()
+
+    def save_progress(self, query, count, next_start, finished=False):
+        conn = self.connect()
+        try:
+            with conn:
+                conn.execute("INSERT OR REPLACE INTO harvests VALUES (?, ?, ?, ?, ?)",
+                             (query, count, next_start, int(finished), time.time()))
+        finally:
+            conn.close()
+
+def harvest(client, index, query, max_results=None, page_size=5000, resume=False):
+    """
+    Page through every result of an esearch query using the history server and
+    record the IDs in the harvest index. With resume, a query interrupted part
+    way through continues from its last saved page (a fresh WebEnv is
+    requested, since history sessions expire). Returns the number of new IDs.
+    """
+    state = index.progress(query) if resume else None
+    if state and state["finished"]:
+        return 0
+    start = state["next_start"] if state else 0
+
+    count, webenv, query_key = client.esearch_history(query)
+    total = min(count, max_results) if max_results else count
+    new = 0
+    while start < total:
+        ids = client.esearch_page(webenv, query_key, start, min(page_size, total - start))
+        if not ids:
+            break
+        new += index.add_seen(ids, query)
+        start += len(ids)
+        index.save_progress(query, count, start)
+    index.save_progress(query, count, start, finished=True)
+    return new
+
+if __name__ == "__main__":
+    from pmc_fetcher import add_client_arguments, client_from_args, print_fetch_stats
+
+    parser = argparse.ArgumentParser(description="Harvest candidate PMCIDs for a search into the harvest index")
+    parser.add_argument("query", nargs="?", help="E-utilities search term")
+    parser.add_argument("--max-results", type=int, help="Stop after this many results")
+    parser.add_argument("--page-size", type=int, default=5000)
+    parser.add_argument("--resume", action="store_true", help="Continue an interrupted harvest of the same query")
+    parser.add_argument("--index", default=HARVEST_DB)
+    add_client_arguments(parser)
+    args = parser.parse_args()
+
+    index = HarvestIndex(args.index)
+    if args.query:
+        client = client_from_args(args)
+        index.sync_folder()
+        start = time.perf_counter()
+        new = harvest(client, index, args.query, args.max_results, args.page_size, args.resume)
+        print(f"Harvested {new} new candidate IDs.")
+        print_fetch_stats(client, time.perf_counter() - start)
+    print(f"Harvest index: {index.counts()}")
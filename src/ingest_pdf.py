@@ -2,12 +2,15 @@ import os
 import json
 import pypdf
 import re
+from checkpoint import atomic_write_json, stage_checkpoint
 
-def extract_text_from_pdf(pdf_path):
+def extract_text_from_pdf(pdf_path, source_name=None):
     """
     Extracts text from a PDF file using pypdf.
     Attempts to identify the 'Methods' section heuristically.
+    pdf_path may also be a file object, in which case source_name gives the file name.
     """
+    name = os.path.basename(source_name or pdf_path)
     try:
         reader = pypdf.PdfReader(pdf_path)
         full_text = ""
@@ -53,13 +56,13 @@ def extract_text_from_pdf(pdf_path):
             context = "Extracted Methods Section"
         else:
             # Fallback: Use full text if no clear Methods section found
-            print(f"Warning: 'Methods' section not clearly identified in {os.path.basename(pdf_path)}. Using full text.")
+            print(f"Warning: 'Methods' section not clearly identified in {name}. Using full text.")
             methods_content = full_text
             context = "Full Text (Methods not isolated)"
 
         return {
-            "title": os.path.basename(pdf_path).replace(".pdf", ""),
-            "pmcid": "PDF_" + os.path.basename(pdf_path).replace(" ", "_"),
+            "title": name.replace(".pdf", ""),
+            "pmcid": "PDF_" + name.replace(" ", "_"),
             "methods": [{
                 "section_title": context,
                 "content": methods_content
@@ -68,10 +71,10 @@ def extract_text_from_pdf(pdf_path):
         }
 
     except Exception as e:
-        print(f"Error reading PDF {pdf_path}: {e}")
+        print(f"Error reading PDF {source_name or pdf_path}: {e}")
         return None
 
-def process_pdf_folder(input_folder="data/pdf_input", output_folder="data/processed"):
+def process_pdf_folder(input_folder="data/pdf_input", output_folder="data/processed", resume=False):
     if not os.path.exists(output_folder):
         os.makedirs(output_folder)
     
@@ -87,21 +90,26 @@ def process_pdf_folder(input_folder="data/pdf_input", output_folder="data/proces
         return
 
     print(f"Found {len(files)} PDFs. Processing...")
+    checkpoint = stage_checkpoint("ingest_pdf", resume)
     
     count = 0
     for filename in files:
         pdf_path = os.path.join(input_folder, filename)
+        output_filename = filename.replace(".pdf", ".json").replace(".PDF", ".json")
+        output_path = os.path.join(output_folder, output_filename)
+        if checkpoint.is_done(filename, output_path):
+            continue
+
         data = extract_text_from_pdf(pdf_path)
         
         if data:
-            output_filename = filename.replace(".pdf", ".json").replace(".PDF", ".json")
-            output_path = os.path.join(output_folder, output_filename)
-            
-            with open(output_path, "w", encoding="utf-8") as f:
-                json.dump(data, f, indent=2)
+            atomic_write_json(output_path, data)
+            checkpoint.mark(filename, "done")
             
             print(f"Processed {filename} -> {output_filename}")
             count += 1
+        else:
+            checkpoint.mark(filename, "failed")
             
     print(f"Successfully processed {count} PDFs.")
 
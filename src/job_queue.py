@@ -0,0 +1,183 @@
+import os
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+JOBS_DB = "data/jobs.db"
+# A job whose owner has not renewed its lease for this long is taken over by another queue
+LEASE_SECONDS = 60.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    lane TEXT NOT NULL,
+    status TEXT NOT NULL,
+    payload TEXT,
+    result TEXT,
+    error TEXT,
+    submitted REAL,
+    started REAL,
+    finished REAL,
+    owner TEXT,
+    lease_until REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, submitted);
+"""
+# Columns added after the first release, for job tables created before them
+MIGRATIONS = {"owner": "TEXT", "lease_until": "REAL"}
+
+def _owner_exited(owner):
+    """Whether a queue owner ("host:pid:token") was on this host and its process is gone."""
+    host, pid, _ = owner.rsplit(":", 2)
+    if host != socket.gethostname():
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        pass
+    return False
+
+class JobQueue:
+    """
+    Background audit jobs backed by a SQLite job table.
+
+    Jobs run on per-lane thread pools so a few long audits (large uploads,
+    LLM-enhanced runs) cannot occupy every worker and starve short ones.
+    Several processes may share the job table. Each job belongs to the queue
+    that submitted it, which renews a lease on its jobs while it runs and
+    claims a job atomically before running it, so a job runs once. Jobs
+    whose owner has exited or let its lease lapse are taken over and run
+    again from their stored payload.
+    """
+    def __init__(self, handlers, db_path=JOBS_DB, lanes=None, long_threshold=200000, lease=LEASE_SECONDS):
+        self.handlers = handlers
+        self.db_path = db_path
+        self.long_threshold = long_threshold
+        self.lease = lease
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        lanes = lanes or {"short": 4, "long": 1}
+        self.pools = {lane: ThreadPoolExecutor(max_workers=n, thread_name_prefix=f"jobs-{lane}") for lane, n in lanes.items()}
+        self._local = threading.local()
+
+        folder = os.path.dirname(db_path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+        conn = self._conn()
+        conn.executescript(SCHEMA)
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+        for name, kind in MIGRATIONS.items():
+            if name not in columns:
+                conn.execute(f"ALTER TABLE jobs ADD COLUMN {name} {kind}")
+        conn.commit()
+        self._requeue_interrupted()
+        threading.Thread(target=self._heartbeat, name="jobs-lease", daemon=True).start()
+
+    def _conn(self):
+        # sqlite3 connections are per-thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def _update(self, job_id, **fields):
+        conn = self._conn()
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        conn.execute(f"UPDATE jobs SET {columns} WHERE id = ?", list(fields.values()) + [job_id])
+        conn.commit()
+
+    def _heartbeat(self):
+        while True:
+            time.sleep(self.lease / 3)
+            try:
+                conn = self._conn()
+                conn.execute("UPDATE jobs SET lease_until = ? WHERE owner = ? AND status IN ('queued', 'running')",
+                             (time.time() + self.lease, self.owner))
+                conn.commit()
+                self._requeue_interrupted()
+            except sqlite3.Error:
+                pass
+
+    def _requeue_interrupted(self):
+        """Take over queued or running jobs whose owner has exited or whose lease has lapsed."""
+        now = time.time()
+        rows = self._conn().execute(
+            "SELECT id, lane, status, owner, lease_until FROM jobs WHERE status IN ('queued', 'running') "
+            "AND (owner IS NULL OR owner != ?) ORDER BY submitted", (self.owner,)
+        ).fetchall()
+        for row in rows:
+            lapsed = row["owner"] is None or row["lease_until"] is None or row["lease_until"] < now
+            if not lapsed and not _owner_exited(row["owner"]):
+                continue
+            conn = self._conn()
+            # Only one queue can move the job from its dead owner
+            taken = conn.execute(
+                "UPDATE jobs SET status = 'queued', started = NULL, owner = ?, lease_until = ? "
+                "WHERE id = ? AND status = ? AND owner IS ?",
+                (self.owner, now + self.lease, row["id"], row["status"], row["owner"])
+            ).rowcount
+            conn.commit()
+            if taken:
+                self.pools.get(row["lane"], self.pools["short"]).submit(self._run, row["id"])
+
+    def submit(self, kind, payload, size=0):
+        """Queue a job and return its id immediately. size picks the lane."""
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job_id = uuid.uuid4().hex
+        lane = "long" if size >= self.long_threshold and "long" in self.pools else "short"
+        conn = self._conn()
+        conn.execute(
+            "INSERT INTO jobs (id, kind, lane, status, payload, submitted, owner, lease_until) VALUES (?, ?, ?, 'queued', ?, ?, ?, ?)",
+            (job_id, kind, lane, json.dumps(payload), time.time(), self.owner, time.time() + self.lease)
+        )
+        conn.commit()
+        self.pools[lane].submit(self._run, job_id)
+        return job_id
+
+    def _run(self, job_id):
+        conn = self._conn()
+        # Claim the job; if another queue already has it, leave it alone
+        claimed = conn.execute(
+            "UPDATE jobs SET status = 'running', started = ?, owner = ?, lease_until = ? WHERE id = ? AND status = 'queued'",
+            (time.time(), self.owner, time.time() + self.lease, job_id)
+        ).rowcount
+        conn.commit()
+        if not claimed:
+            return
+        row = conn.execute("SELECT kind, payload FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        try:
+            result = self.handlers[row["kind"]](json.loads(row["payload"]))
+            # The payload is no longer needed once the job has finished
+            self._update(job_id, status="done", result=json.dumps(result), payload=None, finished=time.time())
+        except Exception as e:
+            self._update(job_id, status="failed", error=str(e), payload=None, finished=time.time())
+
+    def status(self, job_id):
+        row = self._conn().execute(
+            "SELECT id, kind, lane, status, error, submitted, started, finished FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        if job["status"] == "queued":
+            job["position"] = self._conn().execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND lane = ? AND submitted < ?",
+                (job["lane"], job["submitted"])
+            ).fetchone()[0]
+        return job
+
+    def result(self, job_id):
+        """Return (status, result) for a job, or (None, None) if it does not exist."""
+        row = self._conn().execute("SELECT status, result FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None, None
+        return row["status"], json.loads(row["result"]) if row["result"] else None
@@ -0,0 +1,248 @@
+import os
+import json
+import time
+import argparse
+from checkpoint import atomic_write, atomic_write_json, stage_checkpoint
+from feedback_generator import FeedbackGenerator, PROMPT_VERSION, _load_paper, save_feedback, write_routing_report
+from llm_routing import RoutingPolicy
+
+BATCH_STATE = "data/llm_batch_state.json"
+BATCH_INPUT_DIR = "data/llm_batches"
+ENDPOINT = "/v1/chat/completions"
+# The Batch API accepts at most 50,000 requests and 200 MB per input file
+MAX_REQUESTS = 50000
+MAX_BYTES = 200 * 1000 * 1000
+TERMINAL = {"completed", "failed", "expired", "cancelled"}
+
+def batch_request(generator, filename, prompt):
+    """One line of a batch input file: the same request complete() would send."""
+    return {
+        "custom_id": filename,
+        "method": "POST",
+        "url": ENDPOINT,
+        "body": {
+            "model": generator.model,
+            "messages": [{"role": "user", "content": prompt}],
+            "response_format": {"type": "json_object"}
+        }
+    }
+
+def load_state(path=BATCH_STATE):
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def prepare(generator, filenames, features_folder, processed_folder, output_folder, checkpoint):
+    """
+    Plan every paper. Papers settled without a call (not escalated or cached)
+    are written straight away; the rest are returned as
+    {filename: (request line, cache key, routing decision)}.
+    """
+    requests = {}
+    for filename in filenames:
+        try:
+            feature_data, full_text = _load_paper(features_folder, processed_folder, filename)
+        except (OSError, ValueError) as e:
+            print(f"Error generating feedback for {filename}: {e}")
+            checkpoint.mark(filename, "failed", error=str(e))
+            continue
+        plan = generator.plan(feature_data.get("title"), full_text, feature_data.get("features"))
+        if plan["result"] is not None:
+            save_feedback(os.path.join(output_folder, filename), filename, feature_data, plan["result"], checkpoint)
+            continue
+        requests[filename] = (batch_request(generator, filename, plan["prompt"]), plan["key"], plan["decision"])
+    return requests
+
+def chunk_requests(lines, max_requests=MAX_REQUESTS, max_bytes=MAX_BYTES):
+    """
+    Split encoded request lines ({filename: bytes}) in filename order into
+    lists of filenames with at most max_requests lines and max_bytes bytes each.
+    """
+    chunks, chunk, size = [], [], 0
+    for filename in sorted(lines):
+        length = len(lines[filename])
+        if length > max_bytes:
+            raise ValueError(f"The batch request for {filename} is {length} bytes, over the {max_bytes} byte file limit")
+        if chunk and (len(chunk) >= max_requests or size + length > max_bytes):
+            chunks.append(chunk)
+            chunk, size = [], 0
+        chunk.append(filename)
+        size += length
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+def submit(generator, requests, state_path=BATCH_STATE, input_dir=BATCH_INPUT_DIR, max_requests=MAX_REQUESTS, max_bytes=MAX_BYTES):
+    """
+    Write the requests to JSONL input files (at most max_requests lines and
+    max_bytes bytes each), upload them and create one batch per file. The
+    batch IDs and the cache key and routing decision of every paper are saved
+    to state_path after each batch is created, so an interrupted run never
+    submits a paper twice.
+    """
+    if not os.path.exists(input_dir):
+        os.makedirs(input_dir)
+    client = generator.client()
+    state = {"model": generator.model, "prompt_version": PROMPT_VERSION, "created": time.time(), "batches": []}
+    encoded = {f: (json.dumps(requests[f][0]) + "\n").encode("utf-8") for f in requests}
+    for number, chunk in enumerate(chunk_requests(encoded, max_requests, max_bytes)):
+        lines = b"".join(encoded[f] for f in chunk)
+        input_path = os.path.join(input_dir, f"batch_{int(state['created'])}_{number}.jsonl")
+        atomic_write(input_path, lines)
+
+        uploaded = client.files.create(file=(os.path.basename(input_path), lines), purpose="batch")
+        batch = client.batches.create(input_file_id=uploaded.id, endpoint=ENDPOINT, completion_window="24h")
+        state["batches"].append({
+            "id": batch.id,
+            "input_file": input_path,
+            "status": batch.status,
+            "papers": {f: {"key": requests[f][1], "routing": requests[f][2]} for f in chunk}
+        })
+        atomic_write_json(state_path, state)
+        print(f"Submitted batch {batch.id} with {len(chunk)} requests ({len(lines)} bytes)")
+    return state
+
+def wait(client, state, state_path=BATCH_STATE, poll=60):
+    """Poll every unfinished batch until all have reached a terminal status."""
+    while True:
+        for entry in state["batches"]:
+            if entry["status"] in TERMINAL:
+                continue
+            batch = client.batches.retrieve(entry["id"])
+            entry.update(status=batch.status, output_file_id=batch.output_file_id, error_file_id=batch.error_file_id)
+            counts = batch.request_counts
+            if counts is not None:
+                print(f"Batch {entry['id']}: {batch.status} ({counts.completed}/{counts.total} completed, {counts.failed} failed)")
+            else:
+                print(f"Batch {entry['id']}: {batch.status}")
+        atomic_write_json(state_path, state)
+        if all(entry["status"] in TERMINAL for entry in state["batches"]):
+            return state
+        time.sleep(poll)
+
+def _read_jsonl(client, file_id):
+    if not file_id:
+        return []
+    text = client.files.content(file_id).text
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+def collect(generator, state, features_folder, processed_folder, output_folder, checkpoint):
+    """
+    Map batch results back to papers and write their feedback records.
+    Successful responses are added to the LLM cache; errors, unparseable
+    responses and requests missing from the output keep the deterministic
+    baseline and are marked failed so a later run retries them.
+    Returns (completed, failed, usage entries).
+    """
+    client = generator.client()
+    completed, failed, usage = 0, 0, []
+    for entry in state["batches"]:
+        results = {}
+        for line in _read_jsonl(client, entry.get("output_file_id")) + _read_jsonl(client, entry.get("error_file_id")):
+            results[line["custom_id"]] = line
+
+        for filename, paper in entry["papers"].items():
+            try:
+                feature_data, _ = _load_paper(features_folder, processed_folder, filename)
+            except (OSError, ValueError) as e:
+                print(f"Error generating feedback for {filename}: {e}")
+                checkpoint.mark(filename, "failed", error=str(e))
+                failed += 1
+                continue
+            rule_feedback = generator.rule_engine.generate_feedback(feature_data.get("features"), title=feature_data.get("title"))
+
+            line = results.get(filename)
+            response = (line or {}).get("response") or {}
+            error = None
+            if line is None:
+                error = f"no result in batch {entry['id']} ({entry['status']})"
+            elif line.get("error") or response.get("status_code") != 200:
+                error = json.dumps(line.get("error") or response.get("body"))
+            else:
+                body = response["body"]
+                try:
+                    llm_feedback = json.loads(body["choices"][0]["message"]["content"])
+                except (KeyError, IndexError, ValueError) as e:
+                    error = f"unparseable response: {e}"
+                tokens = body.get("usage") or {}
+                usage.append({"status": "ok", "prompt_estimate": 0, "seconds": 0.0, "attempts": 1,
+                              "prompt_tokens": tokens.get("prompt_tokens", 0),
+                              "completion_tokens": tokens.get("completion_tokens", 0)})
+
+            if error is None:
+                if generator.cache is not None:
+                    generator.cache.set(paper["key"], json.dumps(llm_feedback).encode("utf-8"))
+                feedback = {"deterministic_baseline": rule_feedback, "llm_enhanced_feedback": llm_feedback}
+                completed += 1
+            else:
+                feedback = {"error": f"LLM Error: {error}", "deterministic_baseline": rule_feedback}
+                failed += 1
+            feedback = generator._with_routing(feedback, paper["routing"])
+            save_feedback(os.path.join(output_folder, filename), filename, feature_data, feedback, checkpoint)
+    return completed, failed, usage
+
+def run_batch(features_folder="data/features", processed_folder="data/processed", output_folder="data/feedback",
+              resume=False, poll=60, state_path=BATCH_STATE, generator=None, routing=None, route_all=False,
+              token_budget=3000, max_requests=MAX_REQUESTS, max_bytes=MAX_BYTES, routing_report_path="data/llm_routing_report.json"):
+    """
+    Audit the corpus through the OpenAI Batch API instead of one chat
+    completion per paper. If state_path holds a batch from an interrupted run,
+    that batch is polled and collected rather than resubmitted (and the
+    feedback checkpoint is resumed); otherwise pending papers are planned,
+    submitted and waited on. The state file is removed once every result has
+    been written.
+    """
+    if not os.path.exists(output_folder):
+        os.makedirs(output_folder)
+    if generator is None:
+        if routing is None and not route_all:
+            routing = RoutingPolicy()
+        generator = FeedbackGenerator(token_budget=token_budget, routing=routing)
+
+    start = time.perf_counter()
+    state = load_state(state_path)
+    if state is not None:
+        print(f"Resuming {len(state['batches'])} submitted batch(es) from {state_path}")
+        if state.get("prompt_version") != PROMPT_VERSION or state.get("model") != generator.model:
+            print("Warning: the pending batch was built with a different model or prompt version.")
+        checkpoint = stage_checkpoint("llm_batch", resume=True)
+    else:
+        checkpoint = stage_checkpoint("llm_batch", resume)
+        pending = [filename for filename in sorted(os.listdir(features_folder))
+                   if filename.endswith(".json") and not checkpoint.is_done(filename, os.path.join(output_folder, filename))]
+        requests = prepare(generator, pending, features_folder, processed_folder, output_folder, checkpoint)
+        print(f"{len(pending)} papers pending, {len(requests)} need an LLM review")
+        if not requests:
+            return
+        state = submit(generator, requests, state_path, max_requests=max_requests, max_bytes=max_bytes)
+
+    client = generator.client()
+    state = wait(client, state, state_path, poll)
+    completed, failed, usage = collect(generator, state, features_folder, processed_folder, output_folder, checkpoint)
+    os.remove(state_path)
+
+    elapsed = time.perf_counter() - start
+    print(f"\nBatch results: {completed} completed, {failed} failed in {elapsed:.1f}s")
+    print(f"  tokens {sum(u['prompt_tokens'] for u in usage)} prompt + {sum(u['completion_tokens'] for u in usage)} completion")
+    if generator.routing is not None and generator.decisions:
+        generator.usage.extend(usage)
+        write_routing_report(generator, routing_report_path)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate feedback for extracted features through the OpenAI Batch API")
+    parser.add_argument("--resume", action="store_true", help="Skip papers completed by an earlier run and retry failures")
+    parser.add_argument("--poll", type=float, default=60, help="Seconds between batch status checks")
+    parser.add_argument("--state", default=BATCH_STATE, help="Where submitted batch IDs are kept")
+    parser.add_argument("--max-requests", type=int, default=MAX_REQUESTS, help="Requests per batch input file")
+    parser.add_argument("--max-mb", type=float, default=MAX_BYTES / 1e6, help="Size limit of a batch input file in MB")
+    parser.add_argument("--token-budget", type=int, default=3000, help="Maximum prompt size in tokens")
+    parser.add_argument("--routing-policy", help="JSON file overriding the default LLM routing policy")
+    parser.add_argument("--route-all", action="store_true", help="Send every paper to the LLM")
+    args = parser.parse_args()
+
+    if not os.getenv("OPENAI_API_KEY"):
+        raise SystemExit("OPENAI_API_KEY not found; batch mode needs the API. Use feedback_generator.py for deterministic audits.")
+    routing = RoutingPolicy.from_file(args.routing_policy) if args.routing_policy else None
+    run_batch(resume=args.resume, poll=args.poll, state_path=args.state, routing=routing, route_all=args.route_all,
+              token_budget=args.token_budget, max_requests=args.max_requests, max_bytes=int(args.max_mb * 1e6))
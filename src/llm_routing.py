@@ -0,0 +1,105 @@
+import json
+from corpus_store import infer_study_type
+
+NO_EVIDENCE = "No direct quote found."
+
+DEFAULT_POLICY = {
+    # Scores inside this band (inclusive) are ambiguous enough to escalate
+    "uncertain_score": [5.0, 8.5],
+    # With this many gaps or more the paper is clearly weak; the LLM adds little
+    "max_gaps": 4,
+    # Escalate regardless of score when the rule evidence is this thin
+    "min_confidence": 0.4,
+    "skip_non_primary": True,
+    "study_types": ["Clinical Trial", "Observational", "Basic Science"]
+}
+
+def evidence_confidence(rule_feedback, features):
+    """
+    How well-supported the deterministic audit is, from 0 to 1: the share of
+    reported gaps/strengths backed by a quote, averaged with the share of
+    detected features matched more than once.
+    """
+    items = rule_feedback.get("critical_gaps", []) + rule_feedback.get("strengths", [])
+    quoted = [i for i in items if isinstance(i, dict) and i.get("evidence") and i["evidence"] != NO_EVIDENCE]
+    item_share = len(quoted) / len(items) if items else 0.0
+    present = [v for v in (features or {}).values() if v.get("present")]
+    repeated = [v for v in present if v.get("count", 0) >= 2]
+    feature_share = len(repeated) / len(present) if present else 0.0
+    return round((item_share + feature_share) / 2, 3)
+
+class RoutingPolicy:
+    """
+    Decides from the deterministic audit whether a paper is worth an LLM
+    review. Non-primary research and study types outside the policy are never
+    escalated. Thinly evidenced audits and scores in the uncertain band are;
+    papers that are clearly strong (above the band) or clearly weak (below it,
+    or at max_gaps or more) are not.
+    """
+    def __init__(self, policy=None):
+        self.policy = dict(DEFAULT_POLICY, **(policy or {}))
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def decide(self, rule_feedback, features):
+        """Return a dict with escalate (bool), reason and the inputs used."""
+        strengths = [s["message"] if isinstance(s, dict) else str(s) for s in rule_feedback.get("strengths", [])]
+        score = rule_feedback.get("overall_score", 0)
+        gaps = len(rule_feedback.get("critical_gaps", []))
+        study_type = infer_study_type(strengths)
+        non_primary = any("Non-Primary Research" in s for s in strengths)
+        confidence = evidence_confidence(rule_feedback, features)
+        low, high = self.policy["uncertain_score"]
+
+        if non_primary and self.policy["skip_non_primary"]:
+            escalate, reason = False, "non_primary"
+        elif study_type not in self.policy["study_types"]:
+            escalate, reason = False, "study_type"
+        elif confidence < self.policy["min_confidence"]:
+            escalate, reason = True, "low_confidence"
+        elif gaps >= self.policy["max_gaps"]:
+            escalate, reason = False, "clearly_weak"
+        elif score > high:
+            escalate, reason = False, "clearly_strong"
+        elif score < low:
+            escalate, reason = False, "clearly_weak"
+        else:
+            escalate, reason = True, "uncertain_score"
+
+        return {
+            "escalate": escalate,
+            "reason": reason,
+            "score": score,
+            "gaps": gaps,
+            "study_type": study_type,
+            "non_primary": non_primary,
+            "confidence": confidence
+        }
+
+def routing_report(decisions, usage):
+    """
+    Summarize routing decisions with the LLM time and tokens they avoided,
+    estimated from the mean cost of the calls that were made.
+    """
+    total = len(decisions)
+    escalated = [d for d in decisions if d["escalate"]]
+    reasons = {}
+    for d in decisions:
+        reasons[d["reason"]] = reasons.get(d["reason"], 0) + 1
+
+    calls = [u for u in usage if u["status"] != "cached"]
+    mean_seconds = sum(u["seconds"] for u in calls) / len(calls) if calls else 0.0
+    mean_tokens = sum(u["prompt_tokens"] + u["completion_tokens"] for u in calls) / len(calls) if calls else 0.0
+    skipped = total - len(escalated)
+    return {
+        "papers": total,
+        "escalated": len(escalated),
+        "skipped": skipped,
+        "escalation_rate": round(len(escalated) / total, 3) if total else 0.0,
+        "reasons": reasons,
+        "estimated_call_seconds_saved": round(skipped * mean_seconds, 1),
+        "estimated_tokens_saved": int(skipped * mean_tokens)
+    }
@@ -1,61 +1,167 @@
-from Bio import Entrez
 import os
 import time
+import argparse
+from checkpoint import atomic_write
+from eutils_client import EUtilsClient, EUtilsError, EUTILS_BASE
+from xml_parser import split_article_set
+from harvest_index import HarvestIndex, harvest
+from disk_cache import DiskCache, CACHE_DIR
 
-# Set your email for Entrez (NCBI requirement)
-Entrez.email = "greg@example.com" 
+EUTILS_CACHE = os.path.join(CACHE_DIR, "eutils.db")
 
-def search_pmc_trials(journal, count=5):
-    """
-    Search PMC for Clinical Trials in a specific high-impact journal.
-    """
-    query = f'"{journal}"[Journal] AND "Clinical Trial"[Publication Type] AND open access[filter]'
-    print(f"Searching PMC for: {query}")
-    
-    handle = Entrez.esearch(db="pmc", term=query, retmax=count)
-    record = Entrez.read(handle)
-    handle.close()
-    
-    return record["IdList"]
+# Contact address sent with every E-utilities request (NCBI requirement)
+NCBI_EMAIL = "greg@example.com"
 
-def fetch_pmc_fulltext(pmcid):
-    """
-    Fetch full-text XML for a given PMCID.
-    """
-    print(f"Fetching full text for PMCID: {pmcid}")
-    handle = Entrez.efetch(db="pmc", id=pmcid, rettype="xml", retmode="text")
-    xml_data = handle.read()
-    handle.close()
-    return xml_data
+def trials_query(journal):
+    return f'"{journal}"[Journal] AND "Clinical Trial"[Publication Type] AND open access[filter]'
 
 def save_raw_xml(pmcid, xml_data, folder="data/raw"):
     if not os.path.exists(folder):
         os.makedirs(folder)
     
     file_path = os.path.join(folder, f"{pmcid}.xml")
-    with open(file_path, "wb") as f:
-        f.write(xml_data)
+    atomic_write(file_path, xml_data)
     print(f"Saved: {file_path}")
 
+def fetch_and_save(client, pmcids, folder="data/raw", on_saved=None, batch_size=1, max_rounds=3):
+    """
+    Fetch many PMCIDs concurrently through an EUtilsClient and save each as it
+    arrives. on_saved(pmcid, error) is called once per ID. Returns the number saved.
+
+    With batch_size > 1, IDs are requested in comma-separated chunks and the
+    returned <pmc-articleset> is split into one file per article. IDs missing
+    from a response (or in a failed request) are retried in smaller chunks for
+    up to max_rounds rounds before being reported as errors.
+    """
+    if batch_size <= 1:
+        def handle(pmcid, xml_data, error):
+            if error is None:
+                try:
+                    save_raw_xml(pmcid, xml_data, folder)
+                except OSError as e:
+                    error = e
+            if error is not None:
+                print(f"Error fetching {pmcid}: {error}")
+            if on_saved:
+                on_saved(pmcid, error)
+
+        return client.fetch_many(pmcids, on_result=handle)
+
+    saved = 0
+    pending = []
+    errors = {}
+    # Articles fetched before (even if since deleted from folder) come from the cache
+    for pmcid in pmcids:
+        article = client.cached_article(pmcid)
+        if article is None:
+            pending.append(pmcid)
+            continue
+        save_raw_xml(pmcid, article, folder)
+        saved += 1
+        if on_saved:
+            on_saved(pmcid, None)
+
+    for round_number in range(max_rounds):
+        if not pending:
+            break
+        missing = []
+
+        def handle_batch(batch, xml_data, error):
+            nonlocal saved
+            articles = {}
+            if error is None:
+                try:
+                    articles = split_article_set(xml_data)
+                except Exception as e:
+                    error = e
+            for pmcid in batch:
+                article = articles.get(str(pmcid).upper().replace("PMC", ""))
+                if article is None:
+                    errors[pmcid] = error or EUtilsError(f"{pmcid} missing from efetch response")
+                    missing.append(pmcid)
+                    continue
+                client.store_article(pmcid, article)
+                try:
+                    save_raw_xml(pmcid, article, folder)
+                except OSError as e:
+                    errors[pmcid] = e
+                    missing.append(pmcid)
+                    continue
+                saved += 1
+                if on_saved:
+                    on_saved(pmcid, None)
+
+        batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+        client.fetch_many(batches, on_result=handle_batch)
+        if missing:
+            print(f"Round {round_number + 1}: {len(missing)} IDs missing, retrying in smaller batches...")
+        pending = missing
+        # Smaller chunks on retry so one problem ID does not take a whole batch with it
+        batch_size = max(1, batch_size // 4)
+
+    for pmcid in pending:
+        print(f"Error fetching {pmcid}: {errors[pmcid]}")
+        if on_saved:
+            on_saved(pmcid, errors[pmcid])
+    return saved
+
+def print_fetch_stats(client, elapsed):
+    stats = client.summary()
+    print(f"\nFetch stats: {stats['requests']} requests in {elapsed:.1f}s "
+          f"({stats['requests'] / max(elapsed, 1e-9):.2f} req/s, limit {client.rate}/s)")
+    if stats["requests"]:
+        print(f"  retries: {stats['retries']}, failed: {stats['failed']}, "
+              f"latency p50 {stats['p50_seconds']}s / p95 {stats['p95_seconds']}s / max {stats['max_seconds']}s")
+    if client.cache is not None:
+        cache = client.cache.stats()
+        print(f"  cache: {cache['hits']} hits, {cache['misses']} misses, {cache['entries']} entries ({cache['bytes'] / 1024 ** 2:.1f} MB)")
+
+def add_client_arguments(parser):
+    """Command-line options shared by the fetching scripts."""
+    parser.add_argument("--rate", type=float, default=None, help="Requests per second (default: 3, or 10 with NCBI_API_KEY)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Maximum requests in flight")
+    parser.add_argument("--batch-size", type=int, default=50, help="PMCIDs per efetch request (1 fetches one at a time)")
+    parser.add_argument("--base-url", default=EUTILS_BASE, help="E-utilities base URL (e.g. a local fake_eutils.py server)")
+    parser.add_argument("--cache", default=EUTILS_CACHE, help="Response cache file")
+    parser.add_argument("--no-cache", action="store_true", help="Do not read or write the response cache")
+    parser.add_argument("--search-ttl", type=float, default=24, help="Hours before cached search results expire")
+    parser.add_argument("--cache-size", type=float, default=2048, help="Cache size limit in MB")
+    parser.add_argument("--offline", action="store_true", help="Serve only from the response cache")
+
+def client_from_args(args):
+    cache = None if args.no_cache else DiskCache(args.cache, max_bytes=int(args.cache_size * 1024 ** 2))
+    return EUtilsClient(base_url=args.base_url, email=NCBI_EMAIL, rate=args.rate, max_concurrency=args.concurrency,
+                        cache=cache, search_ttl=args.search_ttl * 3600, offline=args.offline)
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fetch clinical trial full texts from PMC")
+    add_client_arguments(parser)
+    parser.add_argument("--per-journal", type=int, default=20, help="Search results to harvest per journal")
+    parser.add_argument("--resume", action="store_true", help="Continue interrupted searches from their last saved page")
+    args = parser.parse_args()
+
+    client = client_from_args(args)
+    index = HarvestIndex()
+    index.sync_folder("data/raw")
     journals = ["Nature Medicine", "The Lancet", "NEJM", "BMJ", "JAMA"]
-    trials_per_journal = 20
     
+    start = time.perf_counter()
+    to_fetch = []
     for journal in journals:
-        print(f"\n--- Processing Journal: {journal} ---")
-        pmc_ids = search_pmc_trials(journal, count=trials_per_journal)
-        print(f"Found IDs: {pmc_ids}")
-        
-        for pmcid in pmc_ids:
-            try:
-                # Check if file already exists to avoid redundant downloads
-                if os.path.exists(os.path.join("data/raw", f"{pmcid}.xml")):
-                    print(f"Skipping {pmcid}, already exists.")
-                    continue
-                    
-                xml = fetch_pmc_fulltext(pmcid)
-                save_raw_xml(pmcid, xml)
-                # Be nice to NCBI servers
-                time.sleep(1)
-            except Exception as e:
-                print(f"Error fetching {pmcid} for {journal}: {e}")
+        print(f"\n--- Searching Journal: {journal} ---")
+        query = trials_query(journal)
+        try:
+            new = harvest(client, index, query, max_results=args.per_journal, resume=args.resume)
+        except Exception as e:
+            print(f"Search failed for {journal}: {e}")
+            continue
+        pending = index.pending(query=query)
+        print(f"{new} new IDs, {len(pending)} to fetch")
+        to_fetch.extend(pending)
+
+    def record(pmcid, error):
+        index.mark(pmcid, "fetched" if error is None else "failed", None if error is None else str(error))
+
+    print(f"\nFetching {len(to_fetch)} articles...")
+    fetch_and_save(client, to_fetch, on_saved=record, batch_size=args.batch_size)
+    print_fetch_stats(client, time.perf_counter() - start)
@@ -0,0 +1,184 @@
+import re
+import json
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Static instructions come first and never vary between papers, so providers
+# that cache prompt prefixes can reuse them across requests.
+INSTRUCTIONS = """You are an elite statistical reviewer for top-tier medical journals (e.g., Nature, NEJM, The Lancet).
+Your goal is to perform a high-rigor audit of the 'Methods' section of the article described below.
+
+### AUDIT CRITERIA
+1. **Statistical Assumptions (CRITICAL):**
+   - Look for explicit confirmation of assumptions (e.g., Normality for t-tests/ANOVA, Proportional Hazards for Cox regression).
+   - If a parametric test is used without mentioning normality checks or if data transformation isn't discussed for skewed data, flag this as a major reporting gap.
+   - Check for homoscedasticity or collinearity assessments if applicable.
+2. **Multiplicity Correction:**
+   - If multiple primary endpoints, multiple subgroups, or multiple time points are analyzed, is there an adjustment (Bonferroni, FDR, etc.)?
+   - If no adjustment is made, explain why it's a risk for Type I error.
+3. **Study Design & Transparency:**
+   - Blinding: Is it described in detail (who, how, which phase)? "Single-blinded" without process details is LOW quality.
+   - Randomization: Is the sequence generation and allocation concealment described?
+   - Sample Size: Is there a formal power calculation? If "approximate" or "estimated," flag for lack of precision.
+4. **Analysis Principles:**
+   - ITT/Per-Protocol: Is the choice clearly stated and justified?
+   - Software: Specific versions and packages must be cited.
+
+### INPUTS
+- "Extracted Features" lists the reporting elements a deterministic rule engine detected (with match counts and matched terms), the elements it did not detect, and the gaps and strengths it reported with their evidence.
+- "Relevant Text Passages" are the passages of the Methods text around statistical content, in document order. Passages that were left out are marked with "[...]".
+
+### OUTPUT FORMAT (JSON ONLY)
+Provide feedback in the following format:
+{
+    "overall_score": 1-10,
+    "rigor_rating": "High/Medium/Low",
+    "critical_gaps": ["List specific missing checks or reporting flaws"],
+    "strengths": [],
+    "weaknesses": [],
+    "foundational_rigor_audit": {
+        "assumptions_handling": "Detailed assessment of how they handled/reported assumptions",
+        "multiplicity_handling": "Assessment of multiple testing adjustments",
+        "transparency_rating": "Rating of blinding/randomization details"
+    },
+    "actionable_recommendations": [
+        {
+            "item": "Specific Section",
+            "issue": "Specific reporting or statistical flaw",
+            "recommendation": "Technical fix"
+        }
+    ],
+    "nature_adherence_score": 1-10
+}
+"""
+
+# Words that mark a passage as statistical even when no extracted feature matched in it
+STAT_TERMS = re.compile(
+    r"(?i)statistic|analy[sz]|signific|p\s*[<=>]|test\b|regression|model|confidence|variance|"
+    r"power|sample size|randomi[sz]|blind|mean|median|standard (deviation|error)|correct"
+)
+
+_encoder = None
+
+def count_tokens(text):
+    """Token count with tiktoken when installed, otherwise ~4 characters per token."""
+    global _encoder
+    if tiktoken is not None:
+        if _encoder is None:
+            _encoder = tiktoken.get_encoding("o200k_base")
+        return len(_encoder.encode(text))
+    return (len(text) + 3) // 4
+
+def split_passages(text, max_chars=700):
+    """Split text into paragraphs, breaking long paragraphs at sentence boundaries."""
+    passages = []
+    for paragraph in re.split(r"\n\s*\n|\n", text or ""):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if len(paragraph) <= max_chars:
+            passages.append(paragraph)
+            continue
+        current = ""
+        for sentence in re.split(r"(?<=[.!?])\s+", paragraph):
+            if current and len(current) + len(sentence) + 1 > max_chars:
+                passages.append(current)
+                current = ""
+            current = f"{current} {sentence}".strip()
+        if current:
+            passages.append(current)
+    return passages
+
+class PromptBuilder:
+    """
+    Builds the LLM audit prompt within a token budget.
+
+    The prompt is the static instructions, then a compact feature summary
+    (present flags with counts and a few matched terms, absent flags, and the
+    rule engine's gaps and strengths with their evidence), then as many Methods
+    passages as fit. Passages are ranked by how many extracted feature
+    matches and statistical terms they contain and are emitted in document
+    order. build() also returns a size report for the prompt sections.
+    """
+    def __init__(self, token_budget=3000, max_matches=5, max_evidence_chars=300):
+        self.token_budget = token_budget
+        self.max_matches = max_matches
+        self.max_evidence_chars = max_evidence_chars
+
+    def feature_summary(self, features, rule_feedback=None):
+        features = features or {}
+        present = {
+            name: {"count": values.get("count", 0), "matches": values.get("unique_matches", [])[:self.max_matches]}
+            for name, values in features.items() if values.get("present")
+        }
+        summary = {
+            "detected": present,
+            "not_detected": sorted(name for name in features if name not in present)
+        }
+        if rule_feedback:
+            summary["rule_gaps"] = [self._item(g) for g in rule_feedback.get("critical_gaps", [])]
+            summary["rule_strengths"] = [self._item(s) for s in rule_feedback.get("strengths", [])]
+        return json.dumps(summary, indent=1, ensure_ascii=False)
+
+    def _item(self, item):
+        if not isinstance(item, dict):
+            return {"message": str(item)}
+        evidence = item.get("evidence") or ""
+        if len(evidence) > self.max_evidence_chars:
+            evidence = evidence[:self.max_evidence_chars] + "..."
+        return {"message": item.get("message", ""), "evidence": evidence}
+
+    def _score(self, passage, terms):
+        lower = passage.lower()
+        score = sum(lower.count(term) for term in terms)
+        score += len(STAT_TERMS.findall(passage)) * 0.5
+        return score
+
+    def build(self, title, text, features, rule_feedback=None):
+        """Return (prompt, report) for one paper."""
+        summary = self.feature_summary(features, rule_feedback)
+        header = f"\nArticle Title: {title}\n\n### Extracted Features\n{summary}\n\n### Relevant Text Passages\n"
+        instructions_tokens = count_tokens(INSTRUCTIONS)
+        header_tokens = count_tokens(header)
+        available = self.token_budget - instructions_tokens - header_tokens
+
+        terms = set()
+        for values in (features or {}).values():
+            terms.update(m.lower() for m in values.get("unique_matches", []) if len(m) > 1)
+
+        passages = split_passages(text)
+        ranked = sorted(range(len(passages)), key=lambda i: (-self._score(passages[i], terms), i))
+        chosen, used = [], 0
+        for i in ranked:
+            cost = count_tokens(passages[i]) + 2
+            if used + cost <= available:
+                chosen.append(i)
+                used += cost
+
+        body = []
+        previous = -1
+        for i in sorted(chosen):
+            if i != previous + 1:
+                body.append("[...]")
+            body.append(passages[i])
+            previous = i
+        if passages and previous != len(passages) - 1:
+            body.append("[...]")
+        passage_text = "\n\n".join(body)
+
+        prompt = INSTRUCTIONS + header + passage_text
+        report = {
+            "budget": self.token_budget,
+            "instructions_tokens": instructions_tokens,
+            "features_tokens": header_tokens,
+            "passages_tokens": count_tokens(passage_text),
+            "total_tokens": count_tokens(prompt),
+            "passages_used": len(chosen),
+            "passages_total": len(passages),
+            "text_chars": len(text or ""),
+            "text_chars_used": sum(len(passages[i]) for i in chosen)
+        }
+        return prompt, report
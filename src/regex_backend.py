@@ -0,0 +1,233 @@
+import os
+import re
+import sys
+import functools
+from regex_safety import sre_parse, sre_constants as C
+
+try:
+    import re2
+except ImportError:
+    re2 = None
+
+# re: Python's backtracking engine. re2: the linear-time RE2 automaton engine
+# (pip install google-re2) for every pattern it can run with identical
+# matches, re for the rest. auto: re2 when installed, otherwise re.
+BACKENDS = ("re", "re2", "auto")
+DEFAULT_BACKEND = os.getenv("AUDIT_REGEX_BACKEND", "re")
+# RE2 rejects counted repetitions above this
+MAX_RE2_REPEAT = 1000
+
+class Unsupported(ValueError):
+    """The pattern uses a feature RE2 lacks or gives different matches for."""
+
+def available():
+    return ("re", "re2") if re2 is not None else ("re",)
+
+def resolve(backend):
+    """The engine to use for backend; raises ValueError for an unknown or missing one."""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown regex backend {backend!r}; choose from {', '.join(BACKENDS)}")
+    if backend == "auto":
+        return "re2" if re2 is not None else "re"
+    if backend == "re2" and re2 is None:
+        raise ValueError("The re2 regex backend requires the google-re2 package")
+    return backend
+
+try:
+    from _sre import unicode_iscased
+except ImportError:
+    unicode_iscased = lambda code: chr(code).lower() != chr(code) or chr(code).upper() != chr(code)
+
+def _ranges(test):
+    ranges, start = [], None
+    for code in range(sys.maxunicode + 2):
+        inside = code <= sys.maxunicode and not 0xD800 <= code <= 0xDFFF and test(chr(code))
+        if inside and start is None:
+            start = code
+        elif not inside and start is not None:
+            ranges.append((start, code - 1))
+            start = None
+    return ranges
+
+def _merge(ranges):
+    merged = []
+    for low, high in sorted(ranges):
+        if merged and low <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], high))
+        else:
+            merged.append((low, high))
+    return merged
+
+@functools.lru_cache(maxsize=None)
+def _cased():
+    """Code points whose matching changes under re.IGNORECASE."""
+    return tuple(code for code in range(sys.maxunicode + 1) if not 0xD800 <= code <= 0xDFFF and unicode_iscased(code))
+
+CATEGORY_ESCAPES = {
+    C.CATEGORY_DIGIT: r"\d", C.CATEGORY_NOT_DIGIT: r"\D",
+    C.CATEGORY_SPACE: r"\s", C.CATEGORY_NOT_SPACE: r"\S",
+    C.CATEGORY_WORD: r"\w", C.CATEGORY_NOT_WORD: r"\W",
+}
+
+@functools.lru_cache(maxsize=None)
+def _category_ranges(category, ascii_only):
+    """Code point ranges of a class escape under Python's definition (Unicode unless re.ASCII)."""
+    if category not in CATEGORY_ESCAPES:
+        raise Unsupported(f"category {category}")
+    regex = re.compile(CATEGORY_ESCAPES[category], re.ASCII if ascii_only else 0)
+    return tuple(_ranges(lambda ch: regex.match(ch) is not None))
+
+def _char(code):
+    if chr(code).isascii() and chr(code).isalnum():
+        return chr(code)
+    return f"\\x{{{code:X}}}"
+
+def _class(ranges):
+    return "".join(_char(a) if a == b else f"{_char(a)}-{_char(b)}" for a, b in ranges)
+
+def _flag_letters(flags):
+    # Case-insensitivity is spelled out per character instead (see _item_ranges)
+    return "".join(letter for flag, letter in ((C.SRE_FLAG_MULTILINE, "m"), (C.SRE_FLAG_DOTALL, "s")) if flags & flag)
+
+@functools.lru_cache(maxsize=None)
+def _item_ranges(items, flags):
+    """
+    Code point ranges matched by a positive set of class items under flags.
+    Under re.IGNORECASE every cased character is tried with Python's own
+    matcher, so the class matches exactly what re matches, whatever the two
+    engines' case-folding rules.
+    """
+    ranges, source = [], []
+    for op, av in items:
+        if op == C.LITERAL:
+            ranges.append((av, av))
+            source.append(f"\\U{av:08X}")
+        elif op == C.RANGE:
+            ranges.append(av)
+            source.append(f"\\U{av[0]:08X}-\\U{av[1]:08X}")
+        elif op == C.CATEGORY:
+            ranges.extend(_category_ranges(av, bool(flags & C.SRE_FLAG_ASCII)))
+            source.append(CATEGORY_ESCAPES[av])
+        else:
+            raise Unsupported(f"{op} in a character class")
+    if flags & C.SRE_FLAG_IGNORECASE:
+        regex = re.compile("[" + "".join(source) + "]", flags & (C.SRE_FLAG_IGNORECASE | C.SRE_FLAG_ASCII))
+        ranges.extend((code, code) for code in _cased() if regex.match(chr(code)))
+        exact = re.compile("[" + "".join(source) + "]", flags & C.SRE_FLAG_ASCII)
+        if any(exact.match(chr(code)) and not regex.match(chr(code)) for code in _cased()):
+            raise Unsupported("case-insensitive class that excludes its own members")
+    return _merge(ranges)
+
+def _emit_set(items, negate, flags):
+    ranges = _item_ranges(tuple(items), flags)
+    if not negate and len(ranges) == 1 and ranges[0][0] == ranges[0][1]:
+        return _char(ranges[0][0])
+    return "[" + ("^" if negate else "") + _class(ranges) + "]"
+
+def _emit(pattern, flags):
+    out = []
+    for op, av in pattern:
+        if op == C.LITERAL:
+            out.append(_emit_set([(op, av)], False, flags))
+        elif op == C.NOT_LITERAL:
+            out.append(_emit_set([(C.LITERAL, av)], True, flags))
+        elif op == C.ANY:
+            out.append(".")
+        elif op == C.IN:
+            negate = bool(av) and av[0][0] == C.NEGATE
+            out.append(_emit_set([item for item in av if item[0] != C.NEGATE], negate, flags))
+        elif op == C.CATEGORY:
+            out.append("[" + _class(_category_ranges(av, bool(flags & C.SRE_FLAG_ASCII))) + "]")
+        elif op in (C.MAX_REPEAT, C.MIN_REPEAT):
+            low, high, body = av
+            if high != C.MAXREPEAT and high > MAX_RE2_REPEAT:
+                raise Unsupported(f"repetition count {high}")
+            if (low, high) == (0, C.MAXREPEAT):
+                count = "*"
+            elif (low, high) == (1, C.MAXREPEAT):
+                count = "+"
+            elif (low, high) == (0, 1):
+                count = "?"
+            elif high == C.MAXREPEAT:
+                count = f"{{{low},}}"
+            else:
+                count = f"{{{low},{high}}}"
+            out.append(f"(?:{_emit(body, flags)}){count}" + ("?" if op == C.MIN_REPEAT else ""))
+        elif op == C.SUBPATTERN:
+            group, add_flags, del_flags, body = av
+            scoped = (flags | add_flags) & ~del_flags
+            inner = _emit(body, scoped)
+            added, removed = _flag_letters(add_flags), _flag_letters(del_flags)
+            if added or removed:
+                inner = f"(?{added}{'-' + removed if removed else ''}:{inner})"
+            out.append(f"({inner})" if group else f"(?:{inner})")
+        elif op == C.BRANCH:
+            out.append("(?:" + "|".join(_emit(branch, flags) for branch in av[1]) + ")")
+        elif op == C.AT:
+            if av == C.AT_BEGINNING:
+                out.append("^")
+            elif av == C.AT_BEGINNING_STRING:
+                out.append("\\A")
+            elif av == C.AT_END_STRING:
+                out.append("\\z")
+            elif av == C.AT_END and flags & C.SRE_FLAG_MULTILINE:
+                out.append("$")
+            else:
+                # RE2's \b is ASCII-only, and its $ never matches before a final newline
+                raise Unsupported(f"{av}")
+        else:
+            # Lookarounds, back-references, conditionals, atomic and possessive groups
+            raise Unsupported(f"{op}")
+    return "".join(out)
+
+def to_re2(pattern, flags=0):
+    """
+    Translate a Python pattern into RE2 syntax with the same matches, spelling
+    out \\d, \\s, \\w and case-insensitive characters as the classes Python
+    matches. Raises Unsupported for patterns that need backtracking or whose
+    RE2 meaning differs.
+    """
+    parsed = sre_parse.parse(pattern, flags)
+    flags = parsed.state.flags
+    if flags & C.SRE_FLAG_LOCALE:
+        raise Unsupported("locale-dependent pattern")
+    letters = _flag_letters(flags)
+    return (f"(?{letters})" if letters else "") + _emit(parsed, flags)
+
+class LinearPattern:
+    """A pattern run by RE2, with the part of re.Pattern's interface the extractor uses."""
+    engine = "re2"
+
+    def __init__(self, pattern, compiled):
+        self.pattern = pattern
+        self.compiled = compiled
+
+    def finditer(self, text, pos=0, endpos=None):
+        return self.compiled.finditer(text, pos, len(text) if endpos is None else endpos)
+
+    def __repr__(self):
+        return f"LinearPattern({self.pattern!r})"
+
+def compile_pattern(pattern, backend=DEFAULT_BACKEND):
+    """
+    Compile pattern for backend. Under re2, patterns RE2 cannot run with
+    identical matches are compiled with re instead; check with engine().
+    Raises re.error for an invalid pattern.
+    """
+    compiled = re.compile(pattern)
+    if resolve(backend) == "re":
+        return compiled
+    try:
+        source = to_re2(pattern)
+    except Unsupported:
+        return compiled
+    options = re2.Options()
+    options.log_errors = False
+    try:
+        return LinearPattern(pattern, re2.compile(source, options))
+    except re2.error:
+        return compiled
+
+def engine(regex):
+    """Which engine runs a compiled pattern: "re" or "re2"."""
+    return getattr(regex, "engine", "re")
@@ -0,0 +1,307 @@
+import sys
+import argparse
+
+try:
+    from re import _parser as sre_parse, _constants as sre_constants
+except ImportError:  # Python < 3.11
+    import sre_parse
+    import sre_constants
+
+C = sre_constants
+UNBOUNDED = C.MAXREPEAT
+REPEATS = (C.MAX_REPEAT, C.MIN_REPEAT)
+# Characters tried when deciding whether two character sets overlap
+PROBE = [chr(i) for i in range(256)] + [" ", "’", "χ", "≤", "±"]
+# Zero-width assertions that do not depend on where the string ends
+LOCAL_AT = (C.AT_BOUNDARY, C.AT_NON_BOUNDARY)
+
+def _category(code):
+    return {
+        C.CATEGORY_DIGIT: str.isdigit,
+        C.CATEGORY_NOT_DIGIT: lambda ch: not ch.isdigit(),
+        C.CATEGORY_SPACE: str.isspace,
+        C.CATEGORY_NOT_SPACE: lambda ch: not ch.isspace(),
+        C.CATEGORY_WORD: lambda ch: ch.isalnum() or ch == "_",
+        C.CATEGORY_NOT_WORD: lambda ch: not (ch.isalnum() or ch == "_"),
+    }.get(code, lambda ch: True)
+
+def _char_test(op, av, flags):
+    """Predicate for a node that matches exactly one character."""
+    if op == C.ANY:
+        test = (lambda ch: True) if flags & C.SRE_FLAG_DOTALL else (lambda ch: ch != "\n")
+    elif op == C.LITERAL:
+        test = lambda ch: ord(ch) == av
+    elif op == C.NOT_LITERAL:
+        test = lambda ch: ord(ch) != av
+    elif op == C.IN:
+        negate = bool(av) and av[0][0] == C.NEGATE
+        members = [_char_test(o, a, 0) for o, a in av if o != C.NEGATE]
+        test = lambda ch: any(m(ch) for m in members) != negate
+    elif op == C.RANGE:
+        test = lambda ch: av[0] <= ord(ch) <= av[1]
+    elif op == C.CATEGORY:
+        test = _category(av)
+    else:
+        return None
+    if flags & C.SRE_FLAG_IGNORECASE:
+        return lambda ch: any(test(c) for c in (ch, ch.lower(), ch.upper()) if len(c) == 1)
+    return test
+
+def _overlap(a, b):
+    return any(x(ch) and y(ch) for x in a for y in b for ch in PROBE)
+
+def _scope(av, flags):
+    # (group, add_flags, del_flags, pattern) since Python 3.6
+    return (flags | av[1]) & ~av[2], av[3]
+
+def _nullable(pattern, flags):
+    """Whether pattern can match the empty string."""
+    for op, av in pattern:
+        if op in REPEATS or op == getattr(C, "POSSESSIVE_REPEAT", None):
+            if av[0] > 0 and not _nullable(av[2], flags):
+                return False
+        elif op == C.SUBPATTERN:
+            if not _nullable(*reversed(_scope(av, flags))):
+                return False
+        elif op == C.BRANCH:
+            if not any(_nullable(p, flags) for p in av[1]):
+                return False
+        elif op == getattr(C, "ATOMIC_GROUP", None):
+            if not _nullable(av, flags):
+                return False
+        elif op in (C.ASSERT, C.ASSERT_NOT, C.AT):
+            continue
+        else:
+            return False
+    return True
+
+def _first(pattern, flags):
+    """Predicates for the characters a match of pattern can start with."""
+    tests = []
+    for op, av in pattern:
+        test = _char_test(op, av, flags)
+        if test is not None:
+            tests.append(test)
+            return tests
+        if op in REPEATS or op == getattr(C, "POSSESSIVE_REPEAT", None):
+            tests += _first(av[2], flags)
+            if av[0] > 0 and not _nullable(av[2], flags):
+                return tests
+        elif op == C.SUBPATTERN:
+            scoped_flags, body = _scope(av, flags)
+            tests += _first(body, scoped_flags)
+            if not _nullable(body, scoped_flags):
+                return tests
+        elif op == C.BRANCH:
+            for branch in av[1]:
+                tests += _first(branch, flags)
+            if not any(_nullable(p, flags) for p in av[1]):
+                return tests
+        elif op == getattr(C, "ATOMIC_GROUP", None):
+            tests += _first(av, flags)
+            if not _nullable(av, flags):
+                return tests
+        elif op in (C.ASSERT, C.ASSERT_NOT, C.AT):
+            continue
+        else:
+            # Back-references and conditionals: assume anything
+            tests.append(lambda ch: True)
+            return tests
+    return tests
+
+def _chars(pattern, flags):
+    """Predicates for every character pattern can consume."""
+    tests = []
+    for op, av in pattern:
+        test = _char_test(op, av, flags)
+        if test is not None:
+            tests.append(test)
+        elif op in REPEATS or op == getattr(C, "POSSESSIVE_REPEAT", None):
+            tests += _chars(av[2], flags)
+        elif op == C.SUBPATTERN:
+            tests += _chars(*reversed(_scope(av, flags)))
+        elif op == C.BRANCH:
+            for branch in av[1]:
+                tests += _chars(branch, flags)
+        elif op == getattr(C, "ATOMIC_GROUP", None):
+            tests += _chars(av, flags)
+        elif op not in (C.ASSERT, C.ASSERT_NOT, C.AT):
+            tests.append(lambda ch: True)
+    return tests
+
+def _has_unbounded(pattern):
+    for op, av in pattern:
+        if op in REPEATS:
+            if av[1] == UNBOUNDED or _has_unbounded(av[2]):
+                return True
+        elif op == C.SUBPATTERN and _has_unbounded(av[3]):
+            return True
+        elif op == C.BRANCH and any(_has_unbounded(p) for p in av[1]):
+            return True
+        elif op in (C.ASSERT, C.ASSERT_NOT) and _has_unbounded(av[1]):
+            return True
+    return False
+
+def _branches_overlap(pattern, flags):
+    for op, av in pattern:
+        if op == C.BRANCH:
+            firsts = [_first(p, flags) for p in av[1]]
+            if any(_overlap(firsts[i], firsts[j]) for i in range(len(firsts)) for j in range(i + 1, len(firsts))):
+                return True
+        elif op == C.SUBPATTERN and _branches_overlap(*reversed(_scope(av, flags))):
+            return True
+    return False
+
+def _unwrap(pattern, flags):
+    while len(pattern) == 1 and pattern[0][0] == C.SUBPATTERN:
+        flags, pattern = _scope(pattern[0][1], flags)
+    return pattern, flags
+
+def _ambiguous_tail(pattern, flags):
+    # Optional trailing items that can also begin the next iteration, as in (ab?)+ with b = a
+    pattern, flags = _unwrap(pattern, flags)
+    i = len(pattern)
+    while i > 0 and _nullable(pattern[i - 1:i], flags):
+        i -= 1
+    return i < len(pattern) and _overlap(_chars(pattern[i:], flags), _first(pattern, flags))
+
+def _ambiguous_nesting(pattern, flags):
+    """
+    Whether an unbounded repeat inside the repeated pattern can consume what
+    follows it, so one text splits into iterations in many ways: (a+)+ but
+    not (\s+x)+.
+    """
+    pattern, flags = _unwrap(pattern, flags)
+    for i, (op, av) in enumerate(pattern):
+        if op in REPEATS and av[1] == UNBOUNDED:
+            rest = pattern[i + 1:]
+            follow = _first(rest, flags)
+            if _nullable(rest, flags):
+                follow += _first(pattern, flags)
+            if _overlap(_chars(av[2], flags), follow) or _has_unbounded(av[2]):
+                return True
+        elif _has_unbounded([(op, av)]):
+            # Deeper nesting (inside groups or alternatives): assume the worst
+            return True
+    return False
+
+def _walk(pattern, flags, start, findings):
+    """Check every unbounded repeat in pattern. start: what a match can begin with."""
+    for i, (op, av) in enumerate(pattern):
+        if op in REPEATS and av[1] == UNBOUNDED:
+            body = av[2]
+            if _nullable(body, flags):
+                findings.append(("exponential", "quantified group can match the empty string"))
+            elif _ambiguous_nesting(body, flags):
+                findings.append(("exponential", "nested unbounded quantifiers"))
+            elif _branches_overlap(body, flags) or _ambiguous_tail(body, flags):
+                findings.append(("exponential", "quantified alternatives can match the same text"))
+
+            rest = pattern[i + 1:]
+            if not _nullable(rest, flags):
+                consumed = _chars(body, flags)
+                if _overlap(consumed, start):
+                    findings.append(("quadratic", "unbounded repeat can consume the start of another match, "
+                                                  "so a failing search rescans the rest of the input from each start"))
+                for later_op, later_av in rest:
+                    if later_op in REPEATS and later_av[1] == UNBOUNDED:
+                        if _overlap(consumed, _chars(later_av[2], flags)):
+                            findings.append(("quadratic", "adjacent unbounded repeats can split the same text"))
+                        break
+                    if later_op not in (C.ASSERT, C.ASSERT_NOT, C.AT) and not _nullable([(later_op, later_av)], flags):
+                        break
+            _walk(body, flags, start, findings)
+        elif op in REPEATS:
+            _walk(av[2], flags, start, findings)
+        elif op == C.SUBPATTERN:
+            scoped_flags, body = _scope(av, flags)
+            _walk(body, scoped_flags, start, findings)
+        elif op == C.BRANCH:
+            for branch in av[1]:
+                _walk(branch, flags, start, findings)
+        elif op in (C.ASSERT, C.ASSERT_NOT):
+            _walk(av[1], flags, start, findings)
+
+def analyze(regex):
+    """
+    Static backtracking risk of a pattern (a string or compiled regex), as a
+    list of (severity, reason) pairs:
+
+    exponential: a quantified group that can match empty, nests another
+        unbounded quantifier or has overlapping alternatives. One search can
+        take time exponential in the input length.
+    quadratic: an unbounded repeat that, when the rest of the pattern fails,
+        is retried from every position it already scanned. Searching a run of
+        n such characters takes O(n^2).
+
+    The check is conservative: a pattern with no findings is linear under
+    re.finditer, but a finding does not prove that slow input exists.
+    """
+    source = getattr(regex, "pattern", regex)
+    parsed = sre_parse.parse(source, getattr(regex, "flags", 0))
+    flags = parsed.state.flags
+    findings = []
+    _walk(parsed, flags, _first(parsed, flags), findings)
+    return list(dict.fromkeys(findings))
+
+def _no_newline(pattern, flags):
+    for op, av in pattern:
+        test = _char_test(op, av, flags)
+        if test is not None:
+            if test("\n"):
+                return False
+        elif op in REPEATS or op == getattr(C, "POSSESSIVE_REPEAT", None):
+            if not _no_newline(av[2], flags):
+                return False
+        elif op == C.SUBPATTERN:
+            if not _no_newline(*reversed(_scope(av, flags))):
+                return False
+        elif op == C.BRANCH:
+            if not all(_no_newline(p, flags) for p in av[1]):
+                return False
+        elif op in (C.ASSERT, C.ASSERT_NOT):
+            if not _no_newline(av[1], flags):
+                return False
+        elif op == getattr(C, "ATOMIC_GROUP", None):
+            if not _no_newline(av, flags):
+                return False
+        elif not (op == C.AT and av in LOCAL_AT):
+            return False
+    return True
+
+def line_local(regex):
+    """
+    Whether every match of regex, and every assertion it makes, lies within
+    one line, so searching each line separately finds exactly the matches of
+    searching the whole text.
+    """
+    source = getattr(regex, "pattern", regex)
+    parsed = sre_parse.parse(source, getattr(regex, "flags", 0))
+    return _no_newline(parsed, parsed.state.flags)
+
+def find_risks(patterns):
+    """Risks in compiled rules ({feature: [regex, ...]}), as a list of dicts."""
+    risks = []
+    for feature, regexes in patterns.items():
+        for regex in regexes:
+            for severity, reason in analyze(regex):
+                risks.append({"feature": feature, "pattern": regex.pattern, "severity": severity, "reason": reason})
+    return risks
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report extraction patterns with super-linear backtracking risk")
+    parser.add_argument("patterns", nargs="*", help="Patterns to check instead of the extractor's rules")
+    args = parser.parse_args()
+
+    if args.patterns:
+        import re
+        rules = {"argument": [re.compile(p) for p in args.patterns]}
+    else:
+        from feature_extractor import FeatureExtractor
+        rules = FeatureExtractor().patterns
+    risks = find_risks(rules)
+    for risk in risks:
+        print(f"{risk['severity']:<12} {risk['feature']}: {risk['pattern']!r}\n             {risk['reason']}")
+    total = sum(len(r) for r in rules.values())
+    print(f"{len(risks)} finding(s) in {total} patterns")
+    sys.exit(1 if any(r["severity"] == "exponential" for r in risks) else 0)
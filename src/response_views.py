@@ -0,0 +1,98 @@
+import gzip
+
+VIEWS = ("summary", "evidence", "full")
+# Responses smaller than this are sent uncompressed; gzip would save little
+MIN_GZIP_BYTES = 1024
+
+def _message(item):
+    return item.get("message", "") if isinstance(item, dict) else str(item)
+
+def evidence_offsets(features):
+    """Map each evidence quote the rule engine can emit to its match offsets."""
+    offsets = {}
+    for values in (features or {}).values():
+        for example in values.get("examples", []):
+            if "start" in example:
+                offsets.setdefault(f"...{example['context']}...", {"start": example["start"], "end": example["end"]})
+    return offsets
+
+def source_offsets(result, spans):
+    """
+    A copy of result whose match offsets index the submitted text instead of
+    the normalized text that was audited. spans is normalized_spans() of the
+    submitted text; if it is None the offsets are dropped, so evidence stays
+    as quotes.
+    """
+    features = {}
+    for feature, values in (result.get("features") or {}).items():
+        examples = []
+        for example in values.get("examples", []):
+            if "start" in example:
+                start, end = example["start"], example["end"]
+                example = {k: v for k, v in example.items() if k not in ("start", "end")}
+                if spans is not None:
+                    example["start"] = spans[start][0] if start < len(spans) else spans[-1][1]
+                    example["end"] = spans[end - 1][1] if end > start else example["start"]
+            examples.append(example)
+        features[feature] = dict(values, examples=examples)
+    return dict(result, features=features)
+
+def _with_offsets(items, offsets):
+    shaped = []
+    for item in items:
+        if isinstance(item, dict) and item.get("evidence") in offsets:
+            item = dict(item, evidence=offsets[item["evidence"]])
+        shaped.append(item)
+    return shaped
+
+def shape(result, view="full", offsets=False):
+    """
+    Trim an audit result for the response.
+
+    summary: score, rating and the gap and strength messages (and the
+        extraction notice of an incomplete audit).
+    evidence: the complete feedback (with evidence quotes) but no features.
+    full: everything, as stored.
+    With offsets, evidence quotes that came from a match are replaced by
+    {"start", "end"} character offsets of the match in the audited text.
+    The stored result is never modified.
+    """
+    if view not in VIEWS:
+        raise ValueError(f"view must be one of {', '.join(VIEWS)}")
+    feedback = result.get("feedback", {})
+    if view == "summary":
+        summary = {"feedback": {
+            "overall_score": feedback.get("overall_score"),
+            "rigor_rating": feedback.get("rigor_rating"),
+            "critical_gaps": [_message(g) for g in feedback.get("critical_gaps", [])],
+            "strengths": [_message(s) for s in feedback.get("strengths", [])]
+        }}
+        if "extraction" in result:
+            summary["extraction"] = result["extraction"]
+        return summary
+
+    shaped = dict(result) if view == "full" else {
+        key: value for key, value in result.items() if key != "features"
+    }
+    if offsets:
+        lookup = evidence_offsets(result.get("features"))
+        shaped["feedback"] = dict(
+            feedback,
+            critical_gaps=_with_offsets(feedback.get("critical_gaps", []), lookup),
+            strengths=_with_offsets(feedback.get("strengths", []), lookup)
+        )
+    return shaped
+
+def gzip_response(response, accept_encoding, level=5):
+    """Compress a complete JSON response in place when the client accepts gzip."""
+    if (response.status_code < 200 or response.status_code >= 300 or response.direct_passthrough
+            or response.is_streamed or "Content-Encoding" in response.headers
+            or "gzip" not in (accept_encoding or "").lower()):
+        return response
+    data = response.get_data()
+    if len(data) < MIN_GZIP_BYTES:
+        return response
+    response.set_data(gzip.compress(data, compresslevel=level))
+    response.headers["Content-Encoding"] = "gzip"
+    response.headers["Vary"] = "Accept-Encoding"
+    return response
@@ -0,0 +1,175 @@
+import json
+import time
+import inspect
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+from disk_cache import DiskCache
+
+def normalize_text(text):
+    """Canonical form of submitted text: NFC, LF line endings, no trailing whitespace."""
+    text = unicodedata.normalize("NFC", text).replace("\r\n", "\n").replace("\r", "\n")
+    return "\n".join(line.rstrip() for line in text.split("\n")).strip()
+
+def _nfc_spans(text):
+    # Normalize each starter with the characters that compose with it, so every
+    # output character can be traced to the span of input it came from
+    chars, spans, start = [], [], 0
+    for i in range(1, len(text) + 1):
+        if i < len(text) and (unicodedata.combining(text[i]) or unicodedata.normalize("NFC", text[start:i + 1])
+                              != unicodedata.normalize("NFC", text[start:i]) + unicodedata.normalize("NFC", text[i])):
+            continue
+        for ch in unicodedata.normalize("NFC", text[start:i]):
+            chars.append(ch)
+            spans.append((start, i))
+        start = i
+    return chars, spans
+
+def normalized_spans(text):
+    """
+    For each character of normalize_text(text), the (start, end) span of text
+    it came from, or None in the rare case normalization cannot be traced
+    character by character.
+    """
+    chars, spans = _nfc_spans(text)
+    # Same steps as normalize_text: LF line endings, then trailing whitespace per line, then strip
+    lines, line, i = [], [], 0
+    while i < len(chars):
+        if chars[i] in "\r\n":
+            end = i + 2 if chars[i:i + 2] == ["\r", "\n"] else i + 1
+            lines.append((line, ("\n", (spans[i][0], spans[end - 1][1]))))
+            line, i = [], end
+        else:
+            line.append((chars[i], spans[i]))
+            i += 1
+    lines.append((line, None))
+
+    out = []
+    for line, newline in lines:
+        while line and line[-1][0].isspace():
+            line.pop()
+        out.extend(line)
+        if newline:
+            out.append(newline)
+    first = 0
+    while first < len(out) and out[first][0].isspace():
+        first += 1
+    while len(out) > first and out[-1][0].isspace():
+        out.pop()
+    out = out[first:]
+    if "".join(ch for ch, _ in out) != normalize_text(text):
+        return None
+    return [span for _, span in out]
+
+def ruleset_fingerprint(extractor, engine):
+    """
+    Hash of everything that determines an audit: the extractor's patterns and
+    regex backend and the source of the extractor and feedback engine. Any
+    rule change gives new cache keys.
+    """
+    digest = hashlib.sha256()
+    digest.update(json.dumps(extractor.rules, sort_keys=True).encode("utf-8"))
+    digest.update(getattr(extractor, "backend", "re").encode("utf-8"))
+    digest.update(inspect.getsource(type(extractor)).encode("utf-8"))
+    digest.update(inspect.getsource(type(engine)).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+class ResultCache:
+    """
+    Two-level cache of audit results: an in-process LRU of up to max_entries
+    results, optionally backed by a DiskCache shared by every worker process
+    and surviving restarts. Entries expire after ttl seconds (None keeps them
+    until evicted). Keys are the namespace, the rule-set fingerprint and the
+    SHA-256 of the content, so results are never served across rule changes.
+    """
+    def __init__(self, fingerprint, max_entries=1024, ttl=24 * 3600, disk_path=None, disk_mb=256):
+        self.fingerprint = fingerprint
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk = DiskCache(disk_path, max_bytes=disk_mb * 1024 ** 2) if disk_path else None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def key(self, namespace, content):
+        if isinstance(content, str):
+            content = content.encode("utf-8")
+        return f"audit:{namespace}:{self.fingerprint}:{hashlib.sha256(content).hexdigest()}"
+
+    def get(self, key):
+        """Return a copy of the cached result for key, or None."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] is None or entry[0] >= now:
+                    self._entries.move_to_end(key)
+                    self.memory_hits += 1
+                    return dict(entry[1])
+                del self._entries[key]
+        if self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                result = json.loads(value)
+                self._remember(key, result)
+                with self._lock:
+                    self.disk_hits += 1
+                return dict(result)
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key, result):
+        self._remember(key, result)
+        if self.disk is not None:
+            self.disk.set(key, json.dumps(result).encode("utf-8"), ttl=self.ttl)
+
+    def _remember(self, key, result):
+        expires = time.time() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._entries[key] = (expires, dict(result))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def cached(self, namespace, content, compute, keep=None):
+        """
+        Return the cached result for content, computing it on a miss. The
+        computed result is stored unless keep(result) is false.
+        """
+        key = self.key(namespace, content)
+        result = self.get(key)
+        if result is None:
+            result = compute()
+            if keep is None or keep(result):
+                self.set(key, result)
+            result = dict(result)
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def stats(self):
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            stats = {
+                "fingerprint": self.fingerprint,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round(hits / lookups, 3) if lookups else 0.0
+            }
+        if self.disk is not None:
+            disk = self.disk.stats()
+            stats["disk"] = {"entries": disk["entries"], "bytes": disk["bytes"]}
+        return stats
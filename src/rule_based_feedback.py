@@ -1,6 +1,7 @@
 import json
 import os
 import re
+from checkpoint import atomic_write_json, stage_checkpoint
 
 class RuleBasedFeedbackEngine:
     def __init__(self):
@@ -68,7 +69,7 @@ class RuleBasedFeedbackEngine:
 
         # --- Non-Research / Review Detection ---
         # Check Title mainly
-        title_lower = title.lower()
+        title_lower = (title or "").lower()
         non_research_keywords = ["review", "meta-analysis", "guideline", "consensus", "policy", "perspective", "commentary", "editorial", "retraction", "retracted", "framework", "overview", "statement", "consort", "expression of concern", "erratum", "correction", "corrigendum"]
         is_non_research = any(kw in title_lower for kw in non_research_keywords)
         
@@ -304,14 +305,18 @@ class RuleBasedFeedbackEngine:
             "deterministic_audit": True
         }
 
-def process_all_features(features_folder="data/features", output_folder="data/feedback"):
+def process_all_features(features_folder="data/features", output_folder="data/feedback", resume=False):
     if not os.path.exists(output_folder):
         os.makedirs(output_folder)
         
     engine = RuleBasedFeedbackEngine()
+    checkpoint = stage_checkpoint("feedback_rules", resume)
     
     for filename in os.listdir(features_folder):
         if filename.endswith(".json"):
+            output_path = os.path.join(output_folder, filename)
+            if checkpoint.is_done(filename, output_path):
+                continue
             with open(os.path.join(features_folder, filename), "r", encoding="utf-8") as f:
                 data = json.load(f)
             
@@ -326,9 +331,8 @@ def process_all_features(features_folder="data/features", output_folder="data/fe
                 "feedback": feedback
             }
             
-            output_path = os.path.join(output_folder, filename)
-            with open(output_path, "w", encoding="utf-8") as f:
-                json.dump(output_data, f, indent=2)
+            atomic_write_json(output_path, output_data)
+            checkpoint.mark(filename, "done")
             print(f"Saved feedback to: {output_path}")
 
 if __name__ == "__main__":
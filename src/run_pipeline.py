@@ -1,15 +1,26 @@
 import os
 import json
+import time
+import argparse
+import threading
 import traceback
-from xml_parser import process_raw_folder
-from feedback_generator import process_features as process_feedback
-from feedback_generator import process_features as process_feedback
+from concurrent.futures import ProcessPoolExecutor
+from xml_parser import process_raw_folder, extract_methods_from_xml
+from feedback_generator import FeedbackGenerator, paper_text, process_features as process_feedback
 from feature_extractor import FeatureExtractor
-from ingest_pdf import process_pdf_folder
+from llm_routing import RoutingPolicy
+from ingest_pdf import process_pdf_folder, extract_text_from_pdf
+from corpus_store import CorpusStore
+from corpus_index import CorpusIndex
+from checkpoint import atomic_write_json, stage_checkpoint
 
-def process_features_batch(processed_folder="data/processed", features_folder="data/features"):
+# Written documents added to the corpus store per segment in the parallel and streaming runs
+CORPUS_CHUNK = 50
+
+def process_features_batch(processed_folder="data/processed", features_folder="data/features", resume=False):
     if not os.path.exists(features_folder):
         os.makedirs(features_folder)
+    checkpoint = stage_checkpoint("extract_pipeline", resume)
         
     extractor = FeatureExtractor()
     count = 0
@@ -19,21 +30,19 @@ def process_features_batch(processed_folder="data/processed", features_folder="d
     
     for filename in processed_files:
         if filename.endswith(".json"):
+            output_path = os.path.join(features_folder, filename)
+            if checkpoint.is_done(filename, output_path):
+                continue
             try:
                 input_path = os.path.join(processed_folder, filename)
                 
                 with open(input_path, "r", encoding="utf-8") as f:
                     data = json.load(f)
                     
-                full_text = ""
-                # Combine methods and stats sections
-                for m in data.get("methods", []):
-                    full_text += m.get("content", "") + "\n"
-                for s in data.get("stats_reproducibility", []):
-                    full_text += s.get("content", "") + "\n"
-                
+                full_text = collect_text(data)
                 if not full_text.strip():
                     print(f"Skipping {filename}: No text content extracted.")
+                    checkpoint.mark(filename, "skipped")
                     continue
                     
                 features = extractor.extract_features(full_text)
@@ -44,31 +53,268 @@ def process_features_batch(processed_folder="data/processed", features_folder="d
                     "features": features
                 }
                 
-                output_path = os.path.join(features_folder, filename)
-                with open(output_path, "w", encoding="utf-8") as f:
-                    json.dump(output_data, f, indent=2)
+                atomic_write_json(output_path, output_data)
+                checkpoint.mark(filename, "done")
                 
                 count += 1
                 if count % 10 == 0:
                     print(f"Extracted features for {count}/{total} papers...")
             except Exception as e:
                 print(f"Error processing {filename}: {e}")
-                # traceback.print_exc()
+                checkpoint.mark(filename, "failed", error=str(e))
+
+def collect_text(data):
+    """Combine the methods and stats sections of a processed document."""
+    full_text = ""
+    for m in data.get("methods", []):
+        full_text += m.get("content", "") + "\n"
+    for s in data.get("stats_reproducibility", []):
+        full_text += s.get("content", "") + "\n"
+    return full_text
+
+def discover_documents(raw_folder="data/raw", pdf_folder="data/pdf_input"):
+    """
+    List (kind, path) pairs for every XML and PDF input, in a stable order
+    so that parallel runs write identical output to serial ones.
+    """
+    documents = []
+    if os.path.exists(raw_folder):
+        for filename in sorted(os.listdir(raw_folder)):
+            if filename.endswith(".xml"):
+                documents.append(("xml", os.path.join(raw_folder, filename)))
+    if os.path.exists(pdf_folder):
+        for filename in sorted(os.listdir(pdf_folder)):
+            if filename.lower().endswith(".pdf"):
+                documents.append(("pdf", os.path.join(pdf_folder, filename)))
+    return documents
+
+def output_name(path):
+    return os.path.splitext(os.path.basename(path))[0] + ".json"
+
+# Per-process state, built once by _init_worker rather than once per document
+_extractor = None
+_generator = None
+
+def _init_worker():
+    global _extractor, _generator
+    _extractor = FeatureExtractor()
+    # Same generator and routing policy as the serial feedback step
+    _generator = FeedbackGenerator(routing=RoutingPolicy())
+
+def audit_processed(data):
+    """
+    Features and feedback for a processed document, exactly as the serial
+    steps produce them: features from the methods and stats text, feedback
+    from FeedbackGenerator (the rule audit, plus an LLM review when a key is
+    set and the routing policy escalates) on the methods text. Returns None
+    if the document has no text.
+    """
+    full_text = collect_text(data)
+    if not full_text.strip():
+        return None
+    features = _extractor.extract_features(full_text)
+    feedback = _generator.generate_feedback(data.get("title"), paper_text(data), features)
+    return features, feedback
+
+def audit_document(document):
+    """
+    Parse, extract and audit a single document inside a worker.
+    Never raises: failures are returned as a structured error record.
+    """
+    kind, path = document
+    stage = "parse"
+    try:
+        if kind == "xml":
+            data = extract_methods_from_xml(path)
+        else:
+            data = extract_text_from_pdf(path)
+        if not data:
+            raise ValueError("Parser returned no data")
+
+        stage = "audit"
+        audited = audit_processed(data)
+        if audited is None:
+            return {"status": "skipped", "source": path, "reason": "No text content extracted."}
+        features, feedback = audited
+
+        return {
+            "status": "ok",
+            "source": path,
+            "name": output_name(path),
+            "processed": data,
+            "features": features,
+            "feedback": feedback
+        }
+    except Exception as e:
+        return {
+            "status": "error",
+            "source": path,
+            "stage": stage,
+            "error": f"{type(e).__name__}: {e}",
+            "traceback": traceback.format_exc()
+        }
+
+def write_document_outputs(result, processed_folder="data/processed", features_folder="data/features", feedback_folder="data/feedback"):
+    """
+    Write the processed, features and feedback JSON files for one audited document.
+    Returns the feedback record so callers can add it to the corpus store.
+    """
+    data = result["processed"]
+    feature_data = {
+        "title": data.get("title"),
+        "pmcid": data.get("pmcid"),
+        "features": result["features"]
+    }
+    feedback_data = dict(feature_data, feedback=result["feedback"])
+
+    for folder, payload in [(processed_folder, data), (features_folder, feature_data), (feedback_folder, feedback_data)]:
+        atomic_write_json(os.path.join(folder, result["name"]), payload)
+    return feedback_data
+
+def update_corpus(records, corpus_dir="data/corpus", index_path="data/corpus_index.db"):
+    """Add freshly audited papers to the columnar corpus store and the SQLite index."""
+    CorpusStore(corpus_dir).append(records)
+    CorpusIndex(index_path).upsert(records)
+
+class CorpusWriter:
+    """
+    Adds written documents to the corpus store and index in chunks and only
+    then records them in the checkpoint ledger, so every document the ledger
+    calls done is in the corpus; an interrupted run audits the rest again on
+    --resume. Safe to call from several threads.
+    """
+    def __init__(self, checkpoint, corpus_dir="data/corpus", index_path="data/corpus_index.db", chunk=CORPUS_CHUNK):
+        self.checkpoint = checkpoint
+        self.corpus_dir = corpus_dir
+        self.index_path = index_path
+        self.chunk = chunk
+        self._pending = []
+        self._lock = threading.Lock()
+
+    def add(self, source, name, record, status="done", **info):
+        with self._lock:
+            self._pending.append((source, name, record, status, info))
+            if len(self._pending) >= self.chunk:
+                self._flush()
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        if not self._pending:
+            return
+        update_corpus([(name, record) for _, name, record, _, _ in self._pending], self.corpus_dir, self.index_path)
+        for source, _, _, status, info in self._pending:
+            self.checkpoint.mark(source, status, **info)
+        self._pending = []
+
+def run_parallel_pipeline(workers, raw_folder="data/raw", pdf_folder="data/pdf_input", processed_folder="data/processed",
+                          features_folder="data/features", feedback_folder="data/feedback", error_report="data/pipeline_errors.json",
+                          corpus_dir="data/corpus", index_path="data/corpus_index.db", resume=False):
+    """
+    Run parse -> extract -> feedback for every document across a process pool.
+    Results are written by the parent in input order, so output is deterministic
+    regardless of which worker finishes first.
+    """
+    for folder in [processed_folder, features_folder, feedback_folder]:
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+
+    documents = discover_documents(raw_folder, pdf_folder)
+    checkpoint = stage_checkpoint("audit", resume)
+    documents = [d for d in documents if not checkpoint.is_done(d[1], os.path.join(feedback_folder, output_name(d[1])))]
+    if not documents:
+        print(f"No documents to audit in {raw_folder} or {pdf_folder}.")
+        return
+
+    print(f"Auditing {len(documents)} documents with {workers} workers...")
+    start = time.time()
+    chunksize = max(1, len(documents) // (workers * 4))
+
+    succeeded, skipped, failed = 0, [], []
+    corpus = CorpusWriter(checkpoint, corpus_dir, index_path)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        for result in pool.map(audit_document, documents, chunksize=chunksize):
+            if result["status"] == "ok":
+                try:
+                    record = write_document_outputs(result, processed_folder, features_folder, feedback_folder)
+                    if "error" in result["feedback"]:
+                        # Written as the serial step writes it, but left for --resume to retry
+                        failed.append({"source": result["source"], "stage": "feedback", "error": result["feedback"]["error"], "traceback": None})
+                        corpus.add(result["source"], result["name"], record, "failed", stage="feedback")
+                    else:
+                        corpus.add(result["source"], result["name"], record)
+                        succeeded += 1
+                except Exception as e:
+                    failed.append({"source": result["source"], "stage": "write", "error": f"{type(e).__name__}: {e}", "traceback": traceback.format_exc()})
+                    checkpoint.mark(result["source"], "failed", stage="write")
+            elif result["status"] == "skipped":
+                skipped.append({"source": result["source"], "reason": result["reason"]})
+                checkpoint.mark(result["source"], "skipped")
+            else:
+                failed.append({k: result[k] for k in ["source", "stage", "error", "traceback"]})
+                checkpoint.mark(result["source"], "failed", stage=result["stage"])
+
+            done = succeeded + len(skipped) + len(failed)
+            if done % 10 == 0:
+                print(f"Audited {done}/{len(documents)} documents...")
+
+    corpus.flush()
+
+    elapsed = time.time() - start
+    report = {
+        "workers": workers,
+        "total": len(documents),
+        "succeeded": succeeded,
+        "skipped": skipped,
+        "failed": failed,
+        "elapsed_seconds": round(elapsed, 2)
+    }
+    atomic_write_json(error_report, report)
+
+    print(f"Completed in {elapsed:.1f}s: {succeeded} succeeded, {len(skipped)} skipped, {len(failed)} failed.")
+    if failed:
+        print(f"Error report saved to: {error_report}")
+    return report
+
+def run_pipeline(workers=1, stream=False, queue_size=16, resume=False):
+    if stream:
+        from streaming_pipeline import run_streaming_pipeline
+        print("--- Streaming Audit Pipeline ---")
+        run_streaming_pipeline(cpu_workers=workers if workers > 1 else None, queue_size=queue_size, resume=resume)
+        print("\n--- Pipeline Complete ---")
+        return
+
+    if workers > 1:
+        print("--- Parallel Audit Pipeline ---")
+        run_parallel_pipeline(workers, resume=resume)
+        print("\n--- Pipeline Complete ---")
+        return
 
-def run_pipeline():
     print("--- STEP 1: XML Parsing ---")
-    process_raw_folder()
-    
+    process_raw_folder(resume=resume)
+
     print("\n--- STEP 1b: PDF Ingestion ---")
-    process_pdf_folder()
-    
+    process_pdf_folder(resume=resume)
+
     print("\n--- STEP 2: Feature Extraction ---")
-    process_features_batch()
-    
+    process_features_batch(resume=resume)
+
     print("\n--- STEP 3: Feedback Generation ---")
-    process_feedback()
-    
+    process_feedback(resume=resume)
+
+    print("\n--- STEP 4: Corpus Store & Index ---")
+    print(f"Stored {CorpusStore().build_from_folder()} papers.")
+    print(f"Indexed {CorpusIndex().rebuild_from_folder()} papers.")
+
     print("\n--- Pipeline Complete ---")
 
 if __name__ == "__main__":
-    run_pipeline()
+    parser = argparse.ArgumentParser(description="AFSR audit pipeline")
+    parser.add_argument("--workers", type=int, default=1, help="Number of worker processes (1 = serial staged pipeline)")
+    parser.add_argument("--stream", action="store_true", help="Stream documents through bounded queues between read, parse, extract and write stages")
+    parser.add_argument("--queue-size", type=int, default=16, help="Maximum items buffered between streaming stages")
+    parser.add_argument("--resume", action="store_true", help="Skip documents completed by an interrupted run and retry failures")
+    args = parser.parse_args()
+    run_pipeline(workers=args.workers, stream=args.stream, queue_size=args.queue_size, resume=args.resume)
@@ -0,0 +1,82 @@
+import os
+import time
+import argparse
+from app import create_app
+
+try:
+    import resource
+except ImportError:
+    resource = None  # Windows
+
+try:
+    from gunicorn.app.base import BaseApplication
+except ImportError:
+    BaseApplication = None
+
+if BaseApplication is not None:
+    class DashboardServer(BaseApplication):
+        """Gunicorn running an app that was built before the workers fork."""
+        def __init__(self, application, options):
+            self.application = application
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return self.application
+
+def post_fork(server, worker):
+    # Start this worker's audit pool before it accepts connections
+    start = time.perf_counter()
+    worker.app.application.extensions['audit'].warm()
+    server.log.info(f"Worker {worker.pid} ready in {time.perf_counter() - start:.2f}s")
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the dashboard for production use")
+    parser.add_argument("--bind", default="127.0.0.1:8000")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Server worker processes")
+    parser.add_argument("--threads", type=int, default=4, help="Request threads per worker")
+    parser.add_argument("--audit-workers", type=int,
+                        help="Audit processes per server worker (default 0 under gunicorn, whose workers already are processes)")
+    parser.add_argument("--timeout", type=int, default=120,
+                        help="Seconds before gunicorn kills an unresponsive worker, e.g. one stuck in a regex match")
+    args = parser.parse_args()
+
+    config = {}
+    if args.audit_workers is not None:
+        config['AUDIT_WORKERS'] = args.audit_workers
+    elif BaseApplication is not None and 'AUDIT_WORKERS' not in os.environ:
+        config['AUDIT_WORKERS'] = 0
+
+    # Build (and check) everything shareable before any worker forks
+    start = time.perf_counter()
+    app = create_app(config)
+    svc = app.extensions['audit']
+    patterns = sum(len(p) for p in svc.extractor.patterns.values())
+    memory = f", max RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB" if resource else ""
+    print(f"App loaded in {time.perf_counter() - start:.2f}s: {patterns} patterns compiled for {svc.extractor.backend}, ruleset {svc.fingerprint}{memory}")
+
+    if BaseApplication is None:
+        # No gunicorn (e.g. on Windows): one process, audits on its own worker pool
+        from werkzeug.serving import run_simple
+        print("gunicorn is not installed; serving from a single process.")
+        svc.warm()
+        host, port = args.bind.rsplit(":", 1)
+        run_simple(host, int(port), app, threaded=True)
+        return
+
+    DashboardServer(app, {
+        "bind": args.bind,
+        "workers": args.workers,
+        "threads": args.threads,
+        "worker_class": "gthread",
+        "timeout": args.timeout,
+        "preload_app": True,
+        "post_fork": post_fork
+    }).run()
+
+if __name__ == "__main__":
+    main()
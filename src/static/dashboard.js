@@ -7,6 +7,24 @@ function switchTab(tabId) {
     document.getElementById(tabId).classList.add('active');
 }
 
+// Submit an audit job and poll until its result is ready
+async function runJob(url, options) {
+    const submit = await fetch(url, options);
+    const job = await submit.json();
+    if (job.error) throw new Error(job.error);
+
+    let delay = 250;
+    while (true) {
+        // The dashboard renders only the feedback, not the raw features
+        const response = await fetch(job.result_url + '?view=evidence');
+        const data = await response.json();
+        if (response.status === 200) return data;
+        if (response.status !== 202) throw new Error(data.error || 'Job failed');
+        await new Promise(resolve => setTimeout(resolve, delay));
+        delay = Math.min(delay * 2, 2000);
+    }
+}
+
 async function auditText() {
     const text = document.getElementById('methods-text').value;
     if (!text.trim()) {
@@ -16,13 +34,11 @@ async function auditText() {
 
     showLoading(true);
     try {
-        const response = await fetch('/audit_text', {
+        const data = await runJob('/jobs/audit_text', {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
             body: JSON.stringify({ text })
         });
-        const data = await response.json();
-        if (data.error) throw new Error(data.error);
         displayResults(data);
     } catch (err) {
         alert('Audit failed: ' + err.message);
@@ -146,12 +162,10 @@ async function handleFileUpload(file) {
 
     showLoading(true);
     try {
-        const response = await fetch('/audit_file', {
+        const data = await runJob('/jobs/audit_file', {
             method: 'POST',
             body: formData
         });
-        const data = await response.json();
-        if (data.error) throw new Error(data.error);
         displayResults(data);
     } catch (err) {
         alert('File audit failed: ' + err.message);
@@ -0,0 +1,223 @@
+import io
+import os
+import json
+import time
+import queue
+import threading
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+import run_pipeline
+from run_pipeline import CorpusWriter, discover_documents, output_name, write_document_outputs
+from xml_parser import extract_methods_from_xml
+from ingest_pdf import extract_text_from_pdf
+from checkpoint import atomic_write_json, stage_checkpoint
+
+# Marks the end of a stage's input
+_DONE = object()
+
+def read_document(document):
+    """I/O stage: load the raw bytes of an input file."""
+    kind, path = document
+    with open(path, "rb") as f:
+        return kind, path, f.read()
+
+def parse_document(kind, path, raw):
+    """CPU stage: parse raw XML/PDF bytes into the processed-document structure."""
+    if kind == "xml":
+        data = extract_methods_from_xml(io.BytesIO(raw), source_name=path)
+    else:
+        data = extract_text_from_pdf(io.BytesIO(raw), source_name=path)
+    if not data:
+        raise ValueError("Parser returned no data")
+    return data
+
+def extract_and_audit(data):
+    """CPU stage: run feature extraction and feedback generation on a processed document."""
+    return run_pipeline.audit_processed(data)
+
+class Stage:
+    """
+    A pool of threads that takes items from a bounded inbox, applies func and
+    puts the result on the (bounded) outbox. A full outbox blocks the stage,
+    which is what propagates backpressure up to the reader. source maps an
+    item to its input path for the error report.
+    """
+    def __init__(self, name, func, workers, inbox, outbox, errors, source):
+        self.name = name
+        self.func = func
+        self.source = source
+        self.workers = workers
+        self.inbox = inbox
+        self.outbox = outbox
+        self.errors = errors
+        self.processed = 0
+        self.busy_seconds = 0.0
+        self.depth_samples = 0
+        self.depth_total = 0
+        self.max_depth = 0
+        self._lock = threading.Lock()
+        self._remaining = workers
+        self.next_workers = 0
+        self._threads = [threading.Thread(target=self._run, name=f"{name}-{i}", daemon=True) for i in range(workers)]
+
+    def start(self):
+        for t in self._threads:
+            t.start()
+
+    def join(self):
+        for t in self._threads:
+            t.join()
+
+    def _run(self):
+        while True:
+            depth = self.inbox.qsize()
+            item = self.inbox.get()
+            if item is _DONE:
+                break
+            start = time.perf_counter()
+            try:
+                result = self.func(item)
+            except Exception as e:
+                result = None
+                self.errors.append({
+                    "source": self.source(item),
+                    "stage": self.name,
+                    "error": f"{type(e).__name__}: {e}",
+                    "traceback": traceback.format_exc()
+                })
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.processed += 1
+                self.busy_seconds += elapsed
+                self.depth_samples += 1
+                self.depth_total += depth
+                self.max_depth = max(self.max_depth, depth)
+            if result is not None and self.outbox is not None:
+                self.outbox.put(result)
+
+        # The last worker to finish signals every worker of the next stage
+        with self._lock:
+            self._remaining -= 1
+            last = self._remaining == 0
+        if last and self.outbox is not None:
+            for _ in range(self.next_workers):
+                self.outbox.put(_DONE)
+
+    def report(self, wall_seconds):
+        return {
+            "stage": self.name,
+            "workers": self.workers,
+            "processed": self.processed,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "utilization": round(self.busy_seconds / (wall_seconds * self.workers), 3) if wall_seconds > 0 else 0.0,
+            "mean_queue_depth": round(self.depth_total / self.depth_samples, 2) if self.depth_samples else 0.0,
+            "max_queue_depth": self.max_depth
+        }
+
+def run_streaming_pipeline(cpu_workers=None, io_workers=2, queue_size=16, raw_folder="data/raw", pdf_folder="data/pdf_input",
+                           processed_folder="data/processed", features_folder="data/features", feedback_folder="data/feedback",
+                           error_report="data/pipeline_errors.json", corpus_dir="data/corpus",
+                           index_path="data/corpus_index.db", resume=False):
+    """
+    Stream documents through read -> parse -> extract+feedback -> write with bounded
+    queues between the stages, so results are written as soon as each document
+    is audited instead of after every document has been parsed.
+    CPU stages hand their work to a process pool of warm extractor workers.
+    """
+    cpu_workers = cpu_workers or os.cpu_count() or 1
+    for folder in [processed_folder, features_folder, feedback_folder]:
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+
+    documents = discover_documents(raw_folder, pdf_folder)
+    # Shared with run_parallel_pipeline, which writes the same outputs, so either can resume the other
+    checkpoint = stage_checkpoint("audit", resume)
+    documents = [d for d in documents if not checkpoint.is_done(d[1], os.path.join(feedback_folder, output_name(d[1])))]
+    if not documents:
+        print(f"No documents to audit in {raw_folder} or {pdf_folder}.")
+        return
+
+    errors = []
+    skipped = []
+    first_result = []
+    corpus = CorpusWriter(checkpoint, corpus_dir, index_path)
+    start = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=cpu_workers, initializer=run_pipeline._init_worker) as pool:
+        def parse(item):
+            kind, path, raw = item
+            return path, pool.submit(parse_document, kind, path, raw).result()
+
+        def audit(item):
+            path, data = item
+            result = pool.submit(extract_and_audit, data).result()
+            if result is None:
+                skipped.append({"source": path, "reason": "No text content extracted."})
+                checkpoint.mark(path, "skipped")
+                return None
+            features, feedback = result
+            return {"source": path, "name": output_name(path), "processed": data, "features": features, "feedback": feedback}
+
+        def write(result):
+            record = write_document_outputs(result, processed_folder, features_folder, feedback_folder)
+            if "error" in result["feedback"]:
+                # Written as the serial step writes it, but left for --resume to retry
+                errors.append({"source": result["source"], "stage": "feedback", "error": result["feedback"]["error"], "traceback": None})
+                corpus.add(result["source"], result["name"], record, "failed", stage="feedback")
+            else:
+                corpus.add(result["source"], result["name"], record)
+            if not first_result:
+                first_result.append(time.perf_counter() - start)
+
+        queues = [queue.Queue(maxsize=queue_size) for _ in range(4)]
+        stages = [
+            Stage("read", read_document, io_workers, queues[0], queues[1], errors, source=lambda item: item[1]),
+            Stage("parse", parse, cpu_workers, queues[1], queues[2], errors, source=lambda item: item[1]),
+            Stage("extract+feedback", audit, cpu_workers, queues[2], queues[3], errors, source=lambda item: item[0]),
+            Stage("write", write, io_workers, queues[3], None, errors, source=lambda item: item["source"])
+        ]
+        for stage, next_stage in zip(stages, stages[1:] + [None]):
+            stage.next_workers = next_stage.workers if next_stage else 0
+            stage.start()
+
+        print(f"Streaming {len(documents)} documents ({cpu_workers} CPU workers, queue size {queue_size})...")
+        # Feeding the first queue blocks once it is full, bounding memory use
+        for document in documents:
+            queues[0].put(document)
+        for _ in range(stages[0].workers):
+            queues[0].put(_DONE)
+
+        for stage in stages:
+            stage.join()
+
+    corpus.flush()
+    for error in errors:
+        # Feedback failures were recorded by the corpus writer
+        if error["stage"] != "feedback":
+            checkpoint.mark(error["source"], "failed", stage=error["stage"])
+
+    wall = time.perf_counter() - start
+    stage_reports = [stage.report(wall) for stage in stages]
+    report = {
+        "mode": "streaming",
+        "workers": cpu_workers,
+        "total": len(documents),
+        "succeeded": stages[-1].processed - len([e for e in errors if e["stage"] in ("write", "feedback")]),
+        "skipped": skipped,
+        "failed": errors,
+        "elapsed_seconds": round(wall, 2),
+        "first_result_seconds": round(first_result[0], 3) if first_result else None,
+        "stages": stage_reports
+    }
+    atomic_write_json(error_report, report)
+
+    print(f"\n{'Stage':<15} | {'Items':<6} | {'Util':<6} | {'Mean Q':<7} | {'Max Q':<5}")
+    print("-" * 52)
+    for s in stage_reports:
+        print(f"{s['stage']:<15} | {s['processed']:<6} | {s['utilization']:<6.0%} | {s['mean_queue_depth']:<7} | {s['max_queue_depth']:<5}")
+    print(f"\nCompleted in {wall:.1f}s (first result after {report['first_result_seconds']}s): "
+          f"{report['succeeded']} succeeded, {len(skipped)} skipped, {len(errors)} failed.")
+    return report
+
+if __name__ == "__main__":
+    run_streaming_pipeline()
@@ -1,24 +1,36 @@
 import os
 import json
+from corpus_store import CorpusStore, iter_rows
 
 features_dir = "data/features"
 results = []
 
-if not os.path.exists(features_dir):
-    print(f"Directory {features_dir} not found.")
-    exit(1)
-
-for filename in os.listdir(features_dir):
-    if filename.endswith(".json"):
-        filepath = os.path.join(features_dir, filename)
-        with open(filepath, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            features = data.get("features", {})
-            results.append({
-                "file": filename,
-                "multiplicity": features.get("multiplicity_correction", {}).get("present", False),
-                "normality": features.get("normality_checks", {}).get("present", False)
-            })
+store = CorpusStore()
+
+if store.exists():
+    corpus = store.load()
+    for row in iter_rows(corpus):
+        results.append({
+            "file": row["filename"],
+            "multiplicity": row.get("present.multiplicity_correction", False),
+            "normality": row.get("present.normality_checks", False)
+        })
+else:
+    if not os.path.exists(features_dir):
+        print(f"Directory {features_dir} not found.")
+        exit(1)
+
+    for filename in os.listdir(features_dir):
+        if filename.endswith(".json"):
+            filepath = os.path.join(features_dir, filename)
+            with open(filepath, "r", encoding="utf-8") as f:
+                data = json.load(f)
+                features = data.get("features", {})
+                results.append({
+                    "file": filename,
+                    "multiplicity": features.get("multiplicity_correction", {}).get("present", False),
+                    "normality": features.get("normality_checks", {}).get("present", False)
+                })
 
 results.sort(key=lambda x: x['file'])
 
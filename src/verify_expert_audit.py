@@ -1,5 +1,6 @@
 import json
 import os
+from corpus_store import load_corpus
 
 def calculate_metrics(feedback_dir="data/feedback", expert_audit_path="data/expert_audit.json"):
     if not os.path.exists(expert_audit_path):
@@ -42,16 +43,14 @@ def calculate_metrics(feedback_dir="data/feedback", expert_audit_path="data/expe
     print(f"{'File':<25} | {'TP':<5} | {'FP':<5} | {'FN':<5} | {'Recall':<8} | {'Precision':<10}")
     print("-" * 75)
 
+    corpus = load_corpus(feedback_dir=feedback_dir)
+    gaps_by_file = dict(zip(corpus.get("filename", []), corpus.get("gaps", [])))
+
     for filename, expert_audit in expert_data.items():
-        feedback_path = os.path.join(feedback_dir, filename)
-        if not os.path.exists(feedback_path):
+        if filename not in gaps_by_file:
             continue
             
-        with open(feedback_path, "r", encoding="utf-8") as f:
-            auto_data = json.load(f)
-            
-        auto_feedback = auto_data.get("feedback", {})
-        found_gaps = auto_feedback.get("critical_gaps", [])
+        found_gaps = gaps_by_file[filename]
         
         # Handle different expert audit formats
         if "expert_findings" in expert_audit:
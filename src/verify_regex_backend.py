@@ -0,0 +1,117 @@
+import os
+import sys
+import json
+import time
+import argparse
+from collections import Counter
+from feature_extractor import FeatureExtractor, feature_text
+from regex_backend import Unsupported, available, engine, to_re2
+
+# Adversarial input for the scaling check: many starts of the "no ..." multiplicity
+# rules on a single line, plus ordinary Methods prose
+SCALING_UNIT = "no formal adjustment was made; no "
+SCALING_PROSE = "Patients were randomly assigned (n = 120) and compared with a t-test (p < 0.05). "
+
+def load_texts(processed_folder):
+    texts = {}
+    for filename in sorted(os.listdir(processed_folder)):
+        if filename.endswith(".json"):
+            with open(os.path.join(processed_folder, filename), "r", encoding="utf-8") as f:
+                texts[filename] = feature_text(json.load(f))
+    return texts
+
+def _spans(regex, text):
+    return [(m.start(), m.end(), m.group()) for m in regex.finditer(text)]
+
+def compare(reference, candidate, texts):
+    """Every pattern's matches on every text under both extractors; returns the differences."""
+    differences = []
+    for filename, text in texts.items():
+        for feature, patterns in reference.patterns.items():
+            for expected, actual in zip(patterns, candidate.patterns[feature]):
+                if engine(actual) == "re":
+                    continue
+                want, got = _spans(expected, text), _spans(actual, text)
+                if want != got:
+                    differences.append({"file": filename, "feature": feature, "pattern": expected.pattern,
+                                        "missing": [m for m in want if m not in got][:3],
+                                        "extra": [m for m in got if m not in want][:3]})
+        if reference.extract_features(text) != candidate.extract_features(text):
+            differences.append({"file": filename, "feature": None, "pattern": None, "missing": [], "extra": []})
+    return differences
+
+def throughput(extractor, texts, repeat):
+    total = sum(len(text) for text in texts.values())
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in texts.values():
+            extractor.extract_features(text)
+        best = min(best, time.perf_counter() - start)
+    return best, total / best / 1e6
+
+def scaling(extractor, sizes):
+    rows = []
+    for size in sizes:
+        text = (SCALING_PROSE * (size // (2 * len(SCALING_PROSE)) + 1))[:size // 2]
+        text += (SCALING_UNIT * (size // (2 * len(SCALING_UNIT)) + 1))[:size - len(text)]
+        start = time.perf_counter()
+        extractor.extract_features(text)
+        rows.append((size, time.perf_counter() - start))
+    return rows
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check that a regex backend finds exactly the matches of re on the corpus")
+    parser.add_argument("--backend", default="re2", help="Backend to check against re (default re2)")
+    parser.add_argument("--processed", default="data/processed", help="Folder of processed papers")
+    parser.add_argument("--repeat", type=int, default=3, help="Timing runs per backend (the best is reported)")
+    parser.add_argument("--sizes", default="25000,50000,100000,200000",
+                        help="Input sizes in characters for the worst-case scaling check ('' to skip)")
+    parser.add_argument("--verbose", action="store_true", help="List the patterns that stay on re and why")
+    args = parser.parse_args()
+
+    if args.backend not in available():
+        raise SystemExit(f"Backend {args.backend!r} is not available here (have: {', '.join(available())})")
+    if not os.path.exists(args.processed):
+        print(f"Error: {args.processed} not found. Run the pipeline first or pass --processed.")
+        sys.exit(1)
+
+    reference = FeatureExtractor("re")
+    candidate = FeatureExtractor(args.backend)
+    engines = Counter(engine(regex) for patterns in candidate.patterns.values() for regex in patterns)
+    print(f"{args.backend}: " + ", ".join(f"{n} patterns on {name}" for name, n in sorted(engines.items())))
+    if args.verbose:
+        for feature, patterns in candidate.patterns.items():
+            for regex in patterns:
+                if engine(regex) == "re":
+                    try:
+                        to_re2(regex.pattern)
+                        reason = "rejected by RE2"
+                    except Unsupported as e:
+                        reason = f"unsupported: {e}"
+                    print(f"  re  {feature}: {regex.pattern!r} ({reason})")
+
+    texts = load_texts(args.processed)
+    differences = compare(reference, candidate, texts)
+    print(f"Conformance: {len(texts)} papers, {len(differences)} difference(s)")
+    for difference in differences[:20]:
+        if difference["pattern"] is None:
+            print(f"  {difference['file']}: extracted features differ")
+        else:
+            print(f"  {difference['file']}: {difference['feature']} {difference['pattern']!r}\n"
+                  f"    missing {difference['missing']}\n    extra {difference['extra']}")
+
+    if texts:
+        for name, extractor in (("re", reference), (args.backend, candidate)):
+            seconds, rate = throughput(extractor, texts, args.repeat)
+            print(f"Throughput {name:<4} {seconds:.3f}s for the corpus, {rate:.2f} M chars/s")
+
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+    if sizes:
+        print("Worst-case scaling (seconds by input size):")
+        for name, extractor in (("re", reference), (args.backend, candidate)):
+            rows = scaling(extractor, sizes)
+            growth = ", ".join(f"x{later / earlier:.1f}" for (_, earlier), (_, later) in zip(rows, rows[1:]))
+            print(f"  {name:<4} " + "  ".join(f"{size}: {seconds:.3f}" for size, seconds in rows) + f"  (growth {growth})")
+
+    sys.exit(1 if differences else 0)
@@ -0,0 +1,13 @@
+"""
+WSGI entry point for production servers, e.g. from the src folder:
+
+    gunicorn --preload --workers 4 --threads 4 wsgi:application
+
+With --preload the app (spaCy, the extractor and its compiled patterns) is
+built once in the master and shared copy-on-write by every forked worker.
+serve.py does the same and also starts each worker's audit pool before it
+takes requests.
+"""
+from app import create_app
+
+application = create_app()
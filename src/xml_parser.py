@@ -1,11 +1,13 @@
 import os
 import lxml.etree as ET
 import json
+from checkpoint import atomic_write_json, stage_checkpoint
 
-def extract_methods_from_xml(xml_path):
+def extract_methods_from_xml(xml_path, source_name=None):
     """
     Extract the Methods section from a PMC XML file.
     Identifies sections with 'methods' or 'statistics' in the title.
+    xml_path may also be a file object, in which case source_name gives the PMCID.
     """
     try:
         parser = ET.XMLParser(recover=True)
@@ -18,7 +20,7 @@ def extract_methods_from_xml(xml_path):
         
         extracted_data = {
             "title": "",
-            "pmcid": os.path.basename(xml_path).replace(".xml", ""),
+            "pmcid": os.path.basename(source_name or xml_path).replace(".xml", ""),
             "methods": [],
             "stats_reproducibility": []
         }
@@ -66,24 +68,55 @@ def extract_methods_from_xml(xml_path):
                     
         return extracted_data
     except Exception as e:
-        print(f"Error parsing {xml_path}: {e}")
+        print(f"Error parsing {source_name or xml_path}: {e}")
         return None
 
-def process_raw_folder(raw_folder="data/raw", output_folder="data/processed"):
+def _article_pmcid(article):
+    for id_type in ("pmc", "pmcid", "pmcaid"):
+        values = article.xpath(f"./front/article-meta/article-id[@pub-id-type='{id_type}']/text()")
+        if values:
+            return values[0].strip().upper().replace("PMC", "")
+    return None
+
+def split_article_set(xml_data):
+    """
+    Split a multi-article efetch response (<pmc-articleset>) into one document
+    per article. Returns a dict of numeric PMCID -> XML bytes; each document is
+    wrapped in its own <pmc-articleset> so it matches a single-ID fetch.
+    """
+    parser = ET.XMLParser(recover=True, huge_tree=True)
+    root = ET.fromstring(xml_data, parser=parser)
+    articles = {}
+    if root is None:
+        return articles
+    for article in [root] if root.tag == "article" else root.findall("article"):
+        pmcid = _article_pmcid(article)
+        if pmcid:
+            wrapper = ET.Element("pmc-articleset")
+            wrapper.append(article)
+            articles[pmcid] = ET.tostring(wrapper, xml_declaration=True, encoding="UTF-8")
+    return articles
+
+def process_raw_folder(raw_folder="data/raw", output_folder="data/processed", resume=False):
     if not os.path.exists(output_folder):
         os.makedirs(output_folder)
+    checkpoint = stage_checkpoint("parse_xml", resume)
         
     for filename in os.listdir(raw_folder):
         if filename.endswith(".xml"):
             xml_path = os.path.join(raw_folder, filename)
+            output_path = os.path.join(output_folder, filename.replace(".xml", ".json"))
+            if checkpoint.is_done(filename, output_path):
+                continue
             print(f"Processing: {filename}")
             data = extract_methods_from_xml(xml_path)
             
             if data:
-                output_path = os.path.join(output_folder, filename.replace(".xml", ".json"))
-                with open(output_path, "w", encoding="utf-8") as f:
-                    json.dump(data, f, indent=2)
+                atomic_write_json(output_path, data)
+                checkpoint.mark(filename, "done")
                 print(f"Saved processed data to: {output_path}")
+            else:
+                checkpoint.mark(filename, "failed")
 
 if __name__ == "__main__":
     process_raw_folder()